@@ -0,0 +1,57 @@
+"""Add content-addressed blob store references
+
+Revision ID: blob_store_001
+Revises: detection_history_001
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'blob_store_001'
+down_revision = 'detection_history_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # One row per stored file, refcount = number of rows pointing at it
+    op.create_table('blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(length=50), nullable=True),
+        sa.Column('refcount', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_referenced_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_index('ix_blobs_last_referenced_at', 'blobs', ['last_referenced_at'])
+
+    # Existing rows keep NULL and are served from their old paths
+    op.add_column('image_metadata', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_foreign_key('fk_image_metadata_blob', 'image_metadata', 'blobs', ['content_hash'], ['sha256'])
+    op.create_index('ix_image_metadata_content_hash', 'image_metadata', ['content_hash'])
+
+    op.add_column('detection_history', sa.Column('original_blob', sa.String(length=64), nullable=True))
+    op.add_column('detection_history', sa.Column('predicted_blob', sa.String(length=64), nullable=True))
+    op.create_foreign_key('fk_detection_history_original_blob', 'detection_history', 'blobs', ['original_blob'], ['sha256'])
+    op.create_foreign_key('fk_detection_history_predicted_blob', 'detection_history', 'blobs', ['predicted_blob'], ['sha256'])
+    op.create_index('ix_detection_history_original_blob', 'detection_history', ['original_blob'])
+    op.create_index('ix_detection_history_predicted_blob', 'detection_history', ['predicted_blob'])
+
+
+def downgrade():
+    op.drop_index('ix_detection_history_predicted_blob', table_name='detection_history')
+    op.drop_index('ix_detection_history_original_blob', table_name='detection_history')
+    op.drop_constraint('fk_detection_history_predicted_blob', 'detection_history', type_='foreignkey')
+    op.drop_constraint('fk_detection_history_original_blob', 'detection_history', type_='foreignkey')
+    op.drop_column('detection_history', 'predicted_blob')
+    op.drop_column('detection_history', 'original_blob')
+
+    op.drop_index('ix_image_metadata_content_hash', table_name='image_metadata')
+    op.drop_constraint('fk_image_metadata_blob', 'image_metadata', type_='foreignkey')
+    op.drop_column('image_metadata', 'content_hash')
+
+    op.drop_index('ix_blobs_last_referenced_at', table_name='blobs')
+    op.drop_table('blobs')
@@ -0,0 +1,54 @@
+"""Store detection ai_results as JSONB and index (timestamp, id) for keyset pagination
+
+Revision ID: history_keyset_001
+Revises: retention_001
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'history_keyset_001'
+down_revision = 'retention_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE detection_history ALTER COLUMN ai_results_json TYPE JSONB USING ai_results_json::jsonb')
+        op.alter_column('detection_history', 'ai_results_json', new_column_name='ai_results')
+    else:
+        with op.batch_alter_table('detection_history') as batch:
+            batch.alter_column('ai_results_json', new_column_name='ai_results', type_=sa.JSON(),
+                               existing_nullable=False)
+
+    # Composite indexes match ORDER BY timestamp DESC, id DESC with and without filters
+    op.create_index('idx_detection_history_ts_id', 'detection_history', ['timestamp', 'id'])
+    op.create_index('idx_detection_history_method_ts_id', 'detection_history',
+                    ['detection_method', 'timestamp', 'id'])
+    op.create_index('idx_detection_history_disease_ts_id', 'detection_history',
+                    ['disease_detected', 'timestamp', 'id'])
+    op.drop_index('idx_detection_history_timestamp', table_name='detection_history')
+    op.drop_index('idx_detection_history_method', table_name='detection_history')
+    op.drop_index('idx_detection_history_disease', table_name='detection_history')
+
+
+def downgrade():
+    op.create_index('idx_detection_history_disease', 'detection_history', ['disease_detected'])
+    op.create_index('idx_detection_history_method', 'detection_history', ['detection_method'])
+    op.create_index('idx_detection_history_timestamp', 'detection_history', ['timestamp'])
+    op.drop_index('idx_detection_history_disease_ts_id', table_name='detection_history')
+    op.drop_index('idx_detection_history_method_ts_id', table_name='detection_history')
+    op.drop_index('idx_detection_history_ts_id', table_name='detection_history')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('detection_history', 'ai_results', type_=sa.Text(),
+                        existing_type=postgresql.JSONB(), postgresql_using='ai_results::text')
+        op.alter_column('detection_history', 'ai_results', new_column_name='ai_results_json')
+    else:
+        with op.batch_alter_table('detection_history') as batch:
+            batch.alter_column('ai_results', new_column_name='ai_results_json', type_=sa.Text(),
+                               existing_nullable=False)
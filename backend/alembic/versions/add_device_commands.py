@@ -0,0 +1,47 @@
+"""Add device command outbox
+
+Revision ID: device_commands_001
+Revises: history_keyset_001
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'device_commands_001'
+down_revision = 'history_keyset_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('device_commands',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('command_id', sa.String(length=32), nullable=False),
+        sa.Column('device_id', sa.String(length=50), nullable=False),
+        sa.Column('device_type', sa.String(length=20), nullable=False),
+        sa.Column('topic', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.JSON().with_variant(postgresql.JSONB(), 'postgresql'), nullable=False),
+        sa.Column('desired_status', sa.String(length=20), nullable=False),
+        sa.Column('previous_status', sa.String(length=20), nullable=True),
+        sa.Column('source', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('command_id')
+    )
+    op.create_index('idx_device_commands_pending', 'device_commands', ['status', 'next_attempt_at'])
+    op.create_index('idx_device_commands_device', 'device_commands', ['device_id', 'status'])
+
+
+def downgrade():
+    op.drop_index('idx_device_commands_device', table_name='device_commands')
+    op.drop_index('idx_device_commands_pending', table_name='device_commands')
+    op.drop_table('device_commands')
@@ -0,0 +1,25 @@
+"""Track archived originals for image retention
+
+Revision ID: retention_001
+Revises: storage_usage_001
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'retention_001'
+down_revision = 'storage_usage_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('image_metadata', sa.Column('archived_at', sa.DateTime(), nullable=True))
+    op.add_column('detection_history', sa.Column('archived_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('detection_history', 'archived_at')
+    op.drop_column('image_metadata', 'archived_at')
@@ -0,0 +1,35 @@
+"""Add per device/day storage counters
+
+Revision ID: storage_usage_001
+Revises: blob_store_001
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'storage_usage_001'
+down_revision = 'blob_store_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('blobs', sa.Column('device_id', sa.String(length=50), nullable=True))
+
+    op.create_table('storage_usage',
+        sa.Column('device_id', sa.String(length=50), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('file_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('image_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('device_id', 'day')
+    )
+    # Counters start at zero; the storage reconciler fills them from blobs and image_metadata
+
+
+def downgrade():
+    op.drop_table('storage_usage')
+    op.drop_column('blobs', 'device_id')
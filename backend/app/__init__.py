@@ -25,8 +25,12 @@ def create_app(config_class=Config):
     
     with app.app_context():
         # Import models to ensure tables are created
+        from app.models.blob import Blob
+        from app.models.storage_usage import StorageUsage
+        from app.models.image import ImageMetadata
         from app.models.detection_history import DetectionHistory, DetectionStatistics
         from app.models.detection import DetectionResult, AIResult
+        from app.models.device_command import DeviceCommand
         
         # Create database tables
         db.create_all()
@@ -64,6 +68,28 @@ def create_app(config_class=Config):
                 'cache_status': get_cache_stats()
             })
         
+        # Prometheus metrics: request timing middleware and /metrics
+        from app.services.metrics import init_metrics
+        init_metrics(app)
+        
+        # Opt-in request profiling (no-op unless PROFILING_ENABLED)
+        from app.services.profiling import init_profiling
+        init_profiling(app)
+        
+        # Time every SQL statement for the slow-query log
+        from app.services.query_log import get_slow_query_log
+        get_slow_query_log()
+        
+        # The ML stack is imported lazily by app.services.inference; detection workers can opt in early
+        if app.config.get('AI_PRELOAD'):
+            from app.services.inference import preload_in_background
+            preload_in_background()
+        
+        # Building the client validates the address/authkey pair before serving requests
+        if app.config.get('INFERENCE_SERVER_ADDRESS'):
+            from app.services.inference import get_inference_client
+            get_inference_client()
+        
         @app.before_request
         def before_request():
             """Log request information"""
@@ -82,6 +108,16 @@ def create_app(config_class=Config):
         except Exception as e:
             app.logger.error(f"Failed to initialize TimescaleDB: {e}")
         
+        # Only a process that ingests MQTT readings owns a spool (ingest_worker.py opens its own)
+        if app.config.get('MQTT_APP_INGEST'):
+            from app.services.ingest_spool import open_ingest_spool
+            try:
+                spool = open_ingest_spool()
+                if spool is not None and spool.depth():
+                    app.logger.info(f"Replaying {spool.depth()} spooled sensor readings")
+            except Exception as e:
+                app.logger.error(f"Failed to open ingest spool: {e}")
+        
         # Initialize Configuration Scheduler
         from app.services.configuration_scheduler import get_configuration_scheduler
         try:
@@ -90,6 +126,34 @@ def create_app(config_class=Config):
         except Exception as e:
             app.logger.error(f"Failed to initialize configuration scheduler: {e}")
         
+        # Scheduled camera capture + disease detection (AUTO_CAPTURE_ENABLED)
+        from app.services.capture_pipeline import start_capture_pipeline
+        try:
+            start_capture_pipeline(app)
+        except Exception as e:
+            app.logger.error(f"Failed to start auto capture pipeline: {e}")
+        
+        # Storage counter reconcile + blob GC (one worker per host)
+        from app.services.storage_accounting import start_storage_reconciler
+        try:
+            start_storage_reconciler(app)
+        except Exception as e:
+            app.logger.error(f"Failed to start storage reconciler: {e}")
+        
+        # Image retention / archival batch job (one worker per host)
+        from app.services.retention import start_retention_job
+        try:
+            start_retention_job(app)
+        except Exception as e:
+            app.logger.error(f"Failed to start retention job: {e}")
+        
+        # Device command outbox dispatcher (one worker per host)
+        from app.services.device_commands import start_command_dispatcher
+        try:
+            start_command_dispatcher()
+        except Exception as e:
+            app.logger.error(f"Failed to start device command dispatcher: {e}")
+        
         app.logger.info('Application initialized successfully')
     
     return app
\ No newline at end of file
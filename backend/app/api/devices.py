@@ -1,7 +1,7 @@
 from flask import Blueprint, jsonify, request
 from app.services.device_control import get_device_config, update_device_config
-# from app.services.mqtt_client import get_mqtt_client  # Temporarily disabled
 from app.services.timescale import get_device_states, update_device_state
+from app.services.device_commands import submit_device_command
 from app.utils.middleware import rate_limit
 import json
 from datetime import datetime
@@ -9,15 +9,6 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-# Mock MQTT client for debugging
-class MockMQTTClient:
-    def publish_device_command(self, device_type, command):
-        print(f"Mock MQTT: {device_type} -> {command}")
-        return True
-
-def get_mqtt_client():
-    return MockMQTTClient()
-
 bp = Blueprint('devices', __name__)
 
 @bp.route('/api/devices/config/<device_id>', methods=['GET'])
@@ -149,81 +140,42 @@ def control_device(device_id):
                     'error': 'Cover status must be OPEN, HALF, or CLOSED'
                 }), 400
 
-        # Update database first
+        # Register manual override for scheduler conflict prevention
         try:
-            success = update_device_state(device_id, device_type, status)
-            if not success:
-                return jsonify({
-                    'success': False,
-                    'error': 'Failed to update device state in database'
-                }), 500
+            from app.services.automated_scheduler import get_scheduler
+            scheduler = get_scheduler()
+            scheduler.register_manual_override(device_type)
+            logger.info(f"Manual override registered for {device_type}")
         except Exception as e:
-            logger.error(f"Database update failed: {e}")
-            return jsonify({
-                'success': False,
-                'error': 'Database update failed'            }), 500        # Send MQTT control message
+            logger.warning(f"Failed to register manual override: {e}")
+
+        # device_states and the MQTT command are written in one transaction,
+        # the device command dispatcher publishes it and tracks the ack
         try:
-            mqtt_client = get_mqtt_client()
-            
-            # Register manual override for scheduler conflict prevention
-            try:
-                from app.services.automated_scheduler import get_scheduler
-                scheduler = get_scheduler()
-                scheduler.register_manual_override(device_type)
-                logger.info(f"Manual override registered for {device_type}")
-            except Exception as e:
-                logger.warning(f"Failed to register manual override: {e}")
-            
-            # Prepare command with correct field names for device types
-            if device_type in ['pump', 'fan']:
-                mqtt_command = {
-                    "command": command,
-                    "state": status,  # Use 'state' for pump and fan (boolean)
-                    "time": datetime.now().isoformat()
-                }
-            elif device_type == 'cover':
-                mqtt_command = {
-                    "command": command,
-                    "position": status,  # Use 'position' for cover (string)
-                    "time": datetime.now().isoformat()
-                }
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': f'Unsupported device type: {device_type}'
-                }), 400
-            
-            # Use the proper publish_device_command method instead of direct publish
-            success = mqtt_client.publish_device_command(device_type, mqtt_command)
-            
-            if success:
-                logger.info(f"Control message sent for {device_type} {device_id}: {mqtt_command}")
-                return jsonify({
-                    'success': True,
-                    'message': f'{device_type.title()} {device_id} controlled successfully',
-                    'data': {
-                        'device_id': device_id,
-                        'device_type': device_type,
-                        'status': status,
-                        'command': command,
-                        'mqtt_topic': f"greenhouse/control/{device_type}/",
-                        'timestamp': mqtt_command['time']
-                    }
-                })
-            else:
-                logger.error(f"Failed to publish MQTT command for {device_type} {device_id}")
-                return jsonify({
-                    'success': False,
-                    'error': 'Failed to send control message via MQTT'
-                }), 500
-                
+            queued = submit_device_command(device_id, device_type, status, source='manual', command=command)
         except Exception as e:
-            logger.error(f"MQTT control failed: {e}")
+            logger.error(f"Queueing device command failed: {e}")
             return jsonify({
                 'success': False,
-                'error': f'MQTT control failed: {str(e)}'
+                'error': 'Database update failed'
             }), 500
 
+        logger.info(f"Control command queued for {device_type} {device_id}: {queued['command_id']}")
+        return jsonify({
+            'success': True,
+            'message': f'{device_type.title()} {device_id} controlled successfully',
+            'data': {
+                'device_id': device_id,
+                'device_type': device_type,
+                'status': status,
+                'command': command,
+                'command_id': queued['command_id'],
+                'command_status': queued['command_status'],
+                'mqtt_topic': f"greenhouse/control/{device_type}",
+                'timestamp': queued['timestamp']
+            }
+        })
+
     except Exception as e:
         logger.error(f"Error controlling device {device_id}: {e}")
         return jsonify({
@@ -9,11 +9,15 @@ import os
 import logging
 from typing import Dict, Any
 
-from app.services.camera_service import get_camera_service
-from app.services.ai_service.handler import process_leaf_image
+from app.services.camera_service import get_camera_service, get_camera_registry
+from app.services.inference import analyze_leaf_image, to_ai_results
 from app.services.image_service import save_image
-from app.models.detection import DetectionResult, AIResult
+from app.services.image_derivatives import send_image, schedule_derivatives
+from app.services.blob_store import store_file
+from app.services.detection_stats import record_detection
+from app.models.detection import DetectionResult
 from app.utils.middleware import rate_limit
+from app.utils import ValidationError
 from app import db
 
 logger = logging.getLogger(__name__)
@@ -32,11 +36,16 @@ os.makedirs(PREDICTED_DIR, exist_ok=True)
 @bp.route('/api/disease-detection/camera-status', methods=['GET'])
 @rate_limit
 def check_camera_status():
-    """Kiểm tra trạng thái ESP32-CAM"""
+    """Kiểm tra trạng thái ESP32-CAM (query param camera_id, mặc định camera đầu tiên)"""
     try:
-        camera_service = get_camera_service()
+        camera_service = get_camera_service(request.args.get('camera_id'))
         status = camera_service.check_camera_status()
         return jsonify(status)
+    except KeyError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
     except Exception as e:
         logger.error(f"Error checking camera status: {str(e)}")
         return jsonify({
@@ -44,17 +53,106 @@ def check_camera_status():
             'message': f'Error checking camera: {str(e)}'
         }), 500
 
-@bp.route('/api/disease-detection/capture-and-analyze', methods=['POST'])
+@bp.route('/api/disease-detection/cameras', methods=['GET'])
+@rate_limit
+def list_cameras():
+    """Danh sách camera và trạng thái (probe song song)"""
+    try:
+        statuses = get_camera_registry().check_all()
+        return jsonify({
+            'status': 'success',
+            'cameras': list(statuses.values()),
+            'online': sum(1 for status in statuses.values() if status['status'] == 'online')
+        })
+    except Exception as e:
+        logger.error(f"Error listing cameras: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error listing cameras: {str(e)}'
+        }), 500
+
+@bp.route('/api/disease-detection/cameras/capture', methods=['POST'])
+@rate_limit(cost=10)
+def capture_all_cameras():
+    """Chụp ảnh đồng thời từ tất cả camera (hoặc danh sách camera_ids)"""
+    try:
+        params = request.get_json(silent=True) or {}
+        started = datetime.now()
+        results = get_camera_registry().capture_all(
+            DOWNLOAD_DIR,
+            resolution=params.get('resolution'),
+            quality=params.get('quality'),
+            camera_ids=params.get('camera_ids')
+        )
+        for result in results.values():
+            if result['status'] == 'success':
+                schedule_derivatives(result['file_path'])
+                result['download_url'] = f"/api/images/download/{os.path.basename(result['file_path'])}"
+        return jsonify({
+            'status': 'success',
+            'captures': results,
+            'captured': sum(1 for result in results.values() if result['status'] == 'success'),
+            'duration_ms': round((datetime.now() - started).total_seconds() * 1000, 1)
+        })
+    except KeyError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
+    except Exception as e:
+        logger.error(f"Error capturing from cameras: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error: {str(e)}'
+        }), 500
+
+def _auto_capture_unavailable() -> Dict[str, Any]:
+    """Why this worker has no capture pipeline: disabled, or the lock is held by another worker"""
+    from app.config import Config
+    if not Config.AUTO_CAPTURE_ENABLED:
+        return {'status': 'disabled', 'message': 'Auto capture is disabled (set AUTO_CAPTURE_ENABLED=true)'}
+    return {'status': 'running_elsewhere',
+            'message': 'Auto capture is running in another worker'}
+
+@bp.route('/api/disease-detection/auto-capture', methods=['GET'])
+@rate_limit
+def auto_capture_status():
+    """Trạng thái pipeline chụp và phân tích tự động"""
+    from app.services.capture_pipeline import get_capture_pipeline
+    pipeline = get_capture_pipeline()
+    if pipeline is None:
+        return jsonify(_auto_capture_unavailable())
+    return jsonify({'status': 'success', 'data': pipeline.get_stats()})
+
+@bp.route('/api/disease-detection/auto-capture/run', methods=['POST'])
 @rate_limit
+def auto_capture_run():
+    """Chụp ngay tất cả camera qua pipeline tự động (bỏ qua lịch)"""
+    from app.services.capture_pipeline import get_capture_pipeline
+    pipeline = get_capture_pipeline()
+    if pipeline is None:
+        return jsonify(dict(_auto_capture_unavailable(), status='error')), 409
+    try:
+        return jsonify({'status': 'success', 'data': pipeline.run_once(force=True)})
+    except Exception as e:
+        logger.error(f"Error running auto capture: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error: {str(e)}'
+        }), 500
+
+@bp.route('/api/disease-detection/capture-and-analyze', methods=['POST'])
+@rate_limit(cost=10)  # camera capture + model inference
 def capture_and_analyze():
     """Chụp ảnh từ ESP32-CAM và phân tích bằng AI"""
     try:
         # Lấy parameters từ request
         resolution = request.json.get('resolution', 'UXGA') if request.is_json else request.form.get('resolution', 'UXGA')
         quality = request.json.get('quality', 10) if request.is_json else int(request.form.get('quality', 10))
+        camera_id = request.json.get('camera_id') if request.is_json else request.form.get('camera_id')
         
         # Khởi tạo camera service
-        camera_service = get_camera_service()
+        camera_service = get_camera_service(camera_id)
         
         # Tạo filename và đường dẫn
         filename = camera_service.generate_filename()
@@ -69,20 +167,13 @@ def capture_and_analyze():
         
         if capture_result['status'] != 'success':
             return jsonify(capture_result), 500
+        schedule_derivatives(image_path)
           # Phân tích ảnh bằng AI
         try:
-            ai_results_raw = process_leaf_image(image_path)
+            ai_results_raw = analyze_leaf_image(image_path)
             
             # Chuyển đổi kết quả AI thành format chuẩn
-            ai_results = []
-            for i, result in enumerate(ai_results_raw):
-                ai_result = AIResult(
-                    leaf_index=i + 1,                    predicted_class=result.get('predicted_class', 'Unknown'),
-                    confidence=result.get('confidence', 0.0),
-                    type='disease' if 'bệnh' in result.get('predicted_class', '').lower() else 'pest',
-                    severity=_determine_severity(result.get('confidence', 0.0))
-                )
-                ai_results.append(ai_result)
+            ai_results = to_ai_results(ai_results_raw)
             
             # Tạo ảnh predicted với annotations
             try:
@@ -108,12 +199,15 @@ def capture_and_analyze():
                 detection_history = DetectionHistory(
                     original_image_path=image_path,
                     predicted_image_path=predicted_path if predicted_path else None,
+                    original_blob=store_file(image_path, device_id=camera_service.camera_id),
+                    predicted_blob=store_file(predicted_path, device_id=camera_service.camera_id),
                     detection_method='automatic',
                     camera_status=capture_result.get('camera_status', 'online'),
                     ai_results=[result.dict() for result in ai_results]
                 )
                 
                 db.session.add(detection_history)
+                record_detection(detection_history)
                 db.session.commit()
                 
                 logger.info(f"Saved detection history with ID: {detection_history.id}")
@@ -168,6 +262,11 @@ def capture_and_analyze():
                 'ai_error': str(ai_error)
             })
         
+    except KeyError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 404
     except Exception as e:
         logger.error(f"Error in capture-and-analyze: {str(e)}")
         return jsonify({
@@ -176,7 +275,7 @@ def capture_and_analyze():
         }), 500
 
 @bp.route('/api/disease-detection/analyze', methods=['POST'])
-@rate_limit
+@rate_limit(cost=5)
 def analyze_uploaded_image():
     """Phân tích ảnh đã upload"""
     try:
@@ -198,21 +297,13 @@ def analyze_uploaded_image():
         filename = f"upload_{timestamp}_{file.filename}"
         image_path = os.path.join(DOWNLOAD_DIR, filename)
         file.save(image_path)
+        schedule_derivatives(image_path)
           # Phân tích bằng AI
         try:
-            ai_results_raw = process_leaf_image(image_path)
+            ai_results_raw = analyze_leaf_image(image_path)
             
             # Chuyển đổi kết quả
-            ai_results = []
-            for i, result in enumerate(ai_results_raw):
-                ai_result = AIResult(
-                    leaf_index=i + 1,
-                    predicted_class=result.get('predicted_class', 'Unknown'),
-                    confidence=result.get('confidence', 0.0),
-                    type='disease' if 'bệnh' in result.get('predicted_class', '').lower() else 'pest',
-                    severity=_determine_severity(result.get('confidence', 0.0))
-                )
-                ai_results.append(ai_result)
+            ai_results = to_ai_results(ai_results_raw)
               # Tạo ảnh predicted với annotations
             try:
                 logger.info(f"Attempting to create predicted image for upload: {image_path}")
@@ -236,12 +327,15 @@ def analyze_uploaded_image():
                 detection_history = DetectionHistory(
                     original_image_path=image_path,
                     predicted_image_path=predicted_path if predicted_path else None,
+                    original_blob=store_file(image_path, device_id='manual_upload'),
+                    predicted_blob=store_file(predicted_path, device_id='manual_upload'),
                     detection_method='manual',
                     camera_status='offline',  # Manual upload không dùng camera
                     ai_results=[result.dict() for result in ai_results]
                 )
                 
                 db.session.add(detection_history)
+                record_detection(detection_history)
                 db.session.commit()
                 
                 logger.info(f"Saved manual detection history with ID: {detection_history.id}")
@@ -282,51 +376,27 @@ def analyze_uploaded_image():
 @bp.route('/api/disease-detection/history', methods=['GET'])
 @rate_limit
 def get_detection_history():
-    """Lấy lịch sử phát hiện bệnh"""
+    """Lấy lịch sử phát hiện bệnh (query params: per_page, cursor, method, disease_only, include_total)"""
     try:
-        from app.models.detection_history import DetectionHistory
+        from flask import current_app
+        from app.services.detection_history import list_detections, history_response_body
         
-        # Lấy parameters
-        page = request.args.get('page', 1, type=int)
+        # Lấy parameters; trang tiếp theo dùng next_cursor của trang trước
         per_page = request.args.get('per_page', 20, type=int)
+        cursor = request.args.get('cursor')
         method = request.args.get('method')  # 'automatic' hoặc 'manual'
         disease_only = request.args.get('disease_only', 'false').lower() == 'true'
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
         
-        # Tạo query
-        query = DetectionHistory.query
-        
-        # Filter theo method
-        if method:
-            query = query.filter(DetectionHistory.detection_method == method)
-        
-        # Filter chỉ hiển thị những detection có bệnh
-        if disease_only:
-            query = query.filter(DetectionHistory.disease_detected == True)
-        
-        # Sắp xếp theo thời gian mới nhất
-        query = query.order_by(DetectionHistory.timestamp.desc())
-        
-        # Phân trang
-        paginated = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
-        
-        # Chuyển đổi thành dictionary
-        history_items = [item.to_dict() for item in paginated.items]
+        page = list_detections(per_page=per_page, cursor=cursor, method=method,
+                               disease_only=disease_only, include_total=include_total)
+        return current_app.response_class(history_response_body(page), mimetype='application/json')
         
+    except ValidationError as e:
         return jsonify({
-            'status': 'success',
-            'history': history_items,
-            'total': paginated.total,
-            'pages': paginated.pages,
-            'current_page': page,
-            'per_page': per_page,
-            'has_next': paginated.has_next,
-            'has_prev': paginated.has_prev
-        })
-        
+            'status': 'error',
+            'message': str(e)
+        }), 400
     except Exception as e:
         logger.error(f"Error getting detection history: {str(e)}")
         return jsonify({
@@ -336,26 +406,19 @@ def get_detection_history():
 
 @bp.route('/api/images/download/<filename>', methods=['GET'])
 def serve_download_image(filename):
-    """Serve images from download directory"""
+    """Serve images from download directory (query param size: thumb, small, medium)"""
     try:
-        file_path = os.path.join(DOWNLOAD_DIR, filename)
-        if os.path.exists(file_path):
-            return send_file(file_path)
-        else:
-            return jsonify({'error': 'Image not found'}), 404
+        # send_image answers 404 itself, no separate exists() check
+        return send_image(os.path.join(DOWNLOAD_DIR, filename))
     except Exception as e:
         logger.error(f"Error serving image {filename}: {str(e)}")
         return jsonify({'error': 'Error serving image'}), 500
 
 @bp.route('/api/images/predicted/<filename>', methods=['GET'])
 def serve_predicted_image(filename):
-    """Serve images from predicted directory"""
+    """Serve images from predicted directory (query param size: thumb, small, medium)"""
     try:
-        file_path = os.path.join(PREDICTED_DIR, filename)
-        if os.path.exists(file_path):
-            return send_file(file_path)
-        else:
-            return jsonify({'error': 'Predicted image not found'}), 404
+        return send_image(os.path.join(PREDICTED_DIR, filename))
     except Exception as e:
         logger.error(f"Error serving predicted image {filename}: {str(e)}")
         return jsonify({'error': 'Error serving predicted image'}), 500
@@ -365,9 +428,8 @@ def serve_predicted_image(filename):
 def get_detection_statistics():
     """Lấy thống kê phát hiện bệnh"""
     try:
-        from app.models.detection_history import DetectionStatistics, DetectionHistory
+        from app.models.detection_history import DetectionStatistics
         from datetime import date, timedelta
-        from sqlalchemy import func
         
         # Lấy parameters
         days = request.args.get('days', 7, type=int)  # Default 7 ngày
@@ -376,40 +438,12 @@ def get_detection_statistics():
         end_date = date.today()
         start_date = end_date - timedelta(days=days-1)
         
-        # Lấy thống kê từ bảng DetectionStatistics
+        # Một dòng mỗi ngày, được cập nhật khi lưu từng DetectionHistory (xem detection_stats)
         statistics = DetectionStatistics.query.filter(
             DetectionStatistics.date >= start_date,
             DetectionStatistics.date <= end_date
         ).order_by(DetectionStatistics.date.desc()).all()
-        
-        # Nếu không có dữ liệu trong DetectionStatistics, tạo từ DetectionHistory
-        if not statistics:
-            # Tạo thống kê từ DetectionHistory
-            daily_stats = db.session.query(
-                func.date(DetectionHistory.timestamp).label('date'),
-                func.count(DetectionHistory.id).label('total_detections'),
-                func.sum(func.case([(DetectionHistory.detection_method == 'automatic', 1)], else_=0)).label('automatic'),
-                func.sum(func.case([(DetectionHistory.detection_method == 'manual', 1)], else_=0)).label('manual'),
-                func.sum(func.case([(DetectionHistory.disease_detected == True, 1)], else_=0)).label('diseases'),
-                func.sum(func.case([(DetectionHistory.disease_detected == False, 1)], else_=0)).label('healthy')
-            ).filter(
-                func.date(DetectionHistory.timestamp) >= start_date,
-                func.date(DetectionHistory.timestamp) <= end_date
-            ).group_by(func.date(DetectionHistory.timestamp)).all()
-            
-            # Chuyển đổi thành format response
-            stats_data = []
-            for stat in daily_stats:
-                stats_data.append({
-                    'date': stat.date.isoformat(),
-                    'total_detections': stat.total_detections or 0,
-                    'automatic_detections': stat.automatic or 0,
-                    'manual_detections': stat.manual or 0,
-                    'diseases_detected': stat.diseases or 0,
-                    'healthy_detections': stat.healthy or 0
-                })
-        else:
-            stats_data = [stat.to_dict() for stat in statistics]
+        stats_data = [stat.to_dict() for stat in statistics]
         
         # Tính tổng kết
         total_stats = {
@@ -417,7 +451,10 @@ def get_detection_statistics():
             'total_diseases': sum(s.get('diseases_detected', 0) for s in stats_data),
             'total_healthy': sum(s.get('healthy_detections', 0) for s in stats_data),
             'total_automatic': sum(s.get('automatic_detections', 0) for s in stats_data),
-            'total_manual': sum(s.get('manual_detections', 0) for s in stats_data)
+            'total_manual': sum(s.get('manual_detections', 0) for s in stats_data),
+            'high_severity': sum(s.get('high_severity_count', 0) for s in stats_data),
+            'medium_severity': sum(s.get('medium_severity_count', 0) for s in stats_data),
+            'low_severity': sum(s.get('low_severity_count', 0) for s in stats_data)
         }
         
         return jsonify({
@@ -490,10 +527,3 @@ def serve_test_page():
     except Exception as e:
         return f"Error loading test page: {str(e)}", 500
 
-def _determine_severity(confidence: float) -> str:
-    """Xác định mức độ nghiêm trọng dựa trên confidence score"""
-    if confidence > 0.8:
-        return "high"
-    elif confidence > 0.5:
-        return "medium"
-    return "low"
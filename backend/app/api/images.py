@@ -1,13 +1,13 @@
-import os
-from flask import Blueprint, request, jsonify, send_file, abort
+from flask import Blueprint, request, jsonify
 from datetime import datetime
 from app.services.image_service import (
-    save_image, get_images, get_image_path, delete_image,
+    save_image, get_images, get_image_source, delete_image,
     get_device_image_stats, get_storage_stats
 )
 from app.utils.middleware import rate_limit
 from app.utils import ValidationError, StorageError
 from app.services.cache_service import get_cache_stats, clear_cache
+from app.services.image_derivatives import send_image
 
 bp = Blueprint('images', __name__)
 
@@ -81,13 +81,22 @@ def list_images():
 @bp.route('/api/images/<int:image_id>', methods=['GET'])
 @rate_limit
 def get_image(image_id):
-    """API endpoint để lấy file ảnh"""
+    """API endpoint để lấy file ảnh
+    
+    Query params:
+        size: original (mặc định), thumb, small hoặc medium
+    """
     try:
-        image_path = get_image_path(image_id)
-        if not image_path or not os.path.exists(image_path):
-            abort(404)
+        # Path, ETag and Last-Modified come from metadata; the file itself is not stat'ed here
+        source = get_image_source(image_id)
+        if not source:
+            return jsonify({
+                'success': False,
+                'error': 'Image not found'
+            }), 404
         
-        return send_file(image_path)
+        return send_image(source['path'], key=source['key'], last_modified=source['last_modified'],
+                          mimetype=source['mimetype'])
     except Exception as e:
         return jsonify({
             'success': False,
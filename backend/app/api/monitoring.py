@@ -1,9 +1,17 @@
-import os
-from flask import Blueprint, jsonify, request
+import hmac
+from flask import Blueprint, jsonify, request, send_from_directory
 from datetime import datetime, timedelta
 from app.services.monitoring import mqtt_monitor, get_mqtt_stats, get_storage_stats
+from app.services.storage_accounting import get_storage_breakdown, reconcile_usage
+from app.services.retention import RetentionPolicy, get_retention_job, run_retention_now
 from app.services.timescale import query_sensor_data, get_latest_sensor_values, get_device_states
+from app.services.ingest_spool import get_ingest_spool
+from app.services.device_commands import get_command_stats
+from app.services.profiling import get_profiling_manager
+from app.services.query_log import get_slow_query_log
+from app.config import Config
 from app.utils.middleware import rate_limit
+from app.utils import ValidationError
 
 bp = Blueprint('monitoring', __name__)
 
@@ -13,6 +21,12 @@ def mqtt_stats():
     """Get MQTT connection statistics"""
     try:
         stats = mqtt_monitor.get_stats()
+        
+        # Dedup metrics are only available when this process ingests
+        from app.services.mqtt_client import mqtt_client
+        if mqtt_client is not None and mqtt_client.subscribe:
+            stats['dedup'] = mqtt_client.deduplicator.get_stats()
+        
         return jsonify({
             'success': True,
             'data': stats
@@ -44,34 +58,217 @@ def mqtt_reconnect():
 def storage_status():
     """Get storage usage for images and database"""
     try:
-        total_size = 0
-        total_files = 0
+        return jsonify({
+            'success': True,
+            'data': get_storage_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/monitoring/storage/usage', methods=['GET'])
+@rate_limit
+def storage_usage():
+    """Get image storage counters per device and day"""
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        rows = get_storage_breakdown(
+            device_id=request.args.get('device_id'),
+            start_date=datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None,
+            end_date=datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+        )
+        return jsonify({
+            'success': True,
+            'data': rows
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid date (expected YYYY-MM-DD): {e}'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/monitoring/storage/reconcile', methods=['POST'])
+@rate_limit(limit='2/60')
+def storage_reconcile():
+    """Recompute storage counters from the database and the legacy image tree now"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': {'corrected_rows': reconcile_usage(include_legacy=True)}
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/monitoring/retention', methods=['GET'])
+@rate_limit
+def retention_status():
+    """Get the image retention policy and the last run of the retention job"""
+    job = get_retention_job()
+    return jsonify({
+        'success': True,
+        'data': {
+            'enabled': job is not None,
+            'interval_seconds': job.interval if job else None,
+            'policy': RetentionPolicy.from_config().to_dict(),
+            'last_run': job.last_run if job else None
+        }
+    })
+
+@bp.route('/api/monitoring/retention/run', methods=['POST'])
+@rate_limit(limit='2/60')
+def retention_run():
+    """Run the retention job now (one bounded pass)"""
+    try:
+        result = run_retention_now()
+        if result is None:
+            return jsonify({
+                'success': False,
+                'error': 'Retention job is running in another worker'
+            }), 409
+        return jsonify({
+            'success': True,
+            'data': result
+        })
+    except ValidationError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 403
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/monitoring/device-commands', methods=['GET'])
+@rate_limit
+def device_command_stats():
+    """Get device command counts by state, ack rate and ack latency (query param hours, default 1)"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': get_command_stats(request.args.get('hours', 1, type=float))
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/monitoring/spool', methods=['GET'])
+@rate_limit
+def spool_status():
+    """Get ingest spool depth and replay statistics"""
+    try:
+        spool = get_ingest_spool()
+        return jsonify({
+            'success': True,
+            'data': spool.get_stats() if spool else {'enabled': False, 'message': 'This process does not ingest MQTT readings'}
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/api/monitoring/queries', methods=['GET', 'DELETE'])
+@rate_limit
+def slow_queries():
+    """Get the slowest SQL statements by call site (DELETE resets the table)
+    
+    Query params: order_by (max_ms, total_ms, mean_ms, count), limit
+    """
+    try:
+        query_log = get_slow_query_log()
+        if request.method == 'DELETE':
+            query_log.reset()
+        
+        order_by = request.args.get('order_by', 'max_ms')
+        if order_by not in ('max_ms', 'total_ms', 'mean_ms', 'count'):
+            return jsonify({
+                'success': False,
+                'error': f'Invalid order_by: {order_by}'
+            }), 400
+        limit = min(int(request.args.get('limit', 20)), 200)
         
-        # Calculate image storage
-        for root, _, files in os.walk('data/images'):
-            for file in files:
-                if file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    file_path = os.path.join(root, file)
-                    total_size += os.path.getsize(file_path)
-                    total_files += 1
+        return jsonify({
+            'success': True,
+            'data': {
+                'settings': query_log.get_settings(),
+                'queries': query_log.top(limit, order_by)
+            }
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-        # Get database size
-        if os.path.exists('app/greenhouse.db'):
-            db_size = os.path.getsize('app/greenhouse.db')
-        else:
-            db_size = 0
+def _profiling_access_error():
+    """Return an error response if profiling is disabled or the X-Profile token is missing or wrong"""
+    if get_profiling_manager() is None:
+        return jsonify({
+            'success': False,
+            'error': 'Profiling is disabled (set PROFILING_ENABLED=true and PROFILING_TOKEN)'
+        }), 404
+    header = request.headers.get('X-Profile')
+    if not header or not hmac.compare_digest(header.encode(), Config.PROFILING_TOKEN.encode()):
+        return jsonify({
+            'success': False,
+            'error': 'Invalid profiling token'
+        }), 403
+    return None
 
+@bp.route('/api/monitoring/profiling', methods=['GET', 'POST', 'DELETE'])
+def profiling():
+    """List recent request profiles, arm profiling for upcoming requests or disarm it
+    
+    POST body: {"path_prefix": "/api/sensors/visualization", "count": 5}
+    """
+    error = _profiling_access_error()
+    if error:
+        return error
+    
+    manager = get_profiling_manager()
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            count = int(data.get('count', 1))
+            if count < 1 or count > 100:
+                return jsonify({
+                    'success': False,
+                    'error': 'count must be between 1 and 100'
+                }), 400
+            rule = manager.arm(data.get('path_prefix') or '/', count)
+            return jsonify({
+                'success': True,
+                'data': rule
+            })
+        
+        if request.method == 'DELETE':
+            manager.disarm()
+        
         return jsonify({
             'success': True,
             'data': {
-                'images': {
-                    'total_files': total_files,
-                    'total_size_mb': round(total_size / (1024 * 1024), 2)
-                },
-                'database': {
-                    'total_size_mb': round(db_size / (1024 * 1024), 2)
-                },
-                'total_size_mb': round((total_size + db_size) / (1024 * 1024), 2)
+                'armed': manager.armed(),
+                'profiles': manager.list_profiles()
             }
         })
     except Exception as e:
@@ -80,6 +277,16 @@ def storage_status():
             'error': str(e)
         }), 500
 
+@bp.route('/api/monitoring/profiling/<name>', methods=['GET'])
+def profiling_file(name):
+    """Download a speedscope profile (?format=summary for SQL timings)"""
+    error = _profiling_access_error()
+    if error:
+        return error
+    
+    suffix = '.json' if request.args.get('format') == 'summary' else '.speedscope.json'
+    return send_from_directory(get_profiling_manager().output_dir, f"{name}{suffix}")
+
 @bp.route('/mqtt-stats', methods=['GET'])
 def mqtt_stats_simplified():
     """Get simplified MQTT connection and message statistics"""
@@ -2,8 +2,10 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy import create_engine, text
 from datetime import datetime, timedelta
 from app.config import Config
+from app.models.messages import decode_sensor_save
 from app.services.mqtt_client import get_mqtt_client
 import logging
+import msgspec
 
 bp = Blueprint('sensors', __name__)
 engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
@@ -232,11 +234,17 @@ def get_sensor_stats():
 def save_sensor():
     """API endpoint để lưu dữ liệu cảm biến"""
     try:
-        data = request.get_json()
-        if 'device_id' not in data or 'sensor_type' not in data or 'value' not in data:
+        try:
+            data = decode_sensor_save(request.get_data())
+        except msgspec.ValidationError as e:
             return jsonify({
                 'success': False,
-                'error': 'Thiếu thông tin cần thiết trong request body'
+                'error': f'Thiếu thông tin cần thiết trong request body: {e}'
+            }), 400
+        except msgspec.DecodeError as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid sensor data: {e}'
             }), 400
 
         with engine.begin() as conn:
@@ -247,7 +255,7 @@ def save_sensor():
                     VALUES (:device_id, :sensor_type, :value, CURRENT_TIMESTAMP)
                     RETURNING device_id, sensor_type, value, time;
                 """),
-                {'device_id': data['device_id'], 'sensor_type': data['sensor_type'], 'value': data['value']}
+                {'device_id': data.device_id, 'sensor_type': data.sensor_type, 'value': data.value}
             )
             
             sensor_data = result.fetchone()
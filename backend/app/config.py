@@ -13,6 +13,14 @@ class Config:
     MQTT_USERNAME = os.environ.get('MQTT_USERNAME') or None
     MQTT_PASSWORD = os.environ.get('MQTT_PASSWORD') or None
     
+    # MQTT ingest: Flask workers are publish-only by default, readings are
+    # consumed by ingest_worker.py through a shared subscription group
+    MQTT_APP_INGEST = (os.environ.get('MQTT_APP_INGEST') or 'false').lower() == 'true'
+    MQTT_SHARE_GROUP = os.environ.get('MQTT_SHARE_GROUP') or 'greenhouse-ingest'
+    MQTT_INGEST_QOS = int(os.environ.get('MQTT_INGEST_QOS') or 1)
+    MQTT_DEDUP_WINDOW = int(os.environ.get('MQTT_DEDUP_WINDOW') or 600)  # seconds
+    MQTT_DEDUP_MAX_ENTRIES = int(os.environ.get('MQTT_DEDUP_MAX_ENTRIES') or 50000)
+    
     MQTT_TOPICS = {
         # Sensor topics
         'temperature': 'greenhouse/sensors/temperature',
@@ -35,7 +43,102 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'images')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png'}
+    # Gallery derivatives (thumb/small/medium WebP) served via ?size=
+    DERIVATIVES_ENABLED = (os.environ.get('DERIVATIVES_ENABLED') or 'true').lower() == 'true'
+    DERIVATIVE_DIR = os.environ.get('DERIVATIVE_DIR') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'derivatives')
+    IMAGE_CACHE_MAX_AGE = int(os.environ.get('IMAGE_CACHE_MAX_AGE') or 30 * 24 * 3600)  # seconds, revalidated by ETag
+    # Hand image bodies to the web server: nginx X-Accel-Redirect (prefix of an internal location
+    # aliased to IMAGE_ACCEL_ROOT) or X-Sendfile for Apache/lighttpd
+    IMAGE_ACCEL_REDIRECT_PREFIX = os.environ.get('IMAGE_ACCEL_REDIRECT_PREFIX') or ''
+    IMAGE_ACCEL_ROOT = os.environ.get('IMAGE_ACCEL_ROOT') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+    USE_X_SENDFILE = (os.environ.get('USE_X_SENDFILE') or 'false').lower() == 'true'
+    # Content-addressed image store (data/blobs/ab/cd/<sha256>)
+    BLOB_STORE_DIR = os.environ.get('BLOB_STORE_DIR') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'blobs')
+    BLOB_GC_GRACE_SECONDS = int(os.environ.get('BLOB_GC_GRACE_SECONDS') or 3600)  # unreferenced blobs kept this long
+    # Storage counters reconcile (also runs blob GC and removes orphan files)
+    STORAGE_RECONCILE_ENABLED = (os.environ.get('STORAGE_RECONCILE_ENABLED') or 'true').lower() == 'true'
+    STORAGE_RECONCILE_INTERVAL_SECONDS = int(os.environ.get('STORAGE_RECONCILE_INTERVAL_SECONDS') or 6 * 3600)
+    # Image retention (days, 0 = keep forever): full-res -> recompressed archive -> deleted
+    # Off by default: a pass deletes and recompresses data, enable it deliberately
+    RETENTION_ENABLED = (os.environ.get('RETENTION_ENABLED') or 'false').lower() == 'true'
+    RETENTION_INTERVAL_SECONDS = int(os.environ.get('RETENTION_INTERVAL_SECONDS') or 3600)
+    RETENTION_FULL_RES_DAYS = int(os.environ.get('RETENTION_FULL_RES_DAYS') or 30)
+    RETENTION_HEALTHY_DAYS = int(os.environ.get('RETENTION_HEALTHY_DAYS') or 90)  # detections without disease
+    RETENTION_DETECTION_DAYS = int(os.environ.get('RETENTION_DETECTION_DAYS') or 0)  # every detection
+    RETENTION_IMAGE_DAYS = int(os.environ.get('RETENTION_IMAGE_DAYS') or 180)  # image_metadata uploads/captures
+    RETENTION_DERIVATIVE_DAYS = int(os.environ.get('RETENTION_DERIVATIVE_DAYS') or 30)
+    RETENTION_ARCHIVE_MAX_SIDE = int(os.environ.get('RETENTION_ARCHIVE_MAX_SIDE') or 800)
+    RETENTION_ARCHIVE_QUALITY = int(os.environ.get('RETENTION_ARCHIVE_QUALITY') or 70)
+    RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE') or 200)
+    RETENTION_MAX_BATCHES = int(os.environ.get('RETENTION_MAX_BATCHES') or 50)  # per run, spreads the work
     
+    # Ingest spool (buffers sensor readings while TimescaleDB is unavailable)
+    INGEST_SPOOL_ENABLED = (os.environ.get('INGEST_SPOOL_ENABLED') or 'true').lower() == 'true'
+    INGEST_SPOOL_PATH = os.environ.get('INGEST_SPOOL_PATH') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'spool', 'ingest.db')
+    INGEST_SPOOL_MAX_ROWS = int(os.environ.get('INGEST_SPOOL_MAX_ROWS') or 1000000)
+    INGEST_SPOOL_MAX_MB = int(os.environ.get('INGEST_SPOOL_MAX_MB') or 256)
+    INGEST_SPOOL_FSYNC = os.environ.get('INGEST_SPOOL_FSYNC') or 'normal'  # off, normal, full
+    INGEST_SPOOL_BATCH_SIZE = int(os.environ.get('INGEST_SPOOL_BATCH_SIZE') or 500)
+
+    # Logging (records are handed to a background writer thread)
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE') or 10000)
+    LOG_RATE_LIMIT = int(os.environ.get('LOG_RATE_LIMIT') or 10)  # INFO/DEBUG records per call site per second
+    LOG_RATE_LIMITED_LOGGERS = (os.environ.get('LOG_RATE_LIMITED_LOGGERS') or
+                                'app.services.timescale,app.services.mqtt_client').split(',')
+
+    # API rate limiting: token bucket per client IP (app/utils/middleware.py)
+    RATE_LIMIT_ENABLED = (os.environ.get('RATE_LIMIT_ENABLED') or 'true').lower() == 'true'
+    RATE_LIMIT_DEFAULT = os.environ.get('RATE_LIMIT_DEFAULT') or '60/60'  # tokens/seconds, shared by routes without their own limit
+    RATE_LIMIT_ROUTES = os.environ.get('RATE_LIMIT_ROUTES') or ''  # "endpoint=limit/seconds,..." overrides
+    RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS') or 10000)  # least recently used buckets are evicted
+    RATE_LIMIT_LOCK_STRIPES = int(os.environ.get('RATE_LIMIT_LOCK_STRIPES') or 16)
+    RATE_LIMIT_REDIS_URL = os.environ.get('RATE_LIMIT_REDIS_URL') or ''  # share buckets across workers/hosts (needs redis)
+
+    # Device command outbox (app/services/device_commands.py), dispatched by one worker per host
+    DEVICE_COMMAND_DISPATCHER_ENABLED = (os.environ.get('DEVICE_COMMAND_DISPATCHER_ENABLED') or 'true').lower() == 'true'
+    DEVICE_COMMAND_POLL_SECONDS = float(os.environ.get('DEVICE_COMMAND_POLL_SECONDS') or 0.5)
+    DEVICE_COMMAND_BATCH_SIZE = int(os.environ.get('DEVICE_COMMAND_BATCH_SIZE') or 50)
+    DEVICE_COMMAND_MAX_ATTEMPTS = int(os.environ.get('DEVICE_COMMAND_MAX_ATTEMPTS') or 5)
+    DEVICE_COMMAND_RETRY_SECONDS = float(os.environ.get('DEVICE_COMMAND_RETRY_SECONDS') or 2)  # doubled after each failed publish
+    DEVICE_COMMAND_ACK_TIMEOUT_SECONDS = float(os.environ.get('DEVICE_COMMAND_ACK_TIMEOUT_SECONDS') or 30)
+    DEVICE_COMMAND_QOS = int(os.environ.get('DEVICE_COMMAND_QOS') or 1)
+
+    # Request profiling (opt-in, see app/services/profiling.py)
+    PROFILING_ENABLED = (os.environ.get('PROFILING_ENABLED') or 'false').lower() == 'true'
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN') or None  # value of the X-Profile header
+    PROFILING_DIR = os.environ.get('PROFILING_DIR') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'profiles')
+    PROFILING_INTERVAL_MS = float(os.environ.get('PROFILING_INTERVAL_MS') or 5)
+    PROFILING_MAX_FILES = int(os.environ.get('PROFILING_MAX_FILES') or 50)
+
+    # Slow-query log (GET /api/monitoring/queries)
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS') or 200)
+    SLOW_QUERY_EXPLAIN_MS = float(os.environ.get('SLOW_QUERY_EXPLAIN_MS') or 500)
+    SLOW_QUERY_EXPLAIN_ENABLED = (os.environ.get('SLOW_QUERY_EXPLAIN_ENABLED') or 'true').lower() == 'true'
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.environ.get('SLOW_QUERY_EXPLAIN_TIMEOUT_MS') or 30000)
+    SLOW_QUERY_MAX_ENTRIES = int(os.environ.get('SLOW_QUERY_MAX_ENTRIES') or 500)
+
+    # Disease detection: load torch/YOLO/ResNet at startup instead of on the first request
+    AI_PRELOAD = (os.environ.get('AI_PRELOAD') or 'false').lower() == 'true'
+    # Shared inference server (inference_server.py); empty runs detection inside each API worker
+    INFERENCE_SERVER_ADDRESS = os.environ.get('INFERENCE_SERVER_ADDRESS') or ''  # socket path or host:port
+    INFERENCE_AUTHKEY = os.environ.get('INFERENCE_AUTHKEY') or ''  # required whenever INFERENCE_SERVER_ADDRESS is set
+    INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT') or 120)
+    INFERENCE_MAX_BATCH = int(os.environ.get('INFERENCE_MAX_BATCH') or 8)
+    INFERENCE_BATCH_WAIT_MS = float(os.environ.get('INFERENCE_BATCH_WAIT_MS') or 20)
+
+    # ESP32-CAM registry: "id=host[:port],..." (see camera_service.parse_cameras)
+    CAMERAS = os.environ.get('CAMERAS') or 'default=192.168.141.171'
+    CAMERA_CAPTURE_WORKERS = int(os.environ.get('CAMERA_CAPTURE_WORKERS') or 8)
+    CAMERA_PROBE_PATH = os.environ.get('CAMERA_PROBE_PATH') or '/status'  # lightweight endpoint of the camera web server
+    # Firmware without the probe endpoint answers 404; count that as online only when opted in
+    CAMERA_PROBE_ACCEPT_404 = (os.environ.get('CAMERA_PROBE_ACCEPT_404') or 'false').lower() == 'true'
+
     # Sensor Data Configuration
     SENSOR_READ_INTERVAL = timedelta(minutes=30)
-    IMAGE_CAPTURE_INTERVAL = timedelta(hours=1)
\ No newline at end of file
+    IMAGE_CAPTURE_INTERVAL = timedelta(seconds=int(os.environ.get('IMAGE_CAPTURE_INTERVAL_SECONDS') or 3600))
+
+    # Automatic capture-and-analyze pipeline (app/services/capture_pipeline.py)
+    AUTO_CAPTURE_ENABLED = (os.environ.get('AUTO_CAPTURE_ENABLED') or 'false').lower() == 'true'
+    AUTO_CAPTURE_HASH_THRESHOLD = int(os.environ.get('AUTO_CAPTURE_HASH_THRESHOLD') or 5)  # max dHash bits changed to count as the same frame
+    AUTO_CAPTURE_QUEUE_SIZE = int(os.environ.get('AUTO_CAPTURE_QUEUE_SIZE') or 32)
+    AUTO_CAPTURE_RESOLUTION = os.environ.get('AUTO_CAPTURE_RESOLUTION') or 'UXGA'
\ No newline at end of file
@@ -1,3 +1,5 @@
 from app.models.image import ImageMetadata
+from app.models.blob import Blob
+from app.models.storage_usage import StorageUsage
 
-__all__ = ['ImageMetadata']
\ No newline at end of file
+__all__ = ['ImageMetadata', 'Blob', 'StorageUsage']
\ No newline at end of file
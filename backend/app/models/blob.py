@@ -0,0 +1,24 @@
+from datetime import datetime
+from app import db
+
+class Blob(db.Model):
+    """Một file ảnh trong blob store, đếm số bản ghi đang tham chiếu"""
+    __tablename__ = 'blobs'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    content_type = db.Column(db.String(50))
+    device_id = db.Column(db.String(50))  # thiết bị ghi blob đầu tiên, dùng cho thống kê dung lượng
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_referenced_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'sha256': self.sha256,
+            'size': self.size,
+            'content_type': self.content_type,
+            'device_id': self.device_id,
+            'refcount': self.refcount,
+            'created_at': self.created_at.isoformat()
+        }
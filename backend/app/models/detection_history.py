@@ -3,23 +3,33 @@ Database models for disease detection
 """
 from app import db
 from datetime import datetime
-import json
 from typing import List, Dict, Any
+from sqlalchemy.dialects.postgresql import JSONB
 
 class DetectionHistory(db.Model):
     """Database model for storing disease detection history"""
     
     __tablename__ = 'detection_history'
+    # Keyset pagination đi theo (timestamp, id) giảm dần, mỗi bộ lọc có index riêng
+    __table_args__ = (
+        db.Index('idx_detection_history_ts_id', 'timestamp', 'id'),
+        db.Index('idx_detection_history_method_ts_id', 'detection_method', 'timestamp', 'id'),
+        db.Index('idx_detection_history_disease_ts_id', 'disease_detected', 'timestamp', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     original_image_path = db.Column(db.String(255), nullable=False)
     predicted_image_path = db.Column(db.String(255), nullable=True)
+    original_blob = db.Column(db.String(64), db.ForeignKey('blobs.sha256'), nullable=True, index=True)
+    predicted_blob = db.Column(db.String(64), db.ForeignKey('blobs.sha256'), nullable=True, index=True)
+    archived_at = db.Column(db.DateTime, nullable=True)  # original recompressed by the retention job
     detection_method = db.Column(db.String(50), nullable=False)  # 'automatic' or 'manual'
     camera_status = db.Column(db.String(20), nullable=True)  # 'online', 'offline'
     
-    # AI Results stored as JSON
-    ai_results_json = db.Column(db.Text, nullable=False)
+    # AI Results stored as JSONB (JSON on other databases), decoded by the driver
+    ai_results_data = db.Column('ai_results', db.JSON().with_variant(JSONB(), 'postgresql'),
+                                nullable=False, default=list)
     
     # Summary statistics
     total_leaves_detected = db.Column(db.Integer, default=0)
@@ -36,18 +46,13 @@ class DetectionHistory(db.Model):
     
     @property
     def ai_results(self) -> List[Dict[str, Any]]:
-        """Parse AI results from JSON"""
-        if self.ai_results_json:
-            try:
-                return json.loads(self.ai_results_json)
-            except json.JSONDecodeError:
-                return []
-        return []
+        """AI results as a list"""
+        return self.ai_results_data or []
     
     @ai_results.setter
     def ai_results(self, results: List[Dict[str, Any]]):
-        """Store AI results as JSON"""
-        self.ai_results_json = json.dumps(results) if results else "[]"
+        """Store AI results and update the summary columns"""
+        self.ai_results_data = list(results) if results else []
         
         # Update summary statistics
         if results:
@@ -68,16 +73,18 @@ class DetectionHistory(db.Model):
                 self.confidence_score = best_result.get('confidence', 0.0)
                 self.severity = best_result.get('severity', 'low')
     
-    def to_dict(self) -> Dict[str, Any]:
+    def to_dict(self, include_ai_results: bool = True) -> Dict[str, Any]:
         """Convert to dictionary for JSON response"""
-        return {
+        data = {
             'id': self.id,
             'timestamp': self.timestamp.isoformat(),
             'original_image_path': self.original_image_path,
             'predicted_image_path': self.predicted_image_path,
+            'original_blob': self.original_blob,
+            'predicted_blob': self.predicted_blob,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None,
             'detection_method': self.detection_method,
             'camera_status': self.camera_status,
-            'ai_results': self.ai_results,
             'total_leaves_detected': self.total_leaves_detected,
             'max_confidence': self.max_confidence,
             'disease_detected': self.disease_detected,
@@ -85,6 +92,9 @@ class DetectionHistory(db.Model):
             'confidence_score': self.confidence_score,
             'severity': self.severity
         }
+        if include_ai_results:
+            data['ai_results'] = self.ai_results
+        return data
     
     def __repr__(self):
         return f'<DetectionHistory {self.id}: {self.predicted_class} ({self.confidence_score:.2f})>'
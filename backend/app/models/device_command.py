@@ -0,0 +1,47 @@
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+from app import db
+
+class DeviceCommand(db.Model):
+    """Outbox lệnh điều khiển thiết bị, ghi cùng transaction với device_states
+
+    status: pending -> sent -> acked | timed_out, hoặc failed sau khi hết số lần gửi lại
+    """
+    __tablename__ = 'device_commands'
+    __table_args__ = (
+        db.Index('idx_device_commands_pending', 'status', 'next_attempt_at'),
+        db.Index('idx_device_commands_device', 'device_id', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    command_id = db.Column(db.String(32), nullable=False, unique=True)  # sent in the payload
+    device_id = db.Column(db.String(50), nullable=False)
+    device_type = db.Column(db.String(20), nullable=False)
+    topic = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON().with_variant(JSONB(), 'postgresql'), nullable=False)
+    desired_status = db.Column(db.String(20), nullable=False)  # device_states format: 'true'/'false'/OPEN/HALF/CLOSED
+    previous_status = db.Column(db.String(20), nullable=True)  # restored in device_states if the command fails
+    source = db.Column(db.String(20), nullable=False, default='manual')  # manual, schedule, auto
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)  # acked, timed out or failed
+
+    def to_dict(self):
+        return {
+            'command_id': self.command_id,
+            'device_id': self.device_id,
+            'device_type': self.device_type,
+            'desired_status': self.desired_status,
+            'previous_status': self.previous_status,
+            'source': self.source,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat(),
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
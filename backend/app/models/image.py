@@ -9,6 +9,8 @@ class ImageMetadata(db.Model):
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     image_path = db.Column(db.String(255), nullable=False, unique=True)
     file_type = db.Column(db.String(10), default='jpg')
+    content_hash = db.Column(db.String(64), db.ForeignKey('blobs.sha256'), index=True)
+    archived_at = db.Column(db.DateTime, nullable=True)  # ảnh gốc đã được nén lại theo chính sách lưu trữ
     
     def to_dict(self):
         return {
@@ -16,7 +18,9 @@ class ImageMetadata(db.Model):
             'device_id': self.device_id,
             'timestamp': self.timestamp.isoformat(),
             'image_path': self.image_path,
-            'file_type': self.file_type
+            'file_type': self.file_type,
+            'content_hash': self.content_hash,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None
         }
         
     @staticmethod
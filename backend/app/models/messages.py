@@ -0,0 +1,149 @@
+"""
+Message schemas for MQTT ingest and the sensor save API
+
+Payloads are decoded straight from bytes into msgspec structs. The batch
+envelope is parsed once and each element is kept as a raw slice, so one bad
+element is reported with its field path while the rest of the batch is still
+decoded.
+"""
+from typing import List, Optional, Tuple, Union
+
+import msgspec
+
+DEVICE_TYPES = ('pump', 'fan', 'cover')
+COVER_POSITIONS = ('OPEN', 'HALF', 'CLOSED')
+
+
+class SensorReading(msgspec.Struct, gc=False):
+    """One element of the ``sensors`` list on greenhouse/sensors/"""
+    type: str
+    device_id: str
+    value: float
+    time: str
+
+    def __post_init__(self):
+        self.type = self.type.lower()
+
+    def to_record(self) -> dict:
+        """Format reading for ``save_sensor_data``"""
+        return {
+            'device_id': self.device_id,
+            'sensor_type': self.type,
+            'value': self.value,
+            'timestamp': self.time
+        }
+
+
+class DeviceStatus(msgspec.Struct, gc=False):
+    """One element of the ``devices`` list on greenhouse/devices/
+
+    Pump and fan status is normalised to ``bool``, cover status to one of
+    OPEN/HALF/CLOSED.
+    """
+    type: str
+    device_id: str
+    status: Union[bool, str]
+    time: str
+    command_id: Optional[str] = None  # echoed from the control command this report answers
+
+    def __post_init__(self):
+        self.type = self.type.lower()
+        if self.type not in DEVICE_TYPES:
+            raise ValueError(f"Invalid device type: {self.type}")
+
+        if self.type in ('pump', 'fan'):
+            if isinstance(self.status, str):
+                self.status = self.status.lower() == 'true'
+        else:
+            if not isinstance(self.status, str):
+                raise ValueError(f"Invalid cover status type: {type(self.status).__name__}")
+            self.status = self.status.upper()
+            if self.status not in COVER_POSITIONS:
+                raise ValueError(f"Invalid cover position: {self.status}")
+
+    def to_record(self) -> dict:
+        """Format status for ``_update_device_state``"""
+        return {
+            'device_id': self.device_id,
+            'type': self.type,
+            'status': self.status,
+            'time': self.time,
+            'command_id': self.command_id
+        }
+
+
+class SensorBatch(msgspec.Struct):
+    sensors: List[SensorReading]
+
+
+class DeviceBatch(msgspec.Struct):
+    devices: List[DeviceStatus]
+
+
+class SensorSaveRequest(msgspec.Struct, gc=False):
+    """Request body for POST /api/sensors/save"""
+    device_id: str
+    sensor_type: str
+    value: float
+    timestamp: Optional[str] = None
+
+
+class _RawSensorBatch(msgspec.Struct):
+    sensors: List[msgspec.Raw]
+
+
+class _RawDeviceBatch(msgspec.Struct):
+    devices: List[msgspec.Raw]
+
+
+# Decoders are reusable and thread-safe; strict=False keeps accepting numeric
+# strings such as "25.3" for values, like the old float() conversion did.
+_sensor_envelope = msgspec.json.Decoder(_RawSensorBatch)
+_device_envelope = msgspec.json.Decoder(_RawDeviceBatch)
+_sensor_decoder = msgspec.json.Decoder(SensorReading, strict=False)
+_device_decoder = msgspec.json.Decoder(DeviceStatus, strict=False)
+_save_decoder = msgspec.json.Decoder(SensorSaveRequest, strict=False)
+
+_encoder = msgspec.json.Encoder()
+
+
+def _decode_elements(raw_items, decoder) -> Tuple[list, List[dict]]:
+    items = []
+    errors = []
+    for index, raw in enumerate(raw_items):
+        try:
+            items.append(decoder.decode(raw))
+        except msgspec.ValidationError as e:
+            errors.append({'index': index, 'error': str(e)})
+    return items, errors
+
+
+def decode_sensor_batch(payload: bytes) -> Tuple[List[SensorReading], List[dict]]:
+    """Decode a greenhouse/sensors/ payload
+
+    Returns:
+        (readings, errors) where errors lists ``{'index', 'error'}`` for each
+        element that failed validation
+
+    Raises:
+        msgspec.DecodeError: If the payload is not JSON
+        msgspec.ValidationError: If the ``sensors`` list is missing
+    """
+    envelope = _sensor_envelope.decode(payload)
+    return _decode_elements(envelope.sensors, _sensor_decoder)
+
+
+def decode_device_batch(payload: bytes) -> Tuple[List[DeviceStatus], List[dict]]:
+    """Decode a greenhouse/devices/ payload, see ``decode_sensor_batch``"""
+    envelope = _device_envelope.decode(payload)
+    return _decode_elements(envelope.devices, _device_decoder)
+
+
+def decode_sensor_save(payload: bytes) -> SensorSaveRequest:
+    """Decode and validate a /api/sensors/save request body"""
+    return _save_decoder.decode(payload)
+
+
+def encode(message) -> bytes:
+    """Encode a struct (or batch) to JSON bytes for publishing"""
+    return _encoder.encode(message)
@@ -0,0 +1,26 @@
+from datetime import datetime
+from app import db
+
+class StorageUsage(db.Model):
+    """Bộ đếm dung lượng ảnh theo thiết bị và ngày, cập nhật khi ghi/xóa ảnh
+
+    file_count/total_bytes: file thực tế trong blob store (ảnh trùng chỉ tính một lần)
+    image_count: số bản ghi image_metadata
+    """
+    __tablename__ = 'storage_usage'
+
+    device_id = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    file_count = db.Column(db.BigInteger, nullable=False, default=0)
+    total_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    image_count = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'device_id': self.device_id,
+            'day': self.day.isoformat(),
+            'file_count': self.file_count,
+            'total_bytes': self.total_bytes,
+            'image_count': self.image_count
+        }
@@ -4,14 +4,17 @@ Integrated into Greenhouse Backend
 """
 
 import os
+import time
 import cv2
 import numpy as np
 import torch
 import torch.nn as nn
 from torchvision import models, transforms
 from ultralytics import YOLO
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
+from app.services.metrics import ai_inference_duration
+from app.services.profiling import profile_section
 
 logger = logging.getLogger(__name__)
 
@@ -103,85 +106,170 @@ priority = {
     'Healthy-Leaf': 5
 }
 
-def process_leaf_image(image_path: str) -> List[Dict]:
-    """Process image and predict leaf diseases"""
+def record_stage(timings: Dict, stage: str, started: float) -> None:
+    """Add the time since ``started`` (in ms) to a stage; per-leaf stages accumulate"""
+    timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - started) * 1000
+
+def format_timings(timings: Dict) -> str:
+    return ' '.join(
+        f"{stage}={value:.1f}ms" if isinstance(value, float) else f"{stage}={value}"
+        for stage, value in timings.items()
+    )
+
+def process_leaf_image(image_path: str, timings: Optional[Dict] = None) -> List[Dict]:
+    """Process image and predict leaf diseases
+
+    Stage durations in ms (decode, detect, preprocess, classify, total) and
+    the leaf count are written to ``timings`` when a dict is passed.
+    """
+    return process_leaf_images([image_path], [timings if timings is not None else {}])[0]
+
+def process_leaf_images(image_paths: List[str], timings: Optional[List[Dict]] = None) -> List[List[Dict]]:
+    """Process several images with one YOLO call and one ResNet forward pass
+
+    Returns one result list per image, in order. Batch stages (detect,
+    classify) report the whole batch's duration for every image in it.
+    """
+    timings = timings if timings is not None else [{} for _ in image_paths]
+    started = time.perf_counter()
+    with profile_section('inference'):
+        results = _process_leaf_images(image_paths, timings)
+
+    batch_timings = {}
+    for image_path, image_timings in zip(image_paths, timings):
+        record_stage(image_timings, 'total', started)
+        if len(image_paths) > 1:
+            image_timings['batch_size'] = len(image_paths)
+        logger.info("AI timings for %s: %s", os.path.basename(image_path), format_timings(image_timings))
+        for stage, value in image_timings.items():
+            if isinstance(value, float):
+                batch_timings[stage] = max(batch_timings.get(stage, 0.0), value)
+    for stage, value in batch_timings.items():
+        ai_inference_duration.observe(value / 1000, stage=stage)
+    return results
+
+def decode_image(image_path: str) -> np.ndarray:
+    """Read an image file as RGB"""
+    img = cv2.imread(image_path)
+    if img is None:
+        raise Exception(f"Cannot read image at: {image_path}")
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+def crop_leaves(img: np.ndarray, boxes: np.ndarray) -> List[torch.Tensor]:
+    """Crop each detected leaf and apply the classifier transform"""
+    h, w = img.shape[:2]
+    tensors = []
+    for box in boxes:
+        x1, y1, x2, y2 = map(int, box)
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        tensors.append(transform(img[y1:y2, x1:x2]))
+    return tensors
+
+def classify_leaves(tensors: List[torch.Tensor]) -> List[tuple]:
+    """(class name, confidence) for each leaf tensor, in one forward pass"""
+    if not tensors:
+        return []
+    with torch.no_grad():
+        output = resnet_model(torch.stack(tensors).to(device))
+        probabilities = torch.softmax(output, dim=1)
+        confidences, pred_classes = probabilities.max(dim=1)
+    return [(class_names[int(c)], float(p)) for c, p in zip(pred_classes.cpu(), confidences.cpu())]
+
+def summarize_leaves(predictions: List[tuple]) -> List[Dict]:
+    """Report the highest-priority disease among a plant's leaves"""
+    if not predictions:
+        return [{"predicted_class": "Plant status: No leaves detected", "confidence": 0.0}]
+
+    # Dictionary to count frequency and total confidence for each disease
+    disease_scores = {name: {"count": 0, "total_confidence": 0.0, "avg_confidence": 0.0} for name in class_names}
+    for disease_name, confidence in predictions:
+        disease_scores[disease_name]["count"] += 1
+        disease_scores[disease_name]["total_confidence"] += confidence
+
+    # Calculate average confidence for each disease
+    for disease in disease_scores:
+        if disease_scores[disease]["count"] > 0:
+            disease_scores[disease]["avg_confidence"] = (
+                disease_scores[disease]["total_confidence"] / disease_scores[disease]["count"]
+            )
+
+    # Find the highest priority disease among detected diseases
+    detected_diseases = [disease for disease in disease_scores if disease_scores[disease]["count"] > 0]
+    if not detected_diseases:
+        return [{"predicted_class": "Plant status: No diseases detected", "confidence": 0.0}]
+
+    # Sort by priority and get the highest priority disease
+    highest_priority_disease = min(detected_diseases, key=lambda x: priority[x])
+    
+    # Create detailed result
+    result = {
+        "predicted_class": f"Plant status: {highest_priority_disease}",
+        "confidence": float(disease_scores[highest_priority_disease]["avg_confidence"]),
+        "details": f"Detected {disease_scores[highest_priority_disease]['count']} out of {len(predictions)} leaves"
+    }
+
+    logger.info(f"AI analysis completed: {result['predicted_class']} with confidence {result['confidence']:.2f}")
+    return [result]
+
+def _process_leaf_images(image_paths: List[str], timings: List[Dict]) -> List[List[Dict]]:
     global yolo_model, resnet_model
     
     # Initialize models if not already loaded
     if yolo_model is None or resnet_model is None:
-        if not initialize_models():
-            return [{"predicted_class": "Error: Cannot initialize AI models", "confidence": 0.0}]
+        stage_start = time.perf_counter()
+        loaded = initialize_models()
+        for image_timings in timings:
+            record_stage(image_timings, 'model_load', stage_start)
+        if not loaded:
+            return [[{"predicted_class": "Error: Cannot initialize AI models", "confidence": 0.0}] for _ in image_paths]
     
-    try:
-        # Read and convert image
-        img = cv2.imread(image_path)
-        if img is None:
-            raise Exception(f"Cannot read image at: {image_path}")
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        h, w = img.shape[:2]
-    except Exception as e:
-        logger.error(f"Error reading image: {e}")
-        return [{"predicted_class": "Error: Cannot read image", "confidence": 0.0}]
+    results = [None] * len(image_paths)
+    images = {}
+    for index, image_path in enumerate(image_paths):
+        stage_start = time.perf_counter()
+        try:
+            # Read and convert image
+            images[index] = decode_image(image_path)
+        except Exception as e:
+            logger.error(f"Error reading image: {e}")
+            results[index] = [{"predicted_class": "Error: Cannot read image", "confidence": 0.0}]
+        record_stage(timings[index], 'decode', stage_start)
+
+    if not images:
+        return results
 
     try:
         # Detect leaves using YOLO
-        results = yolo_model.predict(source=img, imgsz=640, conf=0.5)
-        boxes = results[0].boxes.xyxy.cpu().numpy()
-        confidences = results[0].boxes.conf.cpu().numpy()
-
-        if len(boxes) == 0:
-            return [{"predicted_class": "Plant status: No leaves detected", "confidence": 0.0}]
-
-        # Dictionary to count frequency and total confidence for each disease
-        disease_scores = {name: {"count": 0, "total_confidence": 0.0, "avg_confidence": 0.0} for name in class_names}
-        total_leaves = 0
-
-        # Process each detected leaf
-        for i, box in enumerate(boxes):
-            x1, y1, x2, y2 = map(int, box)
-            x1, y1 = max(0, x1), max(0, y1)
-            x2, y2 = min(w, x2), min(h, y2)
-            
-            leaf = img[y1:y2, x1:x2]
-            
-            # Preprocess and predict
-            input_tensor = transform(leaf).unsqueeze(0).to(device)
-            with torch.no_grad():
-                output = resnet_model(input_tensor)
-                probabilities = torch.softmax(output, dim=1)
-                pred_class = torch.argmax(output, dim=1).item()
-                confidence = float(probabilities[0][pred_class])
-            
-            disease_name = class_names[pred_class]
-            disease_scores[disease_name]["count"] += 1
-            disease_scores[disease_name]["total_confidence"] += confidence
-            total_leaves += 1
-
-        # Calculate average confidence for each disease
-        for disease in disease_scores:
-            if disease_scores[disease]["count"] > 0:
-                disease_scores[disease]["avg_confidence"] = (
-                    disease_scores[disease]["total_confidence"] / disease_scores[disease]["count"]
-                )
-
-        # Find the highest priority disease among detected diseases
-        detected_diseases = [disease for disease in disease_scores if disease_scores[disease]["count"] > 0]
-        if not detected_diseases:
-            return [{"predicted_class": "Plant status: No diseases detected", "confidence": 0.0}]
-
-        # Sort by priority and get the highest priority disease
-        highest_priority_disease = min(detected_diseases, key=lambda x: priority[x])
-        
-        # Create detailed result
-        result = {
-            "predicted_class": f"Plant status: {highest_priority_disease}",
-            "confidence": float(disease_scores[highest_priority_disease]["avg_confidence"]),
-            "details": f"Detected {disease_scores[highest_priority_disease]['count']} out of {total_leaves} leaves"
-        }
+        stage_start = time.perf_counter()
+        indexes = list(images)
+        detections = yolo_model.predict(source=[images[i] for i in indexes], imgsz=640, conf=0.5)
+        boxes = {i: detection.boxes.xyxy.cpu().numpy() for i, detection in zip(indexes, detections)}
+        for i in indexes:
+            record_stage(timings[i], 'detect', stage_start)
+            timings[i]['leaves'] = len(boxes[i])
+
+        # Crop and preprocess every leaf of every image
+        tensors, owners = [], []
+        for i in indexes:
+            stage_start = time.perf_counter()
+            leaves = crop_leaves(images[i], boxes[i])
+            tensors.extend(leaves)
+            owners.extend([i] * len(leaves))
+            record_stage(timings[i], 'preprocess', stage_start)
+
+        # Classify all leaves in one forward pass
+        stage_start = time.perf_counter()
+        predictions = classify_leaves(tensors)
+        for i in indexes:
+            if boxes[i].size:
+                record_stage(timings[i], 'classify', stage_start)
 
-        logger.info(f"AI analysis completed: {result['predicted_class']} with confidence {result['confidence']:.2f}")
-        return [result]
+        for i in indexes:
+            results[i] = summarize_leaves([p for p, owner in zip(predictions, owners) if owner == i])
+        return results
 
     except Exception as e:
         logger.error(f"Error in AI processing: {str(e)}")
-        return [{"predicted_class": f"AI processing error: {str(e)}", "confidence": 0.0}]
+        error = [{"predicted_class": f"AI processing error: {str(e)}", "confidence": 0.0}]
+        return [result if result is not None else error for result in results]
@@ -0,0 +1,256 @@
+"""
+Content-addressed image store
+
+Image bytes are stored once under BLOB_STORE_DIR/ab/cd/<sha256>, two levels
+of 256-way fan-out so no directory grows past a few hundred entries even
+with millions of images. Files are written to BLOB_STORE_DIR/tmp and
+renamed into place, so readers never see a partial blob.
+
+The ``blobs`` table counts how many image_metadata and detection_history
+columns point at each digest. Releasing the last reference only marks the
+blob unused; collect_garbage() removes unused blobs after a grace period so
+a concurrent writer that just produced the same bytes cannot lose its file.
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import BinaryIO, Optional, Tuple
+from app.config import Config
+from app.utils import StorageError
+from app.services.storage_accounting import dialect_insert, record_usage
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _unique_suffix() -> str:
+    return f"{os.getpid()}-{threading.get_ident()}"
+
+
+class BlobStore:
+    """SHA-256 addressed files with two-level fan-out directories"""
+
+    def __init__(self, root: str, fsync: bool = True):
+        self.root = root
+        self.fsync = fsync
+        self.tmp_dir = os.path.join(root, 'tmp')
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def _publish(self, tmp_path: str, digest: str) -> None:
+        """Rename a finished temp file into place, or drop it if the blob exists"""
+        target = self.path(digest)
+        if os.path.exists(target):
+            os.remove(tmp_path)
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+
+    def put_stream(self, stream: BinaryIO) -> Tuple[str, int]:
+        """Store a stream, returning (digest, size)"""
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix='.part')
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            digest = hasher.hexdigest()
+            self._publish(tmp_path, digest)
+            return digest, size
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_file(self, file_path: str) -> Tuple[str, int]:
+        with open(file_path, 'rb') as f:
+            return self.put_stream(f)
+
+    def adopt(self, file_path: str) -> Tuple[str, int]:
+        """Store an existing file and turn it into a hard link to its blob
+
+        Used for the download/predicted directories so those URLs keep
+        working while the bytes live on disk only once.
+        """
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        size = os.path.getsize(file_path)
+        target = self.path(digest)
+
+        try:
+            if not os.path.exists(target):
+                os.makedirs(self.tmp_dir, exist_ok=True)
+                tmp_path = os.path.join(self.tmp_dir, f"{digest}.{_unique_suffix()}.link")
+                os.link(file_path, tmp_path)
+                self._publish(tmp_path, digest)
+            if not os.path.samefile(file_path, target):
+                link_tmp = f"{file_path}.{_unique_suffix()}.link"
+                os.link(target, link_tmp)
+                os.replace(link_tmp, file_path)
+        except OSError as e:
+            # Different filesystem or no hard links (FAT, some Windows setups): keep a copy
+            logger.debug(f"Hard link not possible for {file_path}: {e}")
+            if not os.path.exists(target):
+                self.put_file(file_path)
+        return digest, size
+
+    def remove(self, digest: str) -> bool:
+        try:
+            os.remove(self.path(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+_blob_store = None
+
+def get_blob_store() -> BlobStore:
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore(Config.BLOB_STORE_DIR)
+    return _blob_store
+
+
+def add_ref(digest: str, size: int, content_type: Optional[str] = None,
+            device_id: Optional[str] = None) -> None:
+    """Count one more reference to a blob in the current session (caller commits)
+
+    A blob seen for the first time is also added to the storage counters of
+    ``device_id`` for today.
+    """
+    from app import db
+    from app.models.blob import Blob
+
+    table = Blob.__table__
+    now = datetime.utcnow()
+    insert = dialect_insert()
+    while True:
+        if insert is not None:
+            # ON CONFLICT so concurrent writers of the same image cannot race on the insert
+            stmt = insert(table).values(sha256=digest, size=size, content_type=content_type, device_id=device_id,
+                                        refcount=1, created_at=now, last_referenced_at=now)
+            created = db.session.execute(
+                stmt.on_conflict_do_nothing(index_elements=['sha256']).returning(table.c.sha256)
+            ).first() is not None
+        else:
+            created = db.session.get(Blob, digest) is None
+            if created:
+                db.session.add(Blob(sha256=digest, size=size, content_type=content_type, device_id=device_id,
+                                    refcount=1, created_at=now, last_referenced_at=now))
+                db.session.flush()
+
+        if created:
+            record_usage(device_id, now, files=1, size=size)
+            return
+        updated = db.session.execute(
+            table.update().where(table.c.sha256 == digest)
+            .values(refcount=table.c.refcount + 1, last_referenced_at=now)
+        ).rowcount
+        if updated:
+            return
+        # Collected between the two statements: insert it again
+
+
+def release_ref(digest: Optional[str], count: int = 1) -> None:
+    """Drop references in the current session (caller commits)"""
+    from app import db
+    from app.models.blob import Blob
+
+    if not digest:
+        return
+    refcount = Blob.__table__.c.refcount
+    db.session.execute(
+        Blob.__table__.update()
+        .where(Blob.__table__.c.sha256 == digest, refcount > 0)
+        .values(refcount=db.case((refcount > count, refcount - count), else_=0))
+    )
+
+
+def store_file(file_path: str, content_type: Optional[str] = 'image/jpeg',
+               device_id: Optional[str] = None) -> Optional[str]:
+    """Adopt a file into the store and reference it; returns the digest or None on failure"""
+    if not file_path or not os.path.exists(file_path):
+        return None
+    try:
+        digest, size = get_blob_store().adopt(file_path)
+        add_ref(digest, size, content_type, device_id)
+        return digest
+    except Exception as e:
+        logger.warning(f"Could not add {file_path} to blob store: {e}")
+        return None
+
+
+def collect_garbage(grace_seconds: Optional[float] = None, limit: int = 1000) -> int:
+    """Delete blobs nobody references any more; returns how many were removed"""
+    from app import db
+    from app.models.blob import Blob
+
+    grace = Config.BLOB_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = datetime.utcnow() - timedelta(seconds=grace)
+    table = Blob.__table__
+    try:
+        digests = [row[0] for row in db.session.execute(
+            db.select(table.c.sha256)
+            .where(table.c.refcount <= 0, table.c.last_referenced_at < cutoff)
+            .limit(limit)
+        )]
+        removed = 0
+        store = get_blob_store()
+        for digest in digests:
+            # Re-check in the DELETE so a reference added meanwhile keeps the blob
+            deleted = db.session.execute(
+                table.delete().where(table.c.sha256 == digest, table.c.refcount <= 0)
+                .returning(table.c.device_id, table.c.created_at, table.c.size)
+            ).first()
+            if deleted is not None:
+                record_usage(deleted.device_id, deleted.created_at, files=-1, size=-deleted.size)
+            db.session.commit()
+            if deleted is not None and store.remove(digest):
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} unreferenced blobs")
+        return removed
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Blob garbage collection failed: {e}")
+        raise StorageError(f"Blob garbage collection failed: {e}")
+
+
+def sweep_temp_files(max_age_seconds: float = 3600) -> int:
+    """Remove temp files left behind by crashed writers"""
+    store = get_blob_store()
+    if not os.path.isdir(store.tmp_dir):
+        return 0
+    cutoff = datetime.now().timestamp() - max_age_seconds
+    removed = 0
+    with os.scandir(store.tmp_dir) as entries:
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
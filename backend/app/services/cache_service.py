@@ -3,6 +3,8 @@ from functools import wraps
 from datetime import datetime, timedelta
 from typing import Any, Callable, Dict, Optional, Tuple, Union
 import re
+from app.services.metrics import cache_requests_total
+from app.services.profiling import current_profile
 
 # Simple in-memory cache
 # In production, consider using Redis
@@ -23,6 +25,10 @@ def cache(
     def decorator(f: Callable) -> Callable:
         @wraps(f)
         def decorated_function(*args, **kwargs) -> Any:
+            # Time cache bookkeeping only for profiled requests
+            profile = current_profile()
+            lookup_start = time.perf_counter() if profile is not None else 0
+            
             # Generate cache key
             cache_key = f"{key_prefix}:{f.__name__}:{str(args)}:{str(kwargs)}"
             
@@ -44,8 +50,15 @@ def cache(
             if cache_key in cache_store:
                 value, timestamp, expiry = cache_store[cache_key]
                 if expiry is None or current_time < expiry:
+                    cache_requests_total.inc(result='hit')
+                    if profile is not None:
+                        profile.add('cache', time.perf_counter() - lookup_start)
                     return value
             
+            cache_requests_total.inc(result='miss')
+            if profile is not None:
+                profile.add('cache', time.perf_counter() - lookup_start)
+            
             # Calculate result
             result = f(*args, **kwargs)
             
@@ -123,7 +136,9 @@ def get_cached_sensor_data(
     if key in cache_store:
         value, _, expiry = cache_store[key]
         if expiry is None or time.time() < expiry:
+            cache_requests_total.inc(result='hit')
             return value
+    cache_requests_total.inc(result='miss')
     return None
 
 def delete_pattern(pattern: str) -> int:
@@ -1,37 +1,58 @@
 """
 Camera Service for ESP32-CAM Integration
 Handles image capture from ESP32-CAM devices
+
+Cameras are listed in Config.CAMERAS ("id=host[:port],..."). Each camera
+keeps its own HTTP session so keep-alive connections are reused, and
+CameraRegistry captures from all of them in parallel.
 """
 
 import os
+import time
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import logging
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from app.config import Config
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 64 * 1024
+
 class ESP32CameraService:
     def __init__(self, camera_ip: str = "192.168.141.171", 
                  default_quality: int = 10, 
-                 default_resolution: str = "UXGA"):
+                 default_resolution: str = "UXGA",
+                 camera_id: str = "default",
+                 probe_path: str = "/status",
+                 probe_accept_404: bool = False):
         """
         Initialize ESP32 Camera Service
         
         Args:
-            camera_ip: IP address của ESP32-CAM
+            camera_ip: IP address (hoặc host:port) của ESP32-CAM
             default_quality: Chất lượng ảnh mặc định (10-63, thấp hơn = chất lượng cao hơn)
             default_resolution: Resolution mặc định
+            camera_id: Tên camera trong registry
+            probe_path: Endpoint nhẹ dùng để kiểm tra trạng thái (không chụp ảnh)
+            probe_accept_404: Coi 404 là online (firmware không có probe_path)
         """
+        self.camera_id = camera_id
         self.camera_ip = camera_ip
         self.default_quality = default_quality
         self.default_resolution = default_resolution
+        self.probe_path = probe_path
+        self.probe_accept_404 = probe_accept_404
         self.base_url = f"http://{camera_ip}"
         
         # Tạo session với retry logic
         self.session = self._create_session_with_retries()
+        # The ESP32 serves one frame at a time; this also keeps the capture connection single-threaded
+        self._capture_lock = threading.Lock()
     
     def _create_session_with_retries(self):
         """Tạo session với retry logic"""
@@ -41,42 +62,50 @@ class ESP32CameraService:
             backoff_factor=0.5,
             status_forcelist=[408, 409, 429, 500, 502, 503, 504]
         )
-        adapter = HTTPAdapter(max_retries=retries)
+        adapter = HTTPAdapter(max_retries=retries, pool_connections=1, pool_maxsize=2)
         session.mount('http://', adapter)
         session.mount('https://', adapter)
+        # The probe keeps its connection alive but never retries: it should fail fast, not back off
+        session.mount(f"{self.base_url}{self.probe_path}", HTTPAdapter(max_retries=0, pool_connections=1, pool_maxsize=1))
         return session
     
     def check_camera_status(self) -> Dict[str, Any]:
-        """Kiểm tra trạng thái camera"""
+        """Kiểm tra trạng thái camera bằng probe nhẹ, không chụp ảnh"""
         try:
-            capture_url = f"{self.base_url}/capture?quality={self.default_quality}&resolution={self.default_resolution}"
-            response = self.session.get(capture_url, timeout=(2, 5))
+            started = time.perf_counter()
+            response = self.session.get(f"{self.base_url}{self.probe_path}", timeout=(1, 2))
+            latency_ms = round((time.perf_counter() - started) * 1000, 1)
             
-            if response.status_code == 200:
+            if response.ok or (response.status_code == 404 and self.probe_accept_404):
                 return {
                     'status': 'online',
                     'message': 'ESP32 camera is accessible',
-                    'ip': self.camera_ip
+                    'ip': self.camera_ip,
+                    'camera_id': self.camera_id,
+                    'latency_ms': latency_ms
                 }
             else:
                 return {
                     'status': 'error',
                     'message': f'Camera returned status code: {response.status_code}',
-                    'ip': self.camera_ip
+                    'ip': self.camera_ip,
+                    'camera_id': self.camera_id
                 }
         except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
             logger.warning(f"ESP32 camera not accessible: {str(e)}")
             return {
                 'status': 'offline',
                 'message': 'ESP32 camera is not accessible',
-                'ip': self.camera_ip
+                'ip': self.camera_ip,
+                'camera_id': self.camera_id
             }
         except Exception as e:
             logger.error(f"Error checking camera status: {str(e)}")
             return {
                 'status': 'error',
                 'message': f'Error checking camera: {str(e)}',
-                'ip': self.camera_ip
+                'ip': self.camera_ip,
+                'camera_id': self.camera_id
             }
     
     def capture_image(self, save_path: str, 
@@ -103,34 +132,45 @@ class ESP32CameraService:
             # Tạo URL capture
             capture_url = f"{self.base_url}/capture?resolution={resolution}&quality={quality}"
             
-            logger.info(f"Capturing image from ESP32-CAM: {capture_url}")
-            response = self.session.get(capture_url, timeout=10)
-            
-            if response.status_code == 200:
-                # Lưu ảnh
-                with open(save_path, 'wb') as f:
-                    f.write(response.content)
-                
-                file_size = len(response.content)
+            logger.info(f"Capturing image from ESP32-CAM {self.camera_id}: {capture_url}")
+            with self._capture_lock, self.session.get(capture_url, timeout=10, stream=True) as response:
+                if response.status_code != 200:
+                    error_msg = f"Failed to capture image: HTTP {response.status_code}"
+                    logger.error(error_msg)
+                    return {
+                        'status': 'error',
+                        'message': error_msg,
+                        'camera_id': self.camera_id
+                    }
                 
-                logger.info(f"Image captured successfully: {save_path} ({file_size} bytes)")
-                
-                return {
-                    'status': 'success',
-                    'message': 'Image captured and saved successfully',
-                    'file_path': save_path,
-                    'file_size': file_size,
-                    'resolution': resolution,
-                    'quality': quality,
-                    'camera_ip': self.camera_ip
-                }
-            else:
-                error_msg = f"Failed to capture image: HTTP {response.status_code}"
-                logger.error(error_msg)
-                return {
-                    'status': 'error',
-                    'message': error_msg
-                }
+                # Stream to a temporary file so a dropped connection never leaves a truncated JPEG
+                file_size = 0
+                partial_path = f"{save_path}.part"
+                try:
+                    with open(partial_path, 'wb') as f:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+                            file_size += len(chunk)
+                    expected = response.headers.get('Content-Length')
+                    if expected is not None and int(expected) != file_size:
+                        raise IOError(f"Incomplete image: {file_size} of {expected} bytes")
+                    os.replace(partial_path, save_path)
+                finally:
+                    if os.path.exists(partial_path):
+                        os.remove(partial_path)
+            
+            logger.info(f"Image captured successfully: {save_path} ({file_size} bytes)")
+            
+            return {
+                'status': 'success',
+                'message': 'Image captured and saved successfully',
+                'file_path': save_path,
+                'file_size': file_size,
+                'resolution': resolution,
+                'quality': quality,
+                'camera_ip': self.camera_ip,
+                'camera_id': self.camera_id
+            }
                 
         except requests.exceptions.Timeout:
             error_msg = "ESP32 camera connection timed out"
@@ -159,12 +199,70 @@ class ESP32CameraService:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         return f"{prefix}_{timestamp}.{extension}"
 
+def parse_cameras(spec: str) -> Dict[str, str]:
+    """Parse "id=host[:port],..." (a bare host gets the id camN)"""
+    cameras = {}
+    for index, entry in enumerate(part.strip() for part in spec.split(',')):
+        if not entry:
+            continue
+        camera_id, _, address = entry.rpartition('=')
+        cameras[camera_id.strip() or f"cam{index + 1}"] = address.strip()
+    return cameras
+
+class CameraRegistry:
+    """All configured cameras, with parallel capture and health checks"""
+
+    def __init__(self, cameras: Dict[str, str], max_workers: int = 8, probe_path: str = "/status",
+                 probe_accept_404: bool = False):
+        self.cameras = {
+            camera_id: ESP32CameraService(address, camera_id=camera_id, probe_path=probe_path,
+                                          probe_accept_404=probe_accept_404)
+            for camera_id, address in cameras.items()
+        }
+        self._executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(self.cameras) or 1)),
+                                            thread_name_prefix='camera')
+
+    def get(self, camera_id: Optional[str] = None) -> ESP32CameraService:
+        """Camera by id; the first configured camera when no id is given"""
+        if camera_id is None:
+            return next(iter(self.cameras.values()))
+        if camera_id not in self.cameras:
+            raise KeyError(f"Unknown camera: {camera_id}")
+        return self.cameras[camera_id]
+
+    def ids(self) -> List[str]:
+        return list(self.cameras)
+
+    def _map(self, fn, camera_ids: Optional[List[str]]) -> Dict[str, Any]:
+        cameras = [self.get(camera_id) for camera_id in (camera_ids or self.ids())]
+        futures = {camera.camera_id: self._executor.submit(fn, camera) for camera in cameras}
+        return {camera_id: future.result() for camera_id, future in futures.items()}
+
+    def check_all(self, camera_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Probe every camera concurrently"""
+        return self._map(lambda camera: camera.check_camera_status(), camera_ids)
+
+    def capture_all(self, save_dir: str, resolution: Optional[str] = None, quality: Optional[int] = None,
+                    camera_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Capture from every camera concurrently, one file per camera in save_dir"""
+        def capture(camera):
+            filename = camera.generate_filename(prefix=f"esp32cam_{camera.camera_id}")
+            return camera.capture_image(os.path.join(save_dir, filename), resolution=resolution, quality=quality)
+        return self._map(capture, camera_ids)
+
 # Singleton instance
-_camera_service = None
-
-def get_camera_service() -> ESP32CameraService:
-    """Get singleton camera service instance"""
-    global _camera_service
-    if _camera_service is None:
-        _camera_service = ESP32CameraService()
-    return _camera_service
+_camera_registry = None
+
+def get_camera_registry() -> CameraRegistry:
+    """Get singleton camera registry"""
+    global _camera_registry
+    if _camera_registry is None:
+        _camera_registry = CameraRegistry(parse_cameras(Config.CAMERAS),
+                                          max_workers=Config.CAMERA_CAPTURE_WORKERS,
+                                          probe_path=Config.CAMERA_PROBE_PATH,
+                                          probe_accept_404=Config.CAMERA_PROBE_ACCEPT_404)
+    return _camera_registry
+
+def get_camera_service(camera_id: Optional[str] = None) -> ESP32CameraService:
+    """Get a camera from the registry (the first configured camera by default)"""
+    return get_camera_registry().get(camera_id)
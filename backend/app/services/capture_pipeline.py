@@ -0,0 +1,259 @@
+"""
+Automatic capture-and-analyze pipeline
+
+Every IMAGE_CAPTURE_INTERVAL each camera in the registry is captured (due
+cameras in parallel). A 64-bit difference hash of the new frame is compared
+with the camera's previous frame; near-duplicates (Hamming distance at or
+below AUTO_CAPTURE_HASH_THRESHOLD) are deleted without running the models.
+Changed frames go onto a bounded queue that a separate worker thread feeds
+to inference, so capture never waits on the models.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from PIL import Image
+from app.services.image_derivatives import schedule_derivatives
+from app.utils import acquire_process_lock
+
+logger = logging.getLogger(__name__)
+
+
+def difference_hash(image_path: str, hash_size: int = 8) -> int:
+    """64-bit dHash: sign of horizontal gradients on a 9x8 grayscale thumbnail"""
+    with Image.open(image_path) as image:
+        image.draft('L', (hash_size * 8, hash_size * 8))  # JPEG decodes at 1/8 scale, much cheaper
+        pixels = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR).tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class CapturePipeline:
+    """Scheduled per-camera capture with duplicate-frame skipping and queued inference"""
+
+    def __init__(self, registry, interval_seconds: float, save_dir: str, predicted_dir: str,
+                 hash_threshold: int = 5, queue_size: int = 32, resolution: Optional[str] = None,
+                 app=None, analyze=None):
+        self.registry = registry
+        self.interval = interval_seconds
+        self.save_dir = save_dir
+        self.predicted_dir = predicted_dir
+        self.hash_threshold = hash_threshold
+        self.resolution = resolution
+        self.app = app
+        self._analyze = analyze or self._analyze_and_record
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self.next_due: Dict[str, float] = {}
+        self.last_hash: Dict[str, int] = {}
+        self.stats = {'captured': 0, 'capture_errors': 0, 'skipped_duplicates': 0,
+                      'queued': 0, 'dropped': 0, 'analyzed': 0, 'analyze_errors': 0}
+        self.last_run: Dict[str, Dict] = {}
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name='auto-capture', daemon=True),
+            threading.Thread(target=self._inference_loop, name='auto-analyze', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Auto capture started for {len(self.registry.ids())} cameras every {self.interval:.0f}s")
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats['running'] = bool(self._threads)
+        stats['interval_seconds'] = self.interval
+        stats['pending'] = self._jobs.qsize()
+        stats['cameras'] = dict(self.last_run)
+        return stats
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Auto capture error: {str(e)}")
+            # Wake up often enough to honour per-camera due times without busy-waiting
+            now = time.monotonic()
+            wait = min(self.next_due.values(), default=now + self.interval) - now
+            self._stop.wait(max(1.0, min(wait, 60.0)))
+
+    def run_once(self, force: bool = False) -> Dict[str, str]:
+        """Capture every due camera in parallel and queue the changed frames"""
+        now = time.monotonic()
+        due = [camera_id for camera_id in self.registry.ids()
+               if force or self.next_due.get(camera_id, 0) <= now]
+        if not due:
+            return {}
+
+        for camera_id in due:
+            self.next_due[camera_id] = now + self.interval
+        captures = self.registry.capture_all(self.save_dir, resolution=self.resolution, camera_ids=due)
+        outcomes = {}
+        for camera_id, result in captures.items():
+            try:
+                outcomes[camera_id] = self._handle_capture(camera_id, result)
+            except Exception as e:
+                # One unreadable frame must not keep the other cameras' frames from being handled
+                logger.error(f"Auto capture failed for {camera_id}: {str(e)}")
+                self._discard(result.get('file_path'))
+                self._count('capture_errors')
+                outcomes[camera_id] = 'capture_error'
+                self.last_run[camera_id] = {'time': datetime.now().isoformat(), 'outcome': 'capture_error',
+                                            'message': str(e)}
+        return outcomes
+
+    @staticmethod
+    def _discard(image_path: Optional[str]):
+        if image_path:
+            try:
+                os.remove(image_path)
+            except OSError:
+                pass
+
+    def _handle_capture(self, camera_id: str, result: Dict) -> str:
+        if result.get('status') != 'success':
+            self._count('capture_errors')
+            outcome = 'capture_error'
+            self.last_run[camera_id] = {'time': datetime.now().isoformat(), 'outcome': outcome,
+                                        'message': result.get('message')}
+            return outcome
+
+        self._count('captured')
+        image_path = result['file_path']
+        frame_hash = difference_hash(image_path)
+        previous = self.last_hash.get(camera_id)
+        distance = hamming_distance(frame_hash, previous) if previous is not None else None
+
+        if distance is not None and distance <= self.hash_threshold:
+            os.remove(image_path)
+            self._count('skipped_duplicates')
+            outcome = 'unchanged'
+        else:
+            try:
+                self._jobs.put_nowait((camera_id, image_path, result, frame_hash))
+                schedule_derivatives(image_path)
+                self._count('queued')
+                outcome = 'queued'
+            except queue.Full:
+                # Keep the old hash so the next capture is compared against what was analyzed
+                logger.warning(f"Auto capture queue full, dropping frame from {camera_id}")
+                os.remove(image_path)
+                self._count('dropped')
+                outcome = 'dropped'
+
+        self.last_run[camera_id] = {'time': datetime.now().isoformat(), 'outcome': outcome,
+                                    'hash_distance': distance}
+        return outcome
+
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            try:
+                camera_id, image_path, capture_result, frame_hash = self._jobs.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                self._analyze(camera_id, image_path, capture_result)
+                # Only an analyzed frame becomes the reference, so a failed one is retried on the next capture
+                self.last_hash[camera_id] = frame_hash
+                self._count('analyzed')
+            except Exception as e:
+                self._count('analyze_errors')
+                logger.error(f"Auto analysis failed for {camera_id}: {str(e)}")
+
+    def _analyze_and_record(self, camera_id: str, image_path: str, capture_result: Dict):
+        """Run detection, draw the predicted image and store a DetectionHistory row"""
+        from app import db
+        from app.models.detection_history import DetectionHistory
+        from app.services.inference import analyze_leaf_image, to_ai_results
+        from app.services.blob_store import store_file
+        from app.services.detection_stats import record_detection
+
+        raw_results = analyze_leaf_image(image_path)
+        errors = [r['predicted_class'] for r in raw_results if str(r.get('predicted_class', '')).startswith('Error:')]
+        if errors:
+            # Server down or models not loaded: not a detection, keep it out of history and statistics
+            raise RuntimeError(errors[0])
+        ai_results = [result.dict() for result in to_ai_results(raw_results)]
+
+        predicted_path = None
+        try:
+            from app.services.image_processing import create_predicted_image
+            predicted_path = create_predicted_image(image_path, ai_results, self.predicted_dir)
+        except Exception as e:
+            logger.error(f"Could not create predicted image: {str(e)}")
+
+        with self.app.app_context():
+            detection = DetectionHistory(
+                original_image_path=image_path,
+                predicted_image_path=predicted_path,
+                original_blob=store_file(image_path, device_id=camera_id),
+                predicted_blob=store_file(predicted_path, device_id=camera_id),
+                detection_method='automatic',
+                camera_status='online',
+                ai_results=ai_results
+            )
+            db.session.add(detection)
+            record_detection(detection)
+            db.session.commit()
+        logger.info(f"Auto detection for {camera_id}: {ai_results[0]['predicted_class'] if ai_results else 'no result'}")
+
+
+_capture_pipeline = None
+
+def get_capture_pipeline() -> Optional[CapturePipeline]:
+    return _capture_pipeline
+
+def start_capture_pipeline(app) -> Optional[CapturePipeline]:
+    """Start the pipeline if AUTO_CAPTURE_ENABLED and no other worker runs it"""
+    global _capture_pipeline
+    from app.config import Config
+    from app.services.camera_service import get_camera_registry
+
+    if _capture_pipeline is not None or not Config.AUTO_CAPTURE_ENABLED:
+        return _capture_pipeline
+    if not acquire_process_lock(os.path.join(os.path.dirname(Config.UPLOAD_FOLDER), 'auto_capture.lock')):
+        logger.info("Auto capture is running in another worker")
+        return None
+
+    _capture_pipeline = CapturePipeline(
+        get_camera_registry(),
+        interval_seconds=Config.IMAGE_CAPTURE_INTERVAL.total_seconds(),
+        save_dir=os.path.join(Config.UPLOAD_FOLDER, 'download'),
+        predicted_dir=os.path.join(Config.UPLOAD_FOLDER, 'predicted'),
+        hash_threshold=Config.AUTO_CAPTURE_HASH_THRESHOLD,
+        queue_size=Config.AUTO_CAPTURE_QUEUE_SIZE,
+        resolution=Config.AUTO_CAPTURE_RESOLUTION,
+        app=app
+    )
+    _capture_pipeline.start()
+    return _capture_pipeline
@@ -10,7 +10,7 @@ import json
 from datetime import datetime, time as dt_time
 from sqlalchemy import text
 from app.services.timescale import engine, query_sensor_data
-from app.services.mqtt_client import get_mqtt_client
+from app.services.device_commands import submit_device_command
 from app.config import Config
 
 logger = logging.getLogger(__name__)
@@ -29,7 +29,6 @@ class ConfigurationScheduler:
         self.scheduler_thread = None
         self.check_interval = 30  # Check conditions every 30 seconds
         self.stop_event = threading.Event()
-        self.mqtt_client = get_mqtt_client()
         
         # Track last device actions to prevent oscillation
         self.last_actions = {
@@ -352,7 +351,7 @@ class ConfigurationScheduler:
             return False
             
     def _control_device(self, device_type, device_id, status, duration, reason):
-        """Control device through MQTT and update database"""
+        """Queue the device command together with its intended state"""
         try:
             # Get current device status from database
             current_status = self._get_current_device_status(device_id, device_type)
@@ -370,76 +369,34 @@ class ConfigurationScheduler:
                 logger.debug(f"{device_type.title()} action repeated too soon, skipping")
                 return
                 
-            # Prepare simplified MQTT message
-            mqtt_message = {
-                "device_id": device_id,
-                "command": "SET_STATE", 
-                "status": status,
-                "timestamp": datetime.now().isoformat()
-            }
-                
-            # Send MQTT command
-            topic = f"greenhouse/control/{device_type}"
-            success = self.mqtt_client.publish(topic, mqtt_message)
+            # device_states and the command are written in one transaction, the dispatcher publishes it
+            submit_device_command(device_id, device_type, status, source='auto')
             
-            if success:
-                # Update database state
-                self._update_device_state(device_id, device_type, status)
-                
-                # Record action
-                self.last_actions[device_type] = {
-                    'timestamp': datetime.now(),
-                    'action': status
-                }
-                
-                logger.info(f"{device_type.title()} controlled: {status} - {reason}")
-                
-                # Schedule device to turn off after duration (for pump/fan)
-                if duration > 0 and device_type in ['pump', 'fan'] and status:
-                    self._schedule_device_off(device_id, device_type, duration * 60)  # Convert to seconds
-                    
-            else:
-                logger.error(f"Failed to send MQTT command for {device_type}")
-                
-        except Exception as e:
-            logger.error(f"Error controlling device {device_type}: {e}")
+            # Record action
+            self.last_actions[device_type] = {
+                'timestamp': datetime.now(),
+                'action': status
+            }
             
-    def _update_device_state(self, device_id, device_type, status):
-        """Update device state in database"""
-        try:
-            from app.services.timescale import update_device_state
+            logger.info(f"{device_type.title()} controlled: {status} - {reason}")
             
-            # Convert status to string format for database
-            if isinstance(status, bool):
-                status_str = "true" if status else "false"
-            else:
-                status_str = str(status)
+            # Schedule device to turn off after duration (for pump/fan)
+            if duration > 0 and device_type in ['pump', 'fan'] and status:
+                self._schedule_device_off(device_id, device_type, duration * 60)  # Convert to seconds
                 
-            update_device_state(device_id, device_type, status_str)
-            logger.debug(f"Database updated for {device_id}: {status_str}")
-            
         except Exception as e:
-            logger.error(f"Error updating device state in database: {e}")
+            logger.error(f"Error controlling device {device_type}: {e}")
             
     def _schedule_device_off(self, device_id, device_type, duration_seconds):
         """Schedule device to turn off after specified duration"""
         def turn_off_device():
             time.sleep(duration_seconds)
             if self.is_running:  # Only execute if scheduler is still running
-                # Đơn giản hóa message cho tự động tắt
-                off_message = {
-                    "device_id": device_id,
-                    "command": "SET_STATE",
-                    "status": False,
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-                topic = f"greenhouse/control/{device_type}"
-                success = self.mqtt_client.publish(topic, off_message)
-                
-                if success:
-                    self._update_device_state(device_id, device_type, False)
+                try:
+                    submit_device_command(device_id, device_type, False, source='auto')
                     logger.info(f"{device_type.title()} automatically turned off after {duration_seconds//60} minutes")
+                except Exception as e:
+                    logger.error(f"Error turning off {device_type}: {e}")
                     
         # Start turn-off timer in separate thread
         timer_thread = threading.Thread(target=turn_off_device, daemon=True)
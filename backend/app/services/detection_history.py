@@ -0,0 +1,91 @@
+"""
+Detection history listing with keyset pagination
+
+Pages are ordered by (timestamp, id) descending and continue from an opaque
+cursor holding the last row's (timestamp, id), so page N costs the same index
+range scan as page 1 (no OFFSET). The total is only counted on request.
+ai_results is selected as JSON text and spliced into the response as-is
+instead of being decoded and re-encoded per row.
+"""
+
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.utils import ValidationError
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque cursor for the row a page ended on"""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValidationError(f"Invalid cursor: {cursor}") from e
+
+
+def list_detections(per_page: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                    method: Optional[str] = None, disease_only: bool = False,
+                    include_total: bool = False) -> Dict[str, Any]:
+    """One page of detection history, newest first
+
+    Returns rows as (to_dict without ai_results, ai_results JSON text) pairs
+    plus next_cursor/has_next and, if asked, the total matching rows.
+    """
+    from app import db
+    from app.models.detection_history import DetectionHistory
+
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+    query = db.session.query(
+        DetectionHistory, db.cast(DetectionHistory.ai_results_data, db.Text)
+    ).options(db.defer(DetectionHistory.ai_results_data))
+
+    if method:
+        query = query.filter(DetectionHistory.detection_method == method)
+    if disease_only:
+        query = query.filter(DetectionHistory.disease_detected == True)
+
+    total = query.order_by(None).count() if include_total else None
+
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(db.tuple_(DetectionHistory.timestamp, DetectionHistory.id) < (timestamp, row_id))
+
+    rows = query.order_by(DetectionHistory.timestamp.desc(), DetectionHistory.id.desc()).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    return {
+        'items': [(row.to_dict(include_ai_results=False), ai_results or '[]') for row, ai_results in rows],
+        'next_cursor': encode_cursor(rows[-1][0].timestamp, rows[-1][0].id) if has_next else None,
+        'has_next': has_next,
+        'per_page': per_page,
+        'total': total
+    }
+
+
+def history_response_body(page: Dict[str, Any]) -> str:
+    """Serialize a list_detections() page, embedding the stored ai_results text"""
+    items: List[str] = [
+        json.dumps(item)[:-1] + ', "ai_results": ' + ai_results + '}'
+        for item, ai_results in page['items']
+    ]
+    envelope = {
+        'status': 'success',
+        'next_cursor': page['next_cursor'],
+        'has_next': page['has_next'],
+        'per_page': page['per_page']
+    }
+    if page['total'] is not None:
+        envelope['total'] = page['total']
+    return json.dumps(envelope)[:-1] + ', "history": [' + ', '.join(items) + ']}'
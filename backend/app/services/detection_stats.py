@@ -0,0 +1,130 @@
+"""
+Daily detection statistics rollups
+
+detection_statistics holds one row per day. record_detection() upserts
+that day's counters in the same session (and so the same transaction) as
+the DetectionHistory row it describes. The statistics endpoint reads one
+row per day instead of aggregating detection_history.
+
+Rows purged by the retention job stay counted: the rollups are the
+long-term history. rebuild_statistics() recomputes days from
+detection_history, for the initial backfill or after manual edits (see
+rebuild_detection_stats.py); it should not be run over purged days.
+"""
+
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+from app.utils import StorageError
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = (
+    'total_detections', 'automatic_detections', 'manual_detections',
+    'diseases_detected', 'healthy_detections',
+    'high_severity_count', 'medium_severity_count', 'low_severity_count',
+    'camera_online_count', 'camera_offline_count'
+)
+
+
+def detection_counters(detection_method: Optional[str], disease_detected: Optional[bool],
+                       severity: Optional[str], camera_status: Optional[str]) -> Counter:
+    """Counter increments contributed by one detection"""
+    counts = Counter(total_detections=1)
+    if detection_method in ('automatic', 'manual'):
+        counts[f'{detection_method}_detections'] += 1
+    if disease_detected:
+        counts['diseases_detected'] += 1
+        # Severity buckets only describe diseased detections
+        if severity in ('high', 'medium', 'low'):
+            counts[f'{severity}_severity_count'] += 1
+    else:
+        counts['healthy_detections'] += 1
+    if camera_status in ('online', 'offline'):
+        counts[f'camera_{camera_status}_count'] += 1
+    return counts
+
+
+def record_detection_deltas(day: date, counts: Dict[str, int]) -> None:
+    """Add counter deltas to one day's row in the current session (caller commits)"""
+    from app import db
+    from app.models.detection_history import DetectionStatistics
+    from app.services.storage_accounting import dialect_insert
+
+    counts = {name: value for name, value in counts.items() if value}
+    if not counts:
+        return
+    table = DetectionStatistics.__table__
+    now = datetime.utcnow()
+
+    insert = dialect_insert()
+    if insert is not None:
+        values = {name: counts.get(name, 0) for name in COUNTERS}
+        stmt = insert(table).values(date=day, created_at=now, updated_at=now, **values)
+        set_ = {name: db.func.coalesce(table.c[name], 0) + value for name, value in counts.items()}
+        set_['updated_at'] = now
+        db.session.execute(stmt.on_conflict_do_update(index_elements=['date'], set_=set_))
+        return
+
+    stats = DetectionStatistics.query.filter_by(date=day).first()
+    if stats is None:
+        stats = DetectionStatistics(date=day, **{name: 0 for name in COUNTERS})
+        db.session.add(stats)
+    for name, value in counts.items():
+        setattr(stats, name, (getattr(stats, name) or 0) + value)
+
+
+def record_detection(detection) -> None:
+    """Count a new DetectionHistory row; call before committing it"""
+    if detection.timestamp is None:
+        detection.timestamp = datetime.utcnow()  # same value the column default would give
+    record_detection_deltas(detection.timestamp.date(), detection_counters(
+        detection.detection_method, detection.disease_detected, detection.severity, detection.camera_status))
+
+
+def rebuild_statistics(start_date: Optional[date] = None, end_date: Optional[date] = None) -> int:
+    """Recompute detection_statistics from detection_history; returns days written"""
+    from app import db
+    from app.models.detection_history import DetectionHistory, DetectionStatistics
+
+    day = db.func.date(DetectionHistory.timestamp)
+    query = db.session.query(
+        day, DetectionHistory.detection_method, DetectionHistory.disease_detected,
+        DetectionHistory.severity, DetectionHistory.camera_status, db.func.count()
+    ).group_by(day, DetectionHistory.detection_method, DetectionHistory.disease_detected,
+               DetectionHistory.severity, DetectionHistory.camera_status)
+    if start_date:
+        query = query.filter(DetectionHistory.timestamp >= datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        query = query.filter(DetectionHistory.timestamp < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+
+    try:
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # Writers block on their counter upsert until the rebuild commits, so none is lost
+            db.session.execute(db.text('LOCK TABLE detection_statistics IN EXCLUSIVE MODE'))
+        per_day: Dict[date, Counter] = {}
+        for row_day, method, disease, severity, camera_status, count in query:
+            if isinstance(row_day, str):
+                row_day = date.fromisoformat(row_day)  # SQLite returns date() as text
+            counts = detection_counters(method, disease, severity, camera_status)
+            per_day.setdefault(row_day, Counter()).update({name: value * count for name, value in counts.items()})
+
+        stale = DetectionStatistics.query
+        if start_date:
+            stale = stale.filter(DetectionStatistics.date >= start_date)
+        if end_date:
+            stale = stale.filter(DetectionStatistics.date <= end_date)
+        stale.delete(synchronize_session=False)
+
+        now = datetime.utcnow()
+        for row_day, counts in per_day.items():
+            db.session.add(DetectionStatistics(date=row_day, created_at=now, updated_at=now,
+                                               **{name: counts.get(name, 0) for name in COUNTERS}))
+        db.session.commit()
+        logger.info(f"Rebuilt detection statistics for {len(per_day)} days")
+        return len(per_day)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to rebuild detection statistics: {e}")
+        raise StorageError(f"Failed to rebuild detection statistics: {e}")
@@ -0,0 +1,265 @@
+"""
+Device command outbox
+
+submit_device_command() writes the intended device_states row and a
+device_commands row in one transaction; nothing is published inline. One
+dispatcher per host claims pending commands in batches, publishes them to
+greenhouse/control/<type> (with a command_id) and retries failed publishes
+with exponential backoff while the broker is connected. Status reports on
+greenhouse/devices/ mark sent commands acked when the reported status
+matches (and the echoed command_id, if the report carries one); commands
+without a matching report within DEVICE_COMMAND_ACK_TIMEOUT_SECONDS become
+timed_out. A failed or timed-out command puts back the device_states value
+it replaced, unless a report or a newer command has changed it since.
+
+A newer command for the same device supersedes older ones that are still
+pending, so a retried command can never overwrite a later intent.
+"""
+
+import os
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+from sqlalchemy import select, update, func, text
+from app.config import Config
+from app.models.device_command import DeviceCommand
+from app.services.timescale import engine, upsert_device_state, device_status_str
+from app.services.metrics import device_commands_total, device_command_ack_duration
+from app.utils import acquire_process_lock
+
+logger = logging.getLogger(__name__)
+
+commands = DeviceCommand.__table__
+
+
+def submit_device_command(device_id: str, device_type: str, status, source: str = 'manual',
+                          command: str = 'SET_STATE') -> Dict[str, Any]:
+    """Record the intended state and queue its MQTT command atomically"""
+    now = datetime.utcnow()
+    command_id = uuid.uuid4().hex
+    desired = device_status_str(status)
+    payload = {
+        'device_id': device_id,
+        'command': command,
+        'status': status,
+        'command_id': command_id,
+        'timestamp': datetime.now().isoformat()
+    }
+
+    with engine.begin() as conn:
+        previous = conn.execute(text("SELECT status FROM device_states WHERE id = :id"), {'id': device_id}).scalar()
+        superseded = conn.execute(update(commands).where(
+            commands.c.device_id == device_id, commands.c.status == 'pending'
+        ).values(status='superseded', completed_at=now).returning(commands.c.previous_status)).all()
+        if superseded:
+            previous = superseded[0].previous_status  # the device never saw the superseded intent
+        upsert_device_state(conn, device_id, device_type, status)
+        conn.execute(commands.insert().values(
+            command_id=command_id, device_id=device_id, device_type=device_type,
+            topic=f"greenhouse/control/{device_type}", payload=payload,
+            desired_status=desired, previous_status=previous, source=source, status='pending', attempts=0,
+            created_at=now, next_attempt_at=now
+        ))
+        superseded = len(superseded)
+
+    if superseded:
+        device_commands_total.inc(superseded, result='superseded')
+    logger.info(f"Queued {command} {device_id}={desired} ({source}, command {command_id})")
+    if _dispatcher is not None:
+        _dispatcher.wake()
+    return dict(payload, command_status='pending')
+
+
+def _restore_device_states(conn, rows) -> None:
+    """Put back the state failed commands overwrote, unless a report or newer command changed it"""
+    # Newest first, so the oldest failed command restores the last state before all of them
+    for row in sorted(rows, key=lambda row: row.id, reverse=True):
+        if row.previous_status is None:
+            continue
+        conn.execute(text("""
+            UPDATE device_states SET status = :previous, last_updated = CURRENT_TIMESTAMP
+            WHERE id = :device_id AND status = :desired
+              AND NOT EXISTS (SELECT 1 FROM device_commands WHERE device_id = :device_id AND id > :id
+                              AND status IN ('pending', 'sent', 'acked'))
+        """), {'previous': row.previous_status, 'desired': row.desired_status,
+               'device_id': row.device_id, 'id': row.id})
+
+
+def dispatch_batch(mqtt_client, batch_size: int = 50, max_attempts: int = 5,
+                   retry_seconds: float = 2.0, qos: int = 1, now: Optional[datetime] = None) -> int:
+    """Publish one batch of due pending commands; returns the number sent"""
+    if mqtt_client is None or not mqtt_client.connected:
+        return 0  # broker outage: leave the batch due, without spending attempts
+    now = now or datetime.utcnow()
+    # Claim the batch as sent and commit before publishing, so a device that answers
+    # immediately finds its command in the 'sent' state and acks it
+    with engine.begin() as conn:
+        query = select(commands.c.id, commands.c.topic, commands.c.payload, commands.c.attempts,
+                       commands.c.device_id, commands.c.desired_status, commands.c.previous_status).where(
+            commands.c.status == 'pending', commands.c.next_attempt_at <= now
+        ).order_by(commands.c.id).limit(batch_size)
+        if conn.dialect.name == 'postgresql':
+            query = query.with_for_update(skip_locked=True)  # dispatchers on other hosts take other rows
+        rows = conn.execute(query).all()
+        if rows:
+            conn.execute(update(commands).where(commands.c.id.in_([row.id for row in rows])).values(
+                status='sent', sent_at=now, attempts=commands.c.attempts + 1))
+
+    unsent = [row for row in rows if not mqtt_client.publish(row.topic, dict(row.payload), qos=qos)]
+    sent = len(rows) - len(unsent)
+    if sent:
+        device_commands_total.inc(sent, result='sent')
+    if not unsent:
+        return sent
+
+    # Put publish failures back in the queue with backoff, or give up on them
+    with engine.begin() as conn:
+        failed = []
+        for row in unsent:
+            attempts = row.attempts + 1
+            if attempts >= max_attempts:
+                values = {'status': 'failed', 'completed_at': now}
+                failed.append(row)
+                device_commands_total.inc(result='failed')
+                logger.error(f"Giving up on device command {row.payload.get('command_id')} after {attempts} attempts")
+            else:
+                values = {'status': 'pending', 'sent_at': None,
+                          'next_attempt_at': now + timedelta(seconds=retry_seconds * 2 ** (attempts - 1))}
+                device_commands_total.inc(result='retried')
+            conn.execute(update(commands).where(commands.c.id == row.id, commands.c.status == 'sent').values(
+                last_error='publish failed', **values))
+        if failed:
+            _restore_device_states(conn, failed)
+    return sent
+
+
+def acknowledge_reports(reports: Iterable[Dict[str, Any]], now: Optional[datetime] = None) -> int:
+    """Mark sent commands acked by device status reports ({device_id, status[, command_id]}); returns count"""
+    now = now or datetime.utcnow()
+    acked = 0
+    with engine.begin() as conn:
+        for report in reports:
+            match = [commands.c.device_id == report['device_id'],
+                     commands.c.status == 'sent',
+                     commands.c.desired_status == device_status_str(report['status'])]
+            if report.get('command_id'):
+                match.append(commands.c.command_id == report['command_id'])
+            rows = conn.execute(update(commands).where(*match).values(status='acked', completed_at=now).returning(commands.c.sent_at)).all()
+            for row in rows:
+                device_command_ack_duration.observe(max(0.0, (now - row.sent_at).total_seconds()))
+            acked += len(rows)
+    if acked:
+        device_commands_total.inc(acked, result='acked')
+    return acked
+
+
+def expire_commands(timeout_seconds: float, now: Optional[datetime] = None) -> int:
+    """Mark commands sent more than timeout_seconds ago without an ack as timed_out"""
+    now = now or datetime.utcnow()
+    with engine.begin() as conn:
+        rows = conn.execute(update(commands).where(
+            commands.c.status == 'sent',
+            commands.c.sent_at < now - timedelta(seconds=timeout_seconds)
+        ).values(status='timed_out', completed_at=now).returning(
+            commands.c.id, commands.c.device_id, commands.c.desired_status, commands.c.previous_status)).all()
+        _restore_device_states(conn, rows)
+    expired = len(rows)
+    if expired:
+        device_commands_total.inc(expired, result='timed_out')
+        logger.warning(f"{expired} device commands timed out without a status report")
+    return expired
+
+
+def get_command(command_id: str) -> Optional[Dict[str, Any]]:
+    with engine.connect() as conn:
+        row = conn.execute(select(commands).where(commands.c.command_id == command_id)).mappings().first()
+    if row is None:
+        return None
+    return DeviceCommand(**row).to_dict()
+
+
+def get_command_stats(hours: float = 1) -> Dict[str, Any]:
+    """Command counts by state and ack latency for commands created in the last hours"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    with engine.connect() as conn:
+        counts = dict(conn.execute(select(commands.c.status, func.count()).where(
+            commands.c.created_at >= since).group_by(commands.c.status)).all())
+        latencies = sorted((completed - sent).total_seconds() for sent, completed in conn.execute(
+            select(commands.c.sent_at, commands.c.completed_at).where(
+                commands.c.created_at >= since, commands.c.status == 'acked')))
+
+    sent = sum(counts.get(state, 0) for state in ('sent', 'acked', 'timed_out'))
+    return {
+        'window_hours': hours,
+        'by_status': counts,
+        'total': sum(counts.values()),
+        'ack_rate': round(counts.get('acked', 0) / sent, 4) if sent else None,
+        'ack_latency_p50': latencies[len(latencies) // 2] if latencies else None,
+        'ack_latency_p95': latencies[int(len(latencies) * 0.95)] if latencies else None
+    }
+
+
+class CommandDispatcher:
+    """Background thread publishing the outbox and expiring unacknowledged commands"""
+
+    def __init__(self, poll_seconds: float = 0.5):
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='device-commands', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def wake(self):
+        """Commands queued in this process are published without waiting for the poll"""
+        self._wake.set()
+
+    def _run(self):
+        from app.services.mqtt_client import get_mqtt_client
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                self.run_once(get_mqtt_client())
+            except Exception as e:
+                logger.error(f"Device command dispatcher error: {str(e)}")
+            self._wake.wait(self.poll_seconds)
+
+    def run_once(self, mqtt_client) -> int:
+        sent = total = dispatch_batch(mqtt_client, Config.DEVICE_COMMAND_BATCH_SIZE, Config.DEVICE_COMMAND_MAX_ATTEMPTS,
+                                      Config.DEVICE_COMMAND_RETRY_SECONDS, Config.DEVICE_COMMAND_QOS)
+        # Drain a backlog (e.g. after a broker outage) one batch at a time
+        while sent == Config.DEVICE_COMMAND_BATCH_SIZE and not self._stop.is_set():
+            sent = dispatch_batch(mqtt_client, Config.DEVICE_COMMAND_BATCH_SIZE, Config.DEVICE_COMMAND_MAX_ATTEMPTS,
+                                  Config.DEVICE_COMMAND_RETRY_SECONDS, Config.DEVICE_COMMAND_QOS)
+            total += sent
+        expire_commands(Config.DEVICE_COMMAND_ACK_TIMEOUT_SECONDS)
+        return total
+
+
+_dispatcher = None
+
+def get_command_dispatcher() -> Optional[CommandDispatcher]:
+    return _dispatcher
+
+def start_command_dispatcher() -> Optional[CommandDispatcher]:
+    """Start the outbox dispatcher in one worker per host"""
+    global _dispatcher
+    if _dispatcher is not None or not Config.DEVICE_COMMAND_DISPATCHER_ENABLED:
+        return _dispatcher
+    if not acquire_process_lock(os.path.join(os.path.dirname(Config.UPLOAD_FOLDER), 'device_commands.lock')):
+        return None
+    _dispatcher = CommandDispatcher(Config.DEVICE_COMMAND_POLL_SECONDS)
+    _dispatcher.start()
+    return _dispatcher
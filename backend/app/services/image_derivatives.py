@@ -0,0 +1,230 @@
+"""
+Resized image derivatives for galleries
+
+Every stored image (uploads, camera captures, predicted images) gets
+thumb/small/medium WebP derivatives generated by a background thread and
+cached under DERIVATIVE_DIR. send_image() serves the original or a
+derivative depending on the ``size`` query parameter, with a long
+Cache-Control and an ETag derived from the source file's identity, so
+browsers revalidate instead of downloading the full UXGA JPEG per tile.
+
+Clients that do not accept WebP get a JPEG derivative, generated on demand.
+"""
+
+import os
+import queue
+import hashlib
+import logging
+import mimetypes
+import tempfile
+import threading
+from datetime import datetime
+from typing import Optional, Tuple
+from urllib.parse import quote
+from PIL import Image
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels
+SIZES = {'thumb': 160, 'small': 320, 'medium': 800}
+FORMATS = {'webp': ('WEBP', 'image/webp'), 'jpeg': ('JPEG', 'image/jpeg')}
+QUALITY = {'webp': 80, 'jpeg': 85}
+
+
+def source_key(source_path: str) -> str:
+    """Stable key for a source file version (path, size and mtime)"""
+    stat = os.stat(source_path)
+    identity = f"{os.path.abspath(source_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+def derivative_path(source_path: str, size: str, fmt: str, key: Optional[str] = None) -> str:
+    key = key or source_key(source_path)
+    return os.path.join(Config.DERIVATIVE_DIR, size, key[:2], f"{key}.{fmt}")
+
+
+def generate_derivative(source_path: str, size: str, fmt: str = 'webp', key: Optional[str] = None) -> str:
+    """Create (or reuse) one derivative and return its path"""
+    target = derivative_path(source_path, size, fmt, key)
+    if os.path.exists(target):
+        return target
+
+    max_side = SIZES[size]
+    pil_format, _ = FORMATS[fmt]
+    with Image.open(source_path) as image:
+        image.draft('RGB', (max_side, max_side))  # JPEG: decode at reduced scale
+        image = image.convert('RGB')
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        # Write then rename so readers never see a partial file
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                image.save(f, pil_format, quality=QUALITY[fmt])
+            os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return target
+
+
+class DerivativeWorker:
+    """Background thread generating WebP derivatives for new images"""
+
+    def __init__(self, queue_size: int = 1000):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'generated': 0, 'errors': 0, 'dropped': 0}
+
+    def enqueue(self, source_path: str) -> bool:
+        """Queue a source image; never blocks the caller"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(source_path)
+            return True
+        except queue.Full:
+            # Missing derivatives are generated on first request instead
+            self.stats['dropped'] += 1
+            return False
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='image-derivatives', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            source_path = self._queue.get()
+            try:
+                for size in SIZES:
+                    generate_derivative(source_path, size, 'webp')
+                self.stats['generated'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning(f"Failed to generate derivatives for {source_path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Wait until the queue is drained (tests, shutdown)"""
+        self._queue.join()
+
+    def get_stats(self):
+        return dict(self.stats, pending=self._queue.qsize())
+
+
+_worker = None
+
+def get_derivative_worker() -> DerivativeWorker:
+    global _worker
+    if _worker is None:
+        _worker = DerivativeWorker()
+    return _worker
+
+
+def schedule_derivatives(source_path: Optional[str]) -> None:
+    """Queue derivative generation for a newly stored image"""
+    if source_path and Config.DERIVATIVES_ENABLED:
+        get_derivative_worker().enqueue(source_path)
+
+
+def guess_mimetype(path: str) -> Optional[str]:
+    """From the file name, or the image header for extension-less blob files"""
+    mimetype, _ = mimetypes.guess_type(path)
+    if mimetype:
+        return mimetype
+    try:
+        with Image.open(path) as image:
+            return Image.MIME.get(image.format)
+    except Exception:
+        return None
+
+
+def negotiate_format(accept: str) -> str:
+    return 'webp' if 'image/webp' in (accept or '') else 'jpeg'
+
+
+def resolve_image(source_path: str, size: Optional[str], accept: str = '', key: Optional[str] = None,
+                  mimetype: Optional[str] = None) -> Tuple[str, Optional[str], str]:
+    """(file path, mimetype, etag) for a size request
+
+    ``key`` identifies the source version (the content hash for blob
+    files); without it the source is stat'ed to build one.
+    """
+    key = key or source_key(source_path)
+    if not size or size == 'original':
+        return source_path, mimetype or guess_mimetype(source_path), f"{key}-original"
+    if size not in SIZES:
+        raise ValueError(f"Invalid size '{size}', expected one of: original, {', '.join(SIZES)}")
+
+    fmt = negotiate_format(accept)
+    path = derivative_path(source_path, size, fmt, key)
+    if not os.path.exists(path):
+        path = generate_derivative(source_path, size, fmt, key)
+    return path, FORMATS[fmt][1], f"{key}-{size}.{fmt}"
+
+
+def accel_redirect_uri(path: str) -> Optional[str]:
+    """Internal proxy URI for a file under IMAGE_ACCEL_ROOT, or None"""
+    if not Config.IMAGE_ACCEL_REDIRECT_PREFIX:
+        return None
+    root = os.path.abspath(Config.IMAGE_ACCEL_ROOT)
+    path = os.path.abspath(path)
+    if os.path.commonpath([root, path]) != root:
+        return None
+    relative = os.path.relpath(path, root).replace(os.sep, '/')
+    return Config.IMAGE_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(relative)
+
+
+def send_image(source_path: str, key: Optional[str] = None, last_modified: Optional[datetime] = None,
+               mimetype: Optional[str] = None):
+    """Flask response for an image honouring ?size= with caching headers
+
+    Conditional requests (ETag / If-Modified-Since) and Range are answered
+    here. With IMAGE_ACCEL_REDIRECT_PREFIX set the body is left to the
+    fronting nginx (X-Accel-Redirect), otherwise send_file streams it through
+    wsgi.file_wrapper, which gunicorn serves with sendfile().
+    """
+    from flask import current_app, request, send_file, jsonify
+
+    size = request.args.get('size')
+    try:
+        path, mimetype, etag = resolve_image(source_path, size, request.headers.get('Accept', ''),
+                                             key=key, mimetype=mimetype)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': 'Image not found'}), 404
+
+    # Derivatives have their own mtime; the caller's value only describes the original
+    if size and size != 'original':
+        last_modified = None
+
+    accel_uri = accel_redirect_uri(path)
+    if accel_uri:
+        response = current_app.response_class(mimetype=mimetype or 'application/octet-stream')
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.cache_control.max_age = Config.IMAGE_CACHE_MAX_AGE
+        response.make_conditional(request)
+        if response.status_code == 200:
+            # nginx serves the file (and Range requests) from its internal location
+            response.headers['X-Accel-Redirect'] = accel_uri
+    else:
+        try:
+            response = send_file(path, mimetype=mimetype, etag=etag, conditional=True,
+                                 last_modified=last_modified, max_age=Config.IMAGE_CACHE_MAX_AGE)
+        except FileNotFoundError:
+            return jsonify({'success': False, 'error': 'Image not found'}), 404
+
+    response.cache_control.public = True
+    if size and size != 'original':
+        response.vary.add('Accept')
+    return response
@@ -3,9 +3,15 @@ Image processing utilities for disease detection
 """
 import cv2
 import os
+import time
+import logging
 import numpy as np
 from datetime import datetime
 from typing import List, Dict, Tuple
+from app.services.metrics import ai_inference_duration
+from app.services.image_derivatives import schedule_derivatives
+
+logger = logging.getLogger(__name__)
 
 def create_predicted_image(original_image_path: str, ai_results: List[Dict], save_dir: str) -> str:
     """
@@ -19,6 +25,7 @@ def create_predicted_image(original_image_path: str, ai_results: List[Dict], sav
     Returns:
         Đường dẫn ảnh predicted đã tạo
     """
+    started = time.perf_counter()
     try:
         # Đọc ảnh gốc
         image = cv2.imread(original_image_path)
@@ -39,6 +46,10 @@ def create_predicted_image(original_image_path: str, ai_results: List[Dict], sav
         os.makedirs(save_dir, exist_ok=True)
         cv2.imwrite(predicted_path, annotated_image)
         
+        elapsed = time.perf_counter() - started
+        ai_inference_duration.observe(elapsed, stage='annotate')
+        logger.info("AI timings for %s: annotate=%.1fms", original_filename, elapsed * 1000)
+        schedule_derivatives(predicted_path)
         return predicted_path
         
     except Exception as e:
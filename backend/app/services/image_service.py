@@ -4,8 +4,11 @@ from datetime import datetime
 from werkzeug.utils import secure_filename
 from app.config import Config
 from app.models.image import ImageMetadata
-from app.utils import StorageError, ensure_directory_exists
-from app.services.cache_service import cache
+from app.utils import StorageError
+from app.services.cache_service import cache, clear_cache
+from app.services.image_derivatives import schedule_derivatives
+from app.services.blob_store import get_blob_store, add_ref, release_ref, collect_garbage
+from app.services.storage_accounting import record_usage, get_storage_totals
 from app import db
 
 logger = logging.getLogger(__name__)
@@ -37,44 +40,41 @@ def save_image(file, device_id):
         filename = secure_filename(file.filename)
         file_ext = filename.rsplit('.', 1)[1].lower()
         
-        # Tạo đường dẫn theo cấu trúc: device_id/YYYY-MM-DD/HHMMSS.ext
-        date_folder = timestamp.strftime('%Y-%m-%d')
-        time_str = timestamp.strftime('%H%M%S')
-        rel_path = os.path.join(device_id, date_folder, f"{time_str}.{file_ext}")
-        abs_path = os.path.join(Config.UPLOAD_FOLDER, rel_path)
-        
-        # Tạo thư mục nếu chưa tồn tại
-        try:
-            ensure_directory_exists(os.path.dirname(abs_path))
-        except Exception as e:
-            logger.error(f"Failed to create directory for image: {e}")
-            raise StorageError(f"Failed to create directory: {e}")
-        
-        # Lưu file
+        # Lưu nội dung vào blob store (ảnh trùng nội dung chỉ lưu một lần)
         try:
-            file.save(abs_path)
+            if hasattr(file.stream, 'seek'):
+                file.stream.seek(0)  # stream may already have been read by file.save()
+            digest, size = get_blob_store().put_stream(file.stream)
         except Exception as e:
             logger.error(f"Failed to save image file: {e}")
             raise StorageError(f"Failed to save image: {e}")
         
-        # Tạo và lưu metadata
+        # Tên logic: device_id/YYYY-MM-DD/HHMMSS_ffffff_<hash>.ext, duy nhất kể cả khi chụp cùng giây
+        date_folder = timestamp.strftime('%Y-%m-%d')
+        time_str = timestamp.strftime('%H%M%S_%f')
+        rel_path = os.path.join(device_id, date_folder, f"{time_str}_{digest[:12]}.{file_ext}")
+        
+        # Tạo và lưu metadata cùng với tham chiếu blob trong một transaction
         try:
             metadata = ImageMetadata(
                 device_id=device_id,
                 timestamp=timestamp,
                 image_path=rel_path,
-                file_type=file_ext
+                file_type=file_ext,
+                content_hash=digest
             )
+            add_ref(digest, size, file.mimetype or None, device_id)
+            record_usage(device_id, timestamp, images=1)
             db.session.add(metadata)
             db.session.commit()
             
-            logger.info(f"Successfully saved image: {rel_path}")
+            logger.info(f"Successfully saved image: {rel_path} ({digest})")
+            schedule_derivatives(get_blob_store().path(digest))
             return metadata
             
         except Exception as e:
-            # Xóa file nếu lưu metadata thất bại
-            if os.path.exists(abs_path):
-                os.remove(abs_path)
+            # Giữ file blob: upload trùng nội dung sau này sẽ dùng lại nó
+            db.session.rollback()
             logger.error(f"Failed to save image metadata: {e}")
             raise StorageError(f"Failed to save image metadata: {e}")
             
@@ -103,47 +103,76 @@ def get_images(device_id=None, start_date=None, end_date=None):
         logger.error(f"Failed to query images: {e}")
         raise StorageError(f"Failed to query images: {e}")
 
-@cache(ttl=300, key_prefix='image_path')  # Cache for 5 minutes
-def get_image_path(image_id):
-    """Lấy đường dẫn tuyệt đối đến file ảnh từ ID"""
+def resolve_image_file(metadata):
+    """Đường dẫn file của ảnh: blob nếu có content_hash, ngược lại cây UPLOAD_FOLDER cũ"""
+    if metadata.content_hash:
+        return get_blob_store().path(metadata.content_hash)
+    return os.path.join(Config.UPLOAD_FOLDER, metadata.image_path)
+
+MIMETYPES = {'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+
+@cache(ttl=300, key_prefix='image_source')  # Cache for 5 minutes
+def get_image_source(image_id):
+    """Thông tin để phục vụ ảnh, lấy từ metadata (không stat file)
+    
+    Returns:
+        dict với path, key (content hash, dùng làm ETag), last_modified và mimetype,
+        hoặc None nếu không có ảnh
+    """
     try:
-        metadata = ImageMetadata.query.get(image_id)
-        if metadata:
-            abs_path = os.path.join(Config.UPLOAD_FOLDER, metadata.image_path)
-            if os.path.exists(abs_path):
-                return abs_path
-            else:
-                logger.warning(f"Image file not found: {abs_path}")
-                return None
-        return None
+        metadata = db.session.get(ImageMetadata, image_id)
+        if not metadata:
+            return None
+        return {
+            'path': resolve_image_file(metadata),
+            'key': metadata.content_hash,
+            'last_modified': metadata.archived_at or metadata.timestamp,
+            'mimetype': MIMETYPES.get(metadata.file_type)  # archiving sets file_type to jpg
+        }
         
     except Exception as e:
-        logger.error(f"Failed to get image path: {e}")
-        raise StorageError(f"Failed to get image path: {e}")
+        logger.error(f"Failed to get image source: {e}")
+        raise StorageError(f"Failed to get image source: {e}")
+
+def get_image_path(image_id):
+    """Lấy đường dẫn tuyệt đối đến file ảnh từ ID (không kiểm tra file tồn tại)"""
+    source = get_image_source(image_id)
+    return source['path'] if source else None
 
 def delete_image(image_id):
     """Xóa ảnh và metadata"""
     try:
         metadata = ImageMetadata.query.get(image_id)
         if metadata:
-            # Xóa file
-            file_path = os.path.join(Config.UPLOAD_FOLDER, metadata.image_path)
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    logger.error(f"Failed to delete image file: {e}")
-                    raise StorageError(f"Failed to delete image file: {e}")
+            # Ảnh cũ (trước blob store) có file riêng trong UPLOAD_FOLDER
+            if not metadata.content_hash:
+                file_path = os.path.join(Config.UPLOAD_FOLDER, metadata.image_path)
+                if os.path.exists(file_path):
+                    try:
+                        os.remove(file_path)
+                    except Exception as e:
+                        logger.error(f"Failed to delete image file: {e}")
+                        raise StorageError(f"Failed to delete image file: {e}")
             
-            # Xóa metadata
+            # Xóa metadata và giảm tham chiếu blob; file blob được collect_garbage() xóa khi không còn ai dùng
             try:
+                release_ref(metadata.content_hash)
+                record_usage(metadata.device_id, metadata.timestamp, images=-1)
                 db.session.delete(metadata)
                 db.session.commit()
                 logger.info(f"Successfully deleted image: {metadata.image_path}")
-                return True
+                clear_cache(f"image_source:get_image_source:({image_id},)")
             except Exception as e:
+                db.session.rollback()
                 logger.error(f"Failed to delete image metadata: {e}")
                 raise StorageError(f"Failed to delete image metadata: {e}")
+            
+            # Dọn các blob đã hết tham chiếu quá thời gian chờ (không làm hỏng thao tác xóa)
+            try:
+                collect_garbage()
+            except StorageError:
+                pass
+            return True
         return False
         
     except Exception as e:
@@ -174,17 +203,16 @@ def get_device_image_stats(device_id):
 def get_storage_stats():
     """Get storage statistics for images"""
     try:
-        total_size = 0
-        for root, dirs, files in os.walk(Config.UPLOAD_FOLDER):
-            total_size += sum(os.path.getsize(os.path.join(root, name)) 
-                            for name in files)
-        
-        total_images = ImageMetadata.query.count()
+        # Bộ đếm storage_usage được cập nhật khi ghi/xóa, không cần duyệt thư mục
+        totals = get_storage_totals()
+        total_images = totals['total_images']
+        total_size = totals['total_bytes']
         
         return {
             'total_images': total_images,
             'total_size_bytes': total_size,
-            'total_size_mb': round(total_size / (1024 * 1024), 2)
+            'total_size_mb': round(total_size / (1024 * 1024), 2),
+            'total_files': totals['total_files']
         }
     except Exception as e:
         logger.error(f"Failed to get storage stats: {e}")
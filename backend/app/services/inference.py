@@ -0,0 +1,110 @@
+"""
+Disease-detection service boundary
+
+API code calls these functions instead of importing ai_service.handler
+directly. The handler pulls in torch, torchvision, ultralytics and OpenCV,
+which costs seconds and hundreds of MB per process, so it is only imported
+on the first detection request (or at startup when AI_PRELOAD is set).
+
+When INFERENCE_SERVER_ADDRESS is set, jobs go to the inference server
+process instead (see inference_server.py) and API workers never load the
+models at all.
+"""
+
+import logging
+import threading
+import importlib
+from typing import Dict, List, Optional
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Modules that must never be imported by create_app() itself
+HEAVY_MODULES = ('torch', 'torchvision', 'ultralytics', 'cv2')
+
+_handler = None
+_handler_lock = threading.Lock()
+_client = None
+
+
+def _get_handler():
+    global _handler
+    if _handler is None:
+        with _handler_lock:
+            if _handler is None:
+                _handler = importlib.import_module('app.services.ai_service.handler')
+    return _handler
+
+
+def get_inference_client():
+    """Client for the inference server, or None to run detection in-process"""
+    global _client
+    if _client is None and Config.INFERENCE_SERVER_ADDRESS:
+        from app.services.inference_server import InferenceClient
+        _client = InferenceClient(Config.INFERENCE_SERVER_ADDRESS, Config.INFERENCE_AUTHKEY.encode(),
+                                  timeout=Config.INFERENCE_TIMEOUT)
+    return _client
+
+
+def analyze_leaf_image(image_path: str, timings: Optional[Dict] = None) -> List[Dict]:
+    """Run disease detection on an image file (see handler.process_leaf_image)"""
+    client = get_inference_client()
+    if client is None:
+        return _get_handler().process_leaf_image(image_path, timings)
+
+    try:
+        return client.analyze(image_path, timings)
+    except Exception as e:
+        logger.error(f"Inference server unavailable at {Config.INFERENCE_SERVER_ADDRESS}: {str(e)}")
+        return [{"predicted_class": "Error: Inference server unavailable", "confidence": 0.0}]
+
+
+def determine_severity(confidence: float) -> str:
+    """Xác định mức độ nghiêm trọng dựa trên confidence score"""
+    if confidence > 0.8:
+        return "high"
+    elif confidence > 0.5:
+        return "medium"
+    return "low"
+
+
+def to_ai_results(results: List[Dict]) -> List:
+    """Convert raw detection results to AIResult models"""
+    from app.models.detection import AIResult
+    return [
+        AIResult(
+            leaf_index=i + 1,
+            predicted_class=result.get('predicted_class', 'Unknown'),
+            confidence=result.get('confidence', 0.0),
+            type='disease' if 'bệnh' in result.get('predicted_class', '').lower() else 'pest',
+            severity=determine_severity(result.get('confidence', 0.0))
+        )
+        for i, result in enumerate(results)
+    ]
+
+
+def preload_models() -> bool:
+    """Import the ML stack and load the model weights"""
+    handler = _get_handler()
+    if handler.yolo_model is not None and handler.resnet_model is not None:
+        return True
+    return handler.initialize_models()
+
+
+def preload_in_background() -> threading.Thread:
+    """Load the models on a daemon thread so startup is not blocked"""
+    def target():
+        try:
+            loaded = preload_models()
+            logger.info("AI models preloaded" if loaded else "AI model preload failed")
+        except Exception as e:
+            logger.error(f"Error preloading AI models: {str(e)}")
+
+    thread = threading.Thread(target=target, name='ai-preload', daemon=True)
+    thread.start()
+    return thread
+
+
+def is_loaded() -> bool:
+    """Whether the ML stack has been imported in this process"""
+    return _handler is not None
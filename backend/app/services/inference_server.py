@@ -0,0 +1,203 @@
+"""
+Inference server: one process per host owns the YOLO and ResNet models
+
+API workers send image paths over a local socket (Unix socket path, or
+host:port on platforms without AF_UNIX). Requests that arrive within
+INFERENCE_BATCH_WAIT_MS of each other are run as one batch through
+handler.process_leaf_images, so several cameras submitting at once share
+a YOLO call and a ResNet forward pass.
+
+Protocol (multiprocessing.connection, authenticated with INFERENCE_AUTHKEY,
+which is required for every address since messages are unpickled):
+    {'op': 'analyze', 'image_path': ...} -> {'results': [...], 'timings': {...}}
+    {'op': 'stats'}                      -> {'requests': ..., 'batches': ..., ...}
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from multiprocessing.connection import Listener, Client
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """'host:port' becomes a TCP address, anything else is a Unix socket path"""
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit() and '/' not in address:
+        return host, int(port)
+    return address
+
+
+def require_authkey(authkey: Optional[bytes]) -> bytes:
+    """Connections unpickle what they receive, so none may run unauthenticated
+
+    Unix sockets are created with the process umask and are usually
+    connectable by every local user, so they need the key as much as TCP.
+    """
+    if not authkey:
+        raise ValueError("INFERENCE_AUTHKEY must be set to run or use the inference server")
+    return authkey
+
+
+class InferenceJob:
+    __slots__ = ('image_path', 'timings', 'results', 'done', 'enqueued')
+
+    def __init__(self, image_path: str):
+        self.image_path = image_path
+        self.timings = {}
+        self.results = None
+        self.done = threading.Event()
+        self.enqueued = time.perf_counter()
+
+
+class InferenceServer:
+    """Accepts jobs from API workers and runs them in dynamic batches"""
+
+    def __init__(self, address: str, authkey: bytes, max_batch: int = 8, batch_wait_ms: float = 20,
+                 process_batch=None):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait_ms / 1000
+        self._process_batch = process_batch
+        self._jobs = queue.Queue()
+        self._listener = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'batches': 0, 'max_batch_size': 0, 'errors': 0}
+
+    def start(self):
+        """Load the models, bind the socket and start the batching thread"""
+        if self._process_batch is None:
+            from app.services.ai_service import handler
+            if not handler.initialize_models():
+                raise RuntimeError('Cannot initialize AI models')
+            self._process_batch = handler.process_leaf_images
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)  # stale socket from a previous run
+        self._listener = Listener(self.address, authkey=self.authkey)
+        threading.Thread(target=self._batch_loop, name='inference-batcher', daemon=True).start()
+        logger.info(f"Inference server listening on {self.address} "
+                    f"(max batch {self.max_batch}, wait {self.batch_wait * 1000:.0f}ms)")
+
+    def serve_forever(self):
+        while not self._stop.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                break  # listener closed by stop()
+            except Exception as e:
+                logger.warning(f"Rejected inference connection: {e}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self._jobs.put(None)
+        if self._listener is not None:
+            self._listener.close()
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.unlink(self.address)
+
+    def submit(self, image_path: str) -> InferenceJob:
+        job = InferenceJob(image_path)
+        self._jobs.put(job)
+        return job
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats['avg_batch_size'] = round(stats['requests'] / stats['batches'], 2) if stats['batches'] else 0
+        stats['queued'] = self._jobs.qsize()
+        return stats
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                while True:
+                    message = conn.recv()
+                    if message.get('op') == 'stats':
+                        conn.send(self.get_stats())
+                        continue
+
+                    job = self.submit(message['image_path'])
+                    job.done.wait()
+                    conn.send({'results': job.results, 'timings': job.timings})
+            except EOFError:
+                pass
+            except Exception as e:
+                logger.error(f"Inference connection error: {str(e)}")
+
+    def _collect_batch(self) -> List[InferenceJob]:
+        """Block for one job, then take more until the batch is full or the wait expires"""
+        first = self._jobs.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.batch_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                job = self._jobs.get(timeout=remaining) if remaining > 0 else self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self._stop.set()
+                break
+            batch.append(job)
+        return batch
+
+    def _batch_loop(self):
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                break
+
+            started = time.perf_counter()
+            for job in batch:
+                job.timings['queue'] = (started - job.enqueued) * 1000
+            try:
+                results = self._process_batch([job.image_path for job in batch], [job.timings for job in batch])
+            except Exception as e:
+                logger.error(f"Inference batch failed: {str(e)}")
+                results = [[{"predicted_class": f"AI processing error: {str(e)}", "confidence": 0.0}]] * len(batch)
+                with self._lock:
+                    self.stats['errors'] += 1
+
+            with self._lock:
+                self.stats['requests'] += len(batch)
+                self.stats['batches'] += 1
+                self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+            for job, result in zip(batch, results):
+                job.results = result
+                job.done.set()
+
+
+class InferenceClient:
+    """Sends detection jobs to an InferenceServer"""
+
+    def __init__(self, address: str, authkey: bytes, timeout: float = 120):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self.timeout = timeout
+
+    def _call(self, message: Dict) -> Dict:
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send(message)
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"No inference result within {self.timeout}s")
+            return conn.recv()
+
+    def analyze(self, image_path: str, timings: Optional[Dict] = None) -> List[Dict]:
+        reply = self._call({'op': 'analyze', 'image_path': os.path.abspath(image_path)})
+        if timings is not None:
+            timings.update(reply.get('timings') or {})
+        return reply['results']
+
+    def stats(self) -> Dict:
+        return self._call({'op': 'stats'})
@@ -0,0 +1,289 @@
+"""
+Write-ahead spool for sensor ingest
+
+Readings that cannot be committed to TimescaleDB are appended to a local
+SQLite database in WAL mode and replayed in order, in bulk, by a background
+thread once the database is reachable again.
+
+Only processes that ingest MQTT readings open a spool (open_ingest_spool),
+and each spool file has a single owner: the depth is tracked in memory and
+the replay thread deletes rows, so two owners would miss rows or race.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.exc import OperationalError, InterfaceError
+from app.config import Config
+from app.utils import acquire_process_lock
+
+logger = logging.getLogger(__name__)
+
+# SQLite synchronous levels for the fsync policy
+#   off    - never fsync, fastest, a power loss can drop recent rows
+#   normal - fsync on WAL checkpoint, survives process crashes
+#   full   - fsync every append
+FSYNC_POLICIES = {
+    'off': 'OFF',
+    'normal': 'NORMAL',
+    'full': 'FULL'
+}
+
+
+class IngestSpool:
+    """Append-only spool of sensor_data rows backed by SQLite WAL"""
+
+    def __init__(self, path: str, max_rows: int = 1000000, max_bytes: int = 256 * 1024 * 1024,
+                 fsync: str = 'normal', batch_size: int = 500, replay_pause: float = 0.05):
+        """
+        Args:
+            path: SQLite file for the spool
+            max_rows: Maximum number of buffered rows
+            max_bytes: Maximum size of the spool database
+            fsync: One of 'off', 'normal', 'full'
+            batch_size: Rows per bulk insert during replay
+            replay_pause: Seconds to sleep between replay batches so live
+                ingest keeps most of the database capacity
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Invalid spool fsync policy: {fsync}")
+
+        self.path = path
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.batch_size = batch_size
+        self.replay_pause = replay_pause
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._replay_thread = None
+
+        # Metrics
+        self.appended_total = 0
+        self.replayed_total = 0
+        self.dropped_total = 0
+        self.discarded_total = 0
+        self.replay_failures = 0
+        self.replay_rate = 0.0
+        self.last_replay_error = None
+        self.last_replay_time = None
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={FSYNC_POLICIES[fsync]}")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                time TEXT NOT NULL,
+                device_id TEXT NOT NULL,
+                sensor_type TEXT NOT NULL,
+                value REAL NOT NULL
+            )
+        """)
+        self._depth = self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+        self._page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+
+    def _size_bytes(self) -> int:
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * self._page_size
+
+    def append(self, rows: List[Dict]) -> bool:
+        """Append prepared sensor_data rows to the spool
+
+        Returns:
+            False if the spool is full and the rows were dropped
+        """
+        with self._lock:
+            if self._depth + len(rows) > self.max_rows or self._size_bytes() >= self.max_bytes:
+                self.dropped_total += len(rows)
+                logger.error(f"Ingest spool full ({self._depth} rows), dropped {len(rows)} rows")
+                return False
+
+            self._conn.executemany(
+                "INSERT INTO spool (time, device_id, sensor_type, value) VALUES (?, ?, ?, ?)",
+                [(row['timestamp'].isoformat(), row['device_id'], row['sensor_type'], row['value'])
+                 for row in rows]
+            )
+            self._depth += len(rows)
+            self.appended_total += len(rows)
+
+        self._wakeup.set()
+        return True
+
+    def depth(self) -> int:
+        """Number of rows waiting to be replayed"""
+        return self._depth
+
+    def _read_batch(self):
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT id, time, device_id, sensor_type, value FROM spool ORDER BY id LIMIT ?",
+                (self.batch_size,)
+            )
+            return cursor.fetchall()
+
+    def _delete_through(self, last_id: int, count: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM spool WHERE id <= ?", (last_id,))
+            self._depth = max(0, self._depth - count)
+
+    def replay_once(self) -> int:
+        """Replay the oldest batch of spooled rows
+
+        Returns:
+            Number of rows removed from the spool
+
+        Raises:
+            OperationalError, InterfaceError: If the database is still unavailable
+        """
+        from app.services.timescale import save_sensor_data_batch
+
+        batch = self._read_batch()
+        if not batch:
+            return 0
+
+        rows = [{
+            'timestamp': datetime.fromisoformat(row[1]),
+            'device_id': row[2],
+            'sensor_type': row[3],
+            'value': row[4]
+        } for row in batch]
+
+        try:
+            save_sensor_data_batch(rows)
+        except (OperationalError, InterfaceError):
+            raise
+        except Exception as e:
+            # A bad row must not block the spool forever, retry one by one
+            # and discard only the rows the database rejects
+            logger.error(f"Bulk replay failed, retrying rows individually: {e}")
+            for row in rows:
+                try:
+                    save_sensor_data_batch([row])
+                except (OperationalError, InterfaceError):
+                    raise
+                except Exception as row_error:
+                    self.discarded_total += 1
+                    logger.error(f"Discarded spooled row {row}: {row_error}")
+
+        self._delete_through(batch[-1][0], len(batch))
+        self.replayed_total += len(batch)
+        return len(batch)
+
+    def _replay_loop(self):
+        logger.info("Ingest spool replay thread started")
+        backoff = 1
+
+        while not self._stop_event.is_set():
+            if self._depth == 0:
+                self._wakeup.wait(timeout=5)
+                self._wakeup.clear()
+                continue
+
+            started = time.time()
+            try:
+                replayed = self.replay_once()
+            except Exception as e:
+                self.replay_failures += 1
+                self.last_replay_error = str(e)
+                logger.warning(f"Spool replay failed ({self._depth} rows pending), retrying in {backoff}s: {e}")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 60)
+                continue
+
+            backoff = 1
+            elapsed = time.time() - started
+            if replayed and elapsed > 0:
+                # Exponentially weighted rows/second over recent batches
+                self.replay_rate = 0.8 * self.replay_rate + 0.2 * (replayed / elapsed)
+                self.last_replay_time = time.time()
+                logger.debug(f"Replayed {replayed} spooled rows, {self._depth} pending")
+            if self._depth == 0:
+                self.replay_rate = 0.0
+                logger.info("Ingest spool drained")
+
+            self._stop_event.wait(self.replay_pause)
+
+        logger.info("Ingest spool replay thread stopped")
+
+    def start(self):
+        """Start the background replay thread"""
+        if self._replay_thread and self._replay_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._replay_thread = threading.Thread(
+            target=self._replay_loop,
+            daemon=True,
+            name="IngestSpoolReplay"
+        )
+        self._replay_thread.start()
+
+    def stop(self):
+        """Stop the replay thread"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._replay_thread:
+            self._replay_thread.join(timeout=5)
+
+    def get_stats(self) -> dict:
+        """Get spool depth and replay metrics"""
+        with self._lock:
+            size_bytes = self._size_bytes()
+        return {
+            'depth': self._depth,
+            'size_mb': round(size_bytes / (1024 * 1024), 2),
+            'max_rows': self.max_rows,
+            'max_size_mb': round(self.max_bytes / (1024 * 1024), 2),
+            'fsync': self.fsync,
+            'appended_total': self.appended_total,
+            'replayed_total': self.replayed_total,
+            'dropped_total': self.dropped_total,
+            'discarded_total': self.discarded_total,
+            'replay_failures': self.replay_failures,
+            'replay_rate': round(self.replay_rate, 2),
+            'last_replay_time': self.last_replay_time,
+            'last_replay_error': self.last_replay_error
+        }
+
+
+# Singleton instance
+_ingest_spool = None
+_spool_lock = threading.Lock()
+
+def get_ingest_spool() -> Optional[IngestSpool]:
+    """Get this process's ingest spool, or None if it does not ingest or spooling is disabled"""
+    return _ingest_spool
+
+def open_ingest_spool(path: Optional[str] = None) -> Optional[IngestSpool]:
+    """Open the spool at path (default INGEST_SPOOL_PATH) and replay what it holds
+
+    Returns None when spooling is disabled or another process owns the file.
+    """
+    global _ingest_spool
+    if not Config.INGEST_SPOOL_ENABLED:
+        return None
+    path = path or Config.INGEST_SPOOL_PATH
+
+    with _spool_lock:
+        if _ingest_spool is None:
+            if not acquire_process_lock(f"{path}.lock"):
+                logger.warning(f"Ingest spool {path} is owned by another process, running without a spool")
+                return None
+            _ingest_spool = IngestSpool(
+                path=path,
+                max_rows=Config.INGEST_SPOOL_MAX_ROWS,
+                max_bytes=Config.INGEST_SPOOL_MAX_MB * 1024 * 1024,
+                fsync=Config.INGEST_SPOOL_FSYNC,
+                batch_size=Config.INGEST_SPOOL_BATCH_SIZE
+            )
+            _ingest_spool.start()
+            logger.info(f"Ingest spool opened at {path} ({_ingest_spool.depth()} rows pending)")
+        return _ingest_spool
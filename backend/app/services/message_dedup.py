@@ -0,0 +1,95 @@
+"""
+Fixed-memory deduplication for MQTT ingest
+
+Keys are 64-bit hashes of (topic, device_id, type, time) kept in insertion
+order, so expiry and capacity eviction both pop from the front in O(1).
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+
+class MessageDeduplicator:
+    """LRU of reading hashes bounded by a time window and an entry cap"""
+
+    def __init__(self, window_seconds: int = 600, max_entries: int = 50000):
+        """
+        Args:
+            window_seconds: How long a reading key is remembered
+            max_entries: Hard cap on remembered keys (memory bound)
+        """
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.checked_total = 0
+        self.duplicate_hits = 0
+        self.expired_total = 0
+        self.evicted_total = 0
+
+    def seen(self, topic: str, device_id: str, kind: str, timestamp: str) -> bool:
+        """Record a reading and report whether it was already processed
+
+        Args:
+            topic: Ingest topic (sensors/devices)
+            device_id: Device that produced the reading
+            kind: Sensor or device type
+            timestamp: Reading time as sent by the device
+
+        Returns:
+            True if the same reading was seen within the window
+        """
+        key = hash((topic, device_id, kind, timestamp))
+        now = time.monotonic()
+
+        with self._lock:
+            self.checked_total += 1
+            self._expire(now)
+
+            if key in self._entries:
+                self.duplicate_hits += 1
+                return True
+
+            self._entries[key] = now
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted_total += 1
+            return False
+
+    def forget(self, topic: str, device_id: str, kind: str, timestamp: str) -> None:
+        """Drop a reading recorded by ``seen`` whose processing failed, so a redelivery is retried"""
+        with self._lock:
+            self._entries.pop(hash((topic, device_id, kind, timestamp)), None)
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        entries = self._entries
+        while entries:
+            key, first_seen = next(iter(entries.items()))
+            if first_seen >= cutoff:
+                break
+            entries.popitem(last=False)
+            self.expired_total += 1
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get deduplication metrics
+
+        ``false_positive_rate`` is the chance that a new reading collides
+        with a remembered 64-bit hash and is wrongly dropped.
+        """
+        with self._lock:
+            size = len(self._entries)
+            return {
+                'entries': size,
+                'max_entries': self.max_entries,
+                'window_seconds': self.window_seconds,
+                'checked_total': self.checked_total,
+                'duplicate_hits': self.duplicate_hits,
+                'duplicate_ratio': round(self.duplicate_hits / self.checked_total, 4) if self.checked_total else 0,
+                'expired_total': self.expired_total,
+                'evicted_total': self.evicted_total,
+                'false_positive_rate': size / 2 ** 64
+            }
@@ -0,0 +1,352 @@
+"""
+Prometheus-style metrics
+
+Counters, gauges and fixed-bucket histograms kept in process memory and
+rendered in the Prometheus text exposition format by GET /metrics. Recording
+a value is a dict lookup and a few integer additions under a lock, so it is
+cheap enough for the ingest and request hot paths.
+"""
+
+import os
+import sys
+import time
+import bisect
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds (5ms .. 30s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set directly or read from a callback"""
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        if self._callback is not None:
+            try:
+                value = self._callback()
+            except Exception as e:
+                logger.debug("Gauge %s callback failed: %s", self.name, e)
+                return []
+            if value is None:
+                return []
+            return [f"{self.name} {_format_value(value)}"]
+
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Histogram(_Metric):
+    """Distribution of observations over a fixed set of buckets
+
+    Memory per label set is one integer per bucket, independent of how many
+    values are observed.
+    """
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, **labels):
+        """Context manager observing the elapsed time of a block"""
+        return _Timer(self, labels)
+
+    def get_count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, list(series[0]), series[1]) for key, series in self._series.items()]
+
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Ordered collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _spool_depth():
+    from app.services.ingest_spool import get_ingest_spool
+    spool = get_ingest_spool()
+    return spool.depth() if spool is not None else None
+
+
+def _cache_hit_ratio():
+    hits = cache_requests_total.get(result='hit')
+    misses = cache_requests_total.get(result='miss')
+    return hits / (hits + misses) if hits + misses else None
+
+
+http_request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request duration by route',
+    ('method', 'route', 'status')
+))
+db_query_duration = registry.register(Histogram(
+    'db_query_duration_seconds', 'Database statement duration by call site',
+    ('call_site',), buckets=DB_BUCKETS
+))
+ingest_queue_depth = registry.register(Gauge(
+    'ingest_spool_depth', 'Sensor readings waiting in the ingest spool',
+    callback=_spool_depth
+))
+mqtt_messages_total = registry.register(Counter(
+    'mqtt_messages_total', 'MQTT messages received by topic', ('topic',)
+))
+mqtt_errors_total = registry.register(Counter(
+    'mqtt_errors_total', 'MQTT processing errors by topic and type', ('topic', 'type')
+))
+cache_requests_total = registry.register(Counter(
+    'cache_requests_total', 'Cache lookups by result', ('result',)
+))
+cache_hit_ratio = registry.register(Gauge(
+    'cache_hit_ratio', 'Cache hits / lookups since start',
+    callback=_cache_hit_ratio
+))
+ai_inference_duration = registry.register(Histogram(
+    'ai_inference_duration_seconds', 'Disease detection duration by stage', ('stage',)
+))
+device_commands_total = registry.register(Counter(
+    'device_commands_total', 'Device command outbox transitions by result', ('result',)
+))
+device_command_ack_duration = registry.register(Histogram(
+    'device_command_ack_seconds', 'Time from publishing a device command to the matching status report',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+))
+
+
+# Database call sites
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def _db_call_site() -> str:
+    """module:function of the nearest app frame that issued the statement"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR) and filename != _THIS_FILE:
+            module = frame.f_globals.get('__name__', filename)
+            return f"{module}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+# Callables notified of every timed statement as
+# observer(statement, parameters, seconds, call_site)
+_query_observers: List[Callable] = []
+
+
+def add_query_observer(observer: Callable) -> None:
+    """Receive the duration and call site of every SQL statement"""
+    if observer not in _query_observers:
+        _query_observers.append(observer)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append((time.perf_counter(), _db_call_site(), statement))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get('metrics_query_start')
+    if stack:
+        start, call_site, _ = stack.pop()
+        elapsed = time.perf_counter() - start
+        db_query_duration.observe(elapsed, call_site=call_site)
+        for observer in _query_observers:
+            try:
+                observer(statement, parameters, elapsed, call_site)
+            except Exception as e:
+                logger.debug("Query observer failed: %s", e)
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start entry
+    conn = context.connection
+    stack = conn.info.get('metrics_query_start') if conn is not None else None
+    if stack and stack[-1][2] == context.statement:
+        stack.pop()
+
+
+_db_instrumented = False
+
+
+def instrument_sqlalchemy():
+    """Time every statement on every SQLAlchemy engine in this process"""
+    global _db_instrumented
+    if _db_instrumented:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    _db_instrumented = True
+
+
+def init_metrics(app):
+    """Register request timing middleware and the /metrics endpoint"""
+    from flask import g, request, Response
+
+    instrument_sqlalchemy()
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            # Use the URL rule, not the path, so label cardinality stays bounded
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                method=request.method, route=route, status=response.status_code
+            )
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
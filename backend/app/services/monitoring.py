@@ -1,31 +1,130 @@
 ﻿import time
+import math
 import logging
-from collections import defaultdict, deque
+from collections import defaultdict
 from threading import Lock
-from typing import Dict, List, Deque
+from typing import Dict, List, Optional
 import os
 from datetime import datetime
 from sqlalchemy import create_engine, text
 from app.config import Config
+from app.services.metrics import mqtt_errors_total
 
 logger = logging.getLogger(__name__)
 engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
 
+# Rolling windows reported by MQTTMonitor, in seconds
+RATE_WINDOWS = {'1m': 60, '5m': 300, '1h': 3600}
+
+
+class RollingCounter:
+    """Event counter over a sliding window of per-second buckets
+
+    Memory is one slot per second of the window regardless of event volume.
+    Each slot remembers which second it holds, so stale slots are reset
+    lazily when reused and skipped when counting.
+    """
+
+    def __init__(self, window_seconds: int = 3600):
+        self.window_seconds = window_seconds
+        self._counts = [0] * window_seconds
+        self._seconds = [-1] * window_seconds
+        self.total = 0
+
+    def add(self, now: float, amount: int = 1) -> None:
+        second = int(now)
+        slot = second % self.window_seconds
+        if self._seconds[slot] != second:
+            self._seconds[slot] = second
+            self._counts[slot] = 0
+        self._counts[slot] += amount
+        self.total += amount
+
+    def count(self, now: float, seconds: Optional[int] = None) -> int:
+        """Events in the last ``seconds`` (at most the window), including the current second"""
+        seconds = min(seconds or self.window_seconds, self.window_seconds)
+        oldest = int(now) - seconds
+        return sum(count for count, second in zip(self._counts, self._seconds)
+                   if second > oldest)
+
+
+class QuantileSketch:
+    """Log-bucketed sketch giving quantiles within a relative error
+
+    A value v falls in bucket ceil(log(v) / log(gamma)); with the default 1%
+    accuracy, 1us..100s needs fewer than 1,000 buckets. Two generations are
+    kept and rotated every ``rotate_seconds``, so quantiles reflect roughly
+    the last one to two rotation periods.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, rotate_seconds: int = 300,
+                 min_value: float = 1e-6):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.rotate_seconds = rotate_seconds
+        self.min_value = min_value
+        self._current: Dict[int, int] = defaultdict(int)
+        self._previous: Dict[int, int] = {}
+        self._rotated_at = None
+
+    def _rotate(self, now: float) -> None:
+        if self._rotated_at is None:
+            self._rotated_at = now
+        elif now - self._rotated_at >= self.rotate_seconds:
+            # Drop both generations if nothing was recorded for a full period
+            stale = now - self._rotated_at >= 2 * self.rotate_seconds
+            self._previous = {} if stale else dict(self._current)
+            self._current = defaultdict(int)
+            self._rotated_at = now
+
+    def add(self, value: float, now: float) -> None:
+        self._rotate(now)
+        value = max(value, self.min_value)
+        self._current[math.ceil(math.log(value) / self._log_gamma)] += 1
+
+    def quantiles(self, now: float, qs=(0.5, 0.95, 0.99)) -> Dict[str, Optional[float]]:
+        """Return e.g. {'p50': seconds, ...} and the sample count"""
+        self._rotate(now)
+        merged = defaultdict(int, self._previous)
+        for index, count in self._current.items():
+            merged[index] += count
+        total = sum(merged.values())
+
+        result = {f"p{round(q * 100)}": None for q in qs}
+        result['count'] = total
+        if not total:
+            return result
+
+        indexes = sorted(merged)
+        for q in qs:
+            rank = q * (total - 1)
+            cumulative = 0
+            for index in indexes:
+                cumulative += merged[index]
+                if cumulative > rank:
+                    # Bucket midpoint in log space, within relative_accuracy of the true value
+                    result[f"p{round(q * 100)}"] = 2 * self.gamma ** index / (self.gamma + 1)
+                    break
+        return result
+
+
 class MQTTMonitor:
     """Monitor for MQTT connection and message statistics"""
     def __init__(self, window_size: int = 3600):  # Default 1 hour window
         self.window_size = window_size
+        self.started_at = time.time()
         self.is_connected = False
         self.last_connection_time = None
         self.last_disconnect_time = None
         self.connection_attempts = 0
         
-        # Message statistics with timestamps for rolling window
+        # Per-second ring counters, memory does not grow with message volume
         self._lock = Lock()
-        self.message_timestamps: Deque[float] = deque(maxlen=window_size)
-        self.messages_by_type: Dict[str, Deque[float]] = defaultdict(
-            lambda: deque(maxlen=window_size)
+        self.messages = RollingCounter(window_size)
+        self.messages_by_type: Dict[str, RollingCounter] = defaultdict(
+            lambda: RollingCounter(window_size)
         )
+        self.processing_time: Dict[str, QuantileSketch] = defaultdict(QuantileSketch)
         self.errors_by_type: Dict[str, int] = defaultdict(int)
         
         self.connection_status = False
@@ -58,16 +157,20 @@ class MQTTMonitor:
         self.connection_status = False
         logger.info("MQTT client disconnected")
 
-    def on_message_received(self, message_type: str = 'general') -> None:
+    def on_message_received(self, message_type: str = 'general',
+                            processing_time: Optional[float] = None) -> None:
         """Called when message is received and processed successfully
         
         Args:
             message_type: Type of message received (sensor_data, device_status, etc.)
+            processing_time: Seconds spent processing the message
         """
         current_time = time.time()
         with self._lock:
-            self.message_timestamps.append(current_time)
-            self.messages_by_type[message_type].append(current_time)
+            # The overall count is recorded by on_message for every message
+            self.messages_by_type[message_type].add(current_time)
+            if processing_time is not None:
+                self.processing_time[message_type].add(processing_time, current_time)
         
         self.message_count += 1
         logger.debug(f"Message processed successfully: {message_type}")
@@ -80,19 +183,21 @@ class MQTTMonitor:
         """
         current_time = time.time()
         with self._lock:
-            self.message_timestamps.append(current_time)
+            self.messages.add(current_time)
             if topic:
-                self.messages_by_type[topic].append(current_time)
+                self.messages_by_type[topic].add(current_time)
         
         self.message_count += 1
         logger.debug(f"Message received on topic: {topic}")
 
-    def on_error(self, error_type: str) -> None:
+    def on_error(self, error_type: str, topic: str = None) -> None:
         """Called when an error occurs
         
         Args:
             error_type: Type/category of error
+            topic: The MQTT topic the failing message came from, if any
         """
+        mqtt_errors_total.inc(topic=topic or '', type=error_type)
         with self._lock:
             self.errors_by_type[error_type] += 1
             self.error_count += 1
@@ -107,12 +212,8 @@ class MQTTMonitor:
         """Record a successful message publication"""
         with self._lock:
             current_time = time.time()
-            self.message_timestamps.append(current_time)
-            self.messages_by_type['publish'].append(current_time)
-            
-            # Save monitoring data periodically
-            if len(self.message_timestamps) % 100 == 0:
-                self._save_monitoring_data()
+            self.messages.add(current_time)
+            self.messages_by_type['publish'].add(current_time)
 
     def check_thresholds(self, sensor_type, value):
         """Check if sensor value exceeds thresholds and create alert if needed"""
@@ -144,6 +245,11 @@ class MQTTMonitor:
             except Exception as e:
                 logger.error(f"Failed to create alert: {e}")
 
+    def _rate(self, counter: RollingCounter, seconds: int, now: float) -> float:
+        # Divide by the observed span while the monitor is younger than the window
+        span = min(seconds, max(now - self.started_at, 1))
+        return counter.count(now, seconds) / span
+
     def get_stats(self) -> dict:
         """Get current monitoring statistics
         
@@ -151,33 +257,25 @@ class MQTTMonitor:
             Dictionary containing various monitoring metrics
         """
         current_time = time.time()
-        cutoff_time = current_time - self.window_size
         
         with self._lock:
-            # Clean old timestamps
-            while (self.message_timestamps and
-                   self.message_timestamps[0] < cutoff_time):
-                self.message_timestamps.popleft()
-            
-            for topic_timestamps in self.messages_by_type.values():
-                while (topic_timestamps and
-                       topic_timestamps[0] < cutoff_time):
-                    topic_timestamps.popleft()
-            
-            # Calculate message rates
-            total_messages = len(self.message_timestamps)
-            messages_by_topic = {
-                topic: len(timestamps)
-                for topic, timestamps in self.messages_by_type.items()
+            rates = {
+                name: round(self._rate(self.messages, seconds, current_time), 3)
+                for name, seconds in RATE_WINDOWS.items()
+                if seconds <= self.window_size
+            }
+            rates_by_topic = {
+                topic: {
+                    name: round(self._rate(counter, seconds, current_time), 3)
+                    for name, seconds in RATE_WINDOWS.items()
+                    if seconds <= self.window_size
+                }
+                for topic, counter in self.messages_by_type.items()
+            }
+            processing_time = {
+                topic: sketch.quantiles(current_time)
+                for topic, sketch in self.processing_time.items()
             }
-            
-            # Calculate message rate (messages per second)
-            if total_messages >= 2:
-                time_span = (self.message_timestamps[-1] -
-                             self.message_timestamps[0])
-                msg_rate = total_messages / time_span if time_span > 0 else 0
-            else:
-                msg_rate = 0
             
             return {
                 "connection": {
@@ -190,10 +288,17 @@ class MQTTMonitor:
                                else 0)
                 },
                 "messages": {
-                    "total": total_messages,
-                    "rate": msg_rate,
-                    "by_topic": messages_by_topic
+                    "total": self.messages.count(current_time),
+                    "rate": rates.get('1m', 0),
+                    "rates": rates,
+                    "by_topic": {
+                        topic: counter.count(current_time)
+                        for topic, counter in self.messages_by_type.items()
+                    },
+                    "rates_by_topic": rates_by_topic,
+                    "all_time": self.messages.total
                 },
+                "processing_time": processing_time,
                 "errors": dict(self.errors_by_type),
                 "window_size": self.window_size
             }
@@ -209,22 +314,23 @@ class MQTTMonitor:
                     if self.is_connected and self.last_connection_time
                     else 0)
 
-    def get_message_rate(self) -> float:
+    def get_message_count(self) -> int:
+        """Get the number of messages within the monitoring window"""
+        with self._lock:
+            return self.messages.count(time.time())
+
+    def get_message_rate(self, seconds: int = 60) -> float:
         """Get the rate of incoming messages (messages per second)"""
+        current_time = time.time()
         with self._lock:
-            total_messages = len(self.message_timestamps)
-            if total_messages < 2:
-                return 0
-            
-            time_span = (self.message_timestamps[-1] -
-                         self.message_timestamps[0])
-            return total_messages / time_span if time_span > 0 else 0
+            return self._rate(self.messages, seconds, current_time)
 
     def get_topic_stats(self) -> Dict[str, int]:
         """Get the count of messages received, grouped by topic"""
+        current_time = time.time()
         with self._lock:
-            return {topic: len(timestamps)
-                    for topic, timestamps in self.messages_by_type.items()}
+            return {topic: counter.count(current_time)
+                    for topic, counter in self.messages_by_type.items()}
 
     def get_status(self):
         """Get current monitoring status"""
@@ -293,7 +399,7 @@ def get_mqtt_stats():
             "uptime": mqtt_monitor.get_uptime()
         },
         "messages": {
-            "total": len(mqtt_monitor.message_timestamps),
+            "total": mqtt_monitor.get_message_count(),
             "rate": mqtt_monitor.get_message_rate(),
             "by_topic": mqtt_monitor.get_topic_stats()
         }
@@ -301,16 +407,12 @@ def get_mqtt_stats():
 
 def get_storage_stats():
     """Get storage usage statistics for images and database"""
-    total_size = 0
-    total_files = 0
+    from app.services.storage_accounting import get_storage_totals
     
-    # Calculate image storage
-    for root, _, files in os.walk("data/images"):
-        for file in files:
-            if file.lower().endswith((".png", ".jpg", ".jpeg")):
-                file_path = os.path.join(root, file)
-                total_size += os.path.getsize(file_path)
-                total_files += 1
+    # Image storage from the incremental counters (see storage_accounting)
+    totals = get_storage_totals()
+    total_size = totals['total_bytes']
+    total_files = totals['total_files']
     
     # Get database size
     db_path = "app/greenhouse.db"
@@ -319,6 +421,7 @@ def get_storage_stats():
     return {
         "images": {
             "total_files": total_files,
+            "total_images": totals['total_images'],
             "total_size_mb": round(total_size / (1024 * 1024), 2)
         },
         "database": {
@@ -1,13 +1,18 @@
 import json
+import time
 import logging
 import threading
+import msgspec
 import paho.mqtt.client as mqtt
 from datetime import datetime
 from typing import Dict, Any, Optional
 from app.config import Config
+from app.models.messages import decode_sensor_batch, decode_device_batch
 from app.services.timescale import save_sensor_data
+from app.services.message_dedup import MessageDeduplicator
 from app.utils import SensorError
 from app.services.monitoring import mqtt_monitor
+from app.services.metrics import mqtt_messages_total
 
 logger = logging.getLogger(__name__)
 
@@ -16,15 +21,38 @@ mqtt_client = None
 _initialized = False
 _init_lock = threading.Lock()
 
+# Topics consumed by ingest
+INGEST_TOPICS = [
+    "greenhouse/sensors/",  # For sensor data
+    "greenhouse/devices/"   # For device status data (batch updates)
+]
+
 class MQTTClient:
-    def __init__(self):
-        self.client = mqtt.Client()
+    def __init__(self, subscribe: bool = True, share_group: Optional[str] = None,
+                 client_id: str = "", protocol: int = mqtt.MQTTv311):
+        """
+        Args:
+            subscribe: Subscribe to the ingest topics. Publish-only clients
+                (Flask workers) leave this off so only ingest workers write
+                readings to the database
+            share_group: Subscribe through ``$share/<group>/`` so the broker
+                spreads messages across every worker in the group
+            client_id: MQTT client id, must be unique per worker
+            protocol: MQTT protocol version
+        """
+        self.subscribe = subscribe
+        self.share_group = share_group
+        self.client = mqtt.Client(client_id=client_id, protocol=protocol)
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
         self.client.on_disconnect = self._on_disconnect
         self.connected = False
         self.last_values = {}  # Cache for sensor values
-        self.processed_messages = set()  # Track processed messages to avoid duplicates
+        # Skip readings already processed (QoS 1 redelivery, republished batches)
+        self.deduplicator = MessageDeduplicator(
+            window_seconds=Config.MQTT_DEDUP_WINDOW,
+            max_entries=Config.MQTT_DEDUP_MAX_ENTRIES
+        )
         self._setup_client()
 
     def _setup_client(self):
@@ -45,18 +73,21 @@ class MQTTClient:
             # Don't raise exception, just log the error
             logger.warning("MQTT client will not be available")
 
-    def _on_connect(self, client, userdata, flags, rc):
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
         """Callback when connected to MQTT broker"""
         if rc == 0:
             self.connected = True
             logger.info("Connected to MQTT broker successfully")
-            mqtt_monitor.on_connect()            # Subscribe to unified sensor and device topics
-            topics = [
-                "greenhouse/sensors/",  # For sensor data
-                "greenhouse/devices/"   # For device status data (batch updates)
-            ]
-            for topic in topics:
-                self.client.subscribe(topic, qos=0)
+            mqtt_monitor.on_connect()
+            if not self.subscribe:
+                logger.info("Publish-only MQTT client, not subscribing to ingest topics")
+                return
+
+            # Subscribe to unified sensor and device topics
+            for topic in INGEST_TOPICS:
+                if self.share_group:
+                    topic = f"$share/{self.share_group}/{topic}"
+                self.client.subscribe(topic, qos=Config.MQTT_INGEST_QOS)
                 logger.debug(f"Subscribed to topic: {topic}")
         else:
             logger.error(f"Failed to connect to MQTT broker with code: {rc}")
@@ -65,149 +96,110 @@ class MQTTClient:
     def _on_message(self, client, userdata, message):
         """Handle incoming MQTT messages"""
         try:
-            payload = json.loads(message.payload.decode())
             topic = message.topic
-            
-            # Create message ID for deduplication
-            message_id = f"{topic}_{message.payload.decode()[:50]}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            
-            # Skip if already processed
-            if message_id in self.processed_messages:
-                logger.debug(f"Skipping duplicate message: {message_id}")
-                return
-                
-            self.processed_messages.add(message_id)
-            
-            # Keep only recent messages in memory (last 100)
-            if len(self.processed_messages) > 100:
-                oldest_messages = list(self.processed_messages)[:50]
-                for old_msg in oldest_messages:
-                    self.processed_messages.remove(old_msg)
-            
-            logger.debug(f"Received message on topic {topic}: {payload}")            # Process based on topic
+            mqtt_messages_total.inc(topic=topic)
+            logger.debug("Received message on topic %s: %r", topic, message.payload)
+            started = time.perf_counter()
+            # Process based on topic
             if topic == "greenhouse/sensors/":
-                success = self._process_sensors_data(payload)
+                success = self._process_sensors_data(message.payload)
                 if success:
-                    mqtt_monitor.on_message_received('sensors')
+                    mqtt_monitor.on_message_received('sensors', time.perf_counter() - started)
                 else:
                     logger.error(f"Failed to process sensor data")
                     
             elif topic == "greenhouse/devices/":
-                success = self._process_devices_data(payload)
+                success = self._process_devices_data(message.payload)
                 if success:
-                    mqtt_monitor.on_message_received('devices')
+                    mqtt_monitor.on_message_received('devices', time.perf_counter() - started)
                 else:
                     logger.error(f"Failed to process device data")
             
             mqtt_monitor.on_message()
             
-        except json.JSONDecodeError as e:
+        except msgspec.DecodeError as e:
             logger.error(f"Failed to decode message payload: {e}")
-            mqtt_monitor.on_error('message_decode_failed')
+            mqtt_monitor.on_error('message_decode_failed', message.topic)
         except Exception as e:
             logger.error(f"Error processing message: {e}")
-            mqtt_monitor.on_error('message_processing_failed')
+            mqtt_monitor.on_error('message_processing_failed', message.topic)
 
-    def _process_sensors_data(self, payload: dict):
+    def _process_sensors_data(self, payload: bytes):
         """Process batch sensor data from greenhouse/sensors/"""
         try:
-            if 'sensors' not in payload:
-                logger.error("No 'sensors' field in payload")
-                return False
-                
-            sensors = payload['sensors']
-            for sensor in sensors:
-                # Validate required fields
-                if not all(field in sensor for field in ['type', 'device_id', 'value', 'time']):
-                    logger.error(f"Missing required fields in sensor data: {sensor}")
+            readings, errors = decode_sensor_batch(payload)
+        except msgspec.ValidationError as e:
+            logger.error(f"Invalid sensor batch: {e}")
+            return False
+
+        for error in errors:
+            logger.error(f"Invalid sensor data at index {error['index']}: {error['error']}")
+            mqtt_monitor.on_error('invalid_sensor_data', 'greenhouse/sensors/')
+
+        reading = None
+        try:
+            for reading in readings:
+                if self.deduplicator.seen('sensors', reading.device_id, reading.type, reading.time):
+                    logger.debug("Skipping duplicate sensor reading: %s/%s at %s", reading.device_id, reading.type, reading.time)
                     continue
                 
-                # Format sensor data for database
-                formatted_data = {
-                    'device_id': sensor['device_id'],
-                    'sensor_type': sensor['type'].lower(),
-                    'value': float(sensor['value']),
-                    'timestamp': sensor['time']
-                }
-                
                 # Save to database
-                save_sensor_data(formatted_data)
-                self.last_values[sensor['type']] = sensor['value']
-                logger.debug(f"Processed sensor {sensor['type']}: {sensor['value']}")
+                save_sensor_data(reading.to_record())
+                self.last_values[reading.type] = reading.value
+                logger.debug("Processed sensor %s: %s", reading.type, reading.value)
             return True
         except Exception as e:
             logger.error(f"Error processing sensors data: {e}")
+            # Not saved: a redelivery of this reading must not be skipped as a duplicate
+            self.deduplicator.forget('sensors', reading.device_id, reading.type, reading.time)
             return False
             
-    def _process_devices_data(self, payload: dict):
+    def _process_devices_data(self, payload: bytes):
         """Process batch device status updates from greenhouse/devices/"""
         try:
-            if 'devices' not in payload:
-                logger.error("No 'devices' field in payload")
-                return False
-                
-            devices = payload['devices']
-            if not isinstance(devices, list):
-                logger.error("'devices' field is not a list")
-                return False
-
-            success = True
-            for device_data in devices:
-                try:
-                    # Validate required fields
-                    required_fields = ['type', 'device_id', 'status', 'time']
-                    if not all(field in device_data for field in required_fields):
-                        logger.error(f"Missing required fields in device data: {device_data}")
-                        success = False
-                        continue                    # Validate device type
-                    device_type = device_data['type'].lower()
-                    if device_type not in ['pump', 'fan', 'cover']:
-                        logger.error(f"Invalid device type: {device_type}")
-                        success = False
-                        continue
-                    
-                    # Validate status based on device type
-                    status = device_data['status']
-                    if device_type in ['pump', 'fan']:
-                        if isinstance(status, str):
-                            status = status.lower() == 'true'
-                        elif not isinstance(status, bool):
-                            logger.error(f"Invalid status for {device_type}: {status}")
-                            success = False
-                            continue
-                    elif device_type == 'cover':
-                        if isinstance(status, str):
-                            status = status.upper()
-                            if status not in ['OPEN', 'HALF', 'CLOSED']:
-                                logger.error(f"Invalid cover position: {status}")
-                                success = False
-                                continue
-                        else:
-                            logger.error(f"Invalid cover status type: {type(status)}")
-                            success = False
-                            continue
-
-                    # Process device update
-                    device = {
-                        'device_id': device_data['device_id'],
-                        'type': device_type,
-                        'status': status,
-                        'time': device_data['time']
-                    }
-                    
-                    # Update device status in device_states table only
-                    self._update_device_state(device)
-                    
-                    logger.info(f"Updated device state: {device['device_id']} ({device['type']}) = {device['status']}")
-                except Exception as e:
-                    logger.error(f"Error processing device {device_data.get('device_id', 'unknown')}: {e}")
-                    success = False
-                    
-            return success
-        except Exception as e:
-            logger.error(f"Error processing devices data: {e}")
+            devices, errors = decode_device_batch(payload)
+        except msgspec.ValidationError as e:
+            logger.error(f"Invalid device batch: {e}")
             return False
 
+        success = not errors
+        for error in errors:
+            logger.error(f"Invalid device data at index {error['index']}: {error['error']}")
+            mqtt_monitor.on_error('invalid_device_data', 'greenhouse/devices/')
+
+        reports = []
+        for device_status in devices:
+            if self.deduplicator.seen('devices', device_status.device_id, device_status.type, device_status.time):
+                logger.debug("Skipping duplicate device status: %s at %s", device_status.device_id, device_status.time)
+                continue
+            
+            try:
+                device = device_status.to_record()
+
+                # Update device status in device_states table only
+                saved = self._update_device_state(device)
+                if saved:
+                    reports.append(device)
+                    logger.info("Updated device state: %s (%s) = %s", device['device_id'], device['type'], device['status'])
+            except Exception as e:
+                logger.error(f"Error processing device {device_status.device_id}: {e}")
+                saved = False
+
+            if not saved:
+                # Not saved: a redelivery of this status must not be skipped as a duplicate
+                self.deduplicator.forget('devices', device_status.device_id, device_status.type, device_status.time)
+                success = False
+
+        # Reports confirm the device commands that asked for this state
+        if reports:
+            try:
+                from app.services.device_commands import acknowledge_reports
+                acknowledge_reports(reports)
+            except Exception as e:
+                logger.error(f"Error acknowledging device commands: {e}")
+                
+        return success
+
     def _convert_device_status(self, status):
         """Convert device status to numeric value"""
         if isinstance(status, bool):
@@ -256,9 +248,11 @@ class MQTTClient:
                     'name': self._get_device_name(device_type, device['device_id']),
                     'status': status_str
                 })
+            return True
                 
         except Exception as e:
             logger.error(f"Error updating device state: {e}")
+            return False
 
     def _get_device_name(self, device_type, device_id):
         """Get Vietnamese device name"""
@@ -364,7 +358,7 @@ class MQTTClient:
             mqtt_monitor.on_error('publish_failed')
             return False
 
-    def _on_disconnect(self, client, userdata, rc):
+    def _on_disconnect(self, client, userdata, rc, properties=None):
         """Callback when disconnected from MQTT broker"""
         self.connected = False
         if rc != 0:
@@ -389,7 +383,9 @@ def setup_mqtt_client():
             return mqtt_client
             
         if mqtt_client is None:
-            mqtt_client = MQTTClient()
+            # Flask workers only publish unless app ingest is explicitly enabled,
+            # readings are consumed by ingest_worker.py
+            mqtt_client = MQTTClient(subscribe=Config.MQTT_APP_INGEST)
             _initialized = True
             logger.info("MQTT client created and initialized")
         
@@ -0,0 +1,316 @@
+"""
+Opt-in per-request profiling
+
+A request is profiled when it carries ``X-Profile: <PROFILING_TOKEN>`` or
+matches a rule armed through POST /api/monitoring/profiling. For a profiled
+request a sampling thread records the stack of the handling thread and a
+speedscope file (https://www.speedscope.app) is written to PROFILING_DIR,
+together with a JSON summary of the SQL statements it ran. The response gets
+a ``Server-Timing`` header splitting time into db, cache, inference,
+serialization and the remaining app time.
+
+Nothing is registered unless PROFILING_ENABLED and PROFILING_TOKEN are both
+set, and unprofiled requests only pay for a thread-local lookup.
+"""
+
+import os
+import re
+import sys
+import json
+import hmac
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+# Server-Timing categories in header order
+TIMING_CATEGORIES = ('db', 'cache', 'inference', 'serialization')
+
+
+class StackSampler:
+    """Statistical profiler sampling one thread's stack at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames: List[Dict] = []
+        self._frame_index: Dict[tuple, int] = {}
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.started = None
+        self.stopped = None
+
+    def _frame_id(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return index
+
+    def _sample(self) -> Optional[List[int]]:
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return None
+        stack = []
+        while frame is not None:
+            stack.append(self._frame_id(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()  # speedscope expects root first
+        return stack
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            stack = self._sample()
+            if stack:
+                self.samples.append(stack)
+                self.weights.append(now - last)
+            last = now
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="RequestProfiler")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+        self.stopped = time.perf_counter()
+
+    def to_speedscope(self, name: str) -> Dict:
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'greenhouse-backend',
+            'activeProfileIndex': 0,
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': (self.stopped or time.perf_counter()) - self.started,
+                'samples': self.samples,
+                'weights': self.weights
+            }]
+        }
+
+
+class RequestProfile:
+    """Timings collected for one profiled request"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {category: 0.0 for category in TIMING_CATEGORIES}
+        self.statements: List[Dict] = []
+        self.sampler = StackSampler(threading.get_ident(), Config.PROFILING_INTERVAL_MS / 1000)
+
+    def add(self, category: str, seconds: float) -> None:
+        self.timings[category] = self.timings.get(category, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        parts = []
+        for category in TIMING_CATEGORIES:
+            desc = f';desc="{len(self.statements)} queries"' if category == 'db' else ''
+            parts.append(f"{category};dur={self.timings[category] * 1000:.2f}{desc}")
+        accounted = sum(self.timings.values())
+        parts.append(f"app;dur={max(total - accounted, 0) * 1000:.2f}")
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ', '.join(parts)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    """Profile of the request handled by this thread, if it is being profiled"""
+    return getattr(_local, 'profile', None)
+
+
+@contextmanager
+def profile_section(category: str):
+    """Attribute the time spent in a block to a Server-Timing category"""
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(category, time.perf_counter() - start)
+
+
+def _record_statement(statement, parameters, seconds, call_site):
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return
+    profile.add('db', seconds)
+    profile.statements.append({
+        'statement': ' '.join(statement.split())[:2000],
+        'duration_ms': round(seconds * 1000, 3),
+        'call_site': call_site
+    })
+
+
+class ProfilingManager:
+    """Arming rules, recent profiles and output files"""
+
+    def __init__(self, output_dir: str, max_files: int = 50):
+        self.output_dir = output_dir
+        self.max_files = max_files
+        self.recent = deque(maxlen=max_files)
+        self._armed: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def arm(self, path_prefix: str = '/', count: int = 1) -> Dict:
+        """Profile the next ``count`` requests whose path starts with ``path_prefix``"""
+        rule = {'path_prefix': path_prefix, 'remaining': count}
+        with self._lock:
+            self._armed.append(rule)
+        return dict(rule)
+
+    def disarm(self) -> None:
+        with self._lock:
+            self._armed.clear()
+
+    def armed(self) -> List[Dict]:
+        with self._lock:
+            return [dict(rule) for rule in self._armed]
+
+    def should_profile(self, path: str, header: Optional[str]) -> bool:
+        if path.startswith('/api/monitoring/profiling'):
+            return False
+        if header and Config.PROFILING_TOKEN and hmac.compare_digest(header.encode(), Config.PROFILING_TOKEN.encode()):
+            return True
+        if not self._armed:
+            return False
+        with self._lock:
+            for rule in self._armed:
+                if path.startswith(rule['path_prefix']):
+                    rule['remaining'] -= 1
+                    if rule['remaining'] <= 0:
+                        self._armed.remove(rule)
+                    return True
+        return False
+
+    def save(self, profile: RequestProfile, status: int, total: float) -> Dict:
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', profile.path).strip('_') or 'root'
+        name = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{profile.method}_{slug}"
+        title = f"{profile.method} {profile.path}"
+
+        with open(os.path.join(self.output_dir, f"{name}.speedscope.json"), 'w') as f:
+            json.dump(profile.sampler.to_speedscope(title), f)
+
+        summary = {
+            'name': name,
+            'method': profile.method,
+            'path': profile.path,
+            'status': status,
+            'timestamp': datetime.now().isoformat(),
+            'total_ms': round(total * 1000, 2),
+            'timings_ms': {k: round(v * 1000, 2) for k, v in profile.timings.items()},
+            'samples': len(profile.sampler.samples),
+            'statements': profile.statements
+        }
+        with open(os.path.join(self.output_dir, f"{name}.json"), 'w') as f:
+            json.dump(summary, f, indent=2)
+
+        with self._lock:
+            if len(self.recent) == self.recent.maxlen:
+                self._remove_files(self.recent[0]['name'])
+            self.recent.append({k: v for k, v in summary.items() if k != 'statements'})
+        return summary
+
+    def _remove_files(self, name: str) -> None:
+        for suffix in ('.speedscope.json', '.json'):
+            try:
+                os.remove(os.path.join(self.output_dir, name + suffix))
+            except OSError:
+                pass
+
+    def list_profiles(self) -> List[Dict]:
+        with self._lock:
+            return list(reversed(self.recent))
+
+
+# Singleton instance
+_profiling_manager = None
+
+def get_profiling_manager() -> Optional[ProfilingManager]:
+    """Get the profiling manager, or None if profiling is disabled or has no token"""
+    global _profiling_manager
+    if not Config.PROFILING_ENABLED or not Config.PROFILING_TOKEN:
+        return None
+    if _profiling_manager is None:
+        _profiling_manager = ProfilingManager(Config.PROFILING_DIR, Config.PROFILING_MAX_FILES)
+    return _profiling_manager
+
+
+def init_profiling(app):
+    """Register profiling hooks when PROFILING_ENABLED is set"""
+    manager = get_profiling_manager()
+    if manager is None:
+        if Config.PROFILING_ENABLED:
+            logger.warning("Profiling not enabled: PROFILING_TOKEN must be set to protect the profiling endpoints")
+        return
+
+    from flask import request
+    from flask.json.provider import DefaultJSONProvider
+    from app.services.metrics import instrument_sqlalchemy, add_query_observer
+
+    instrument_sqlalchemy()
+    add_query_observer(_record_statement)
+
+    class ProfilingJSONProvider(DefaultJSONProvider):
+        def response(self, *args, **kwargs):
+            with profile_section('serialization'):
+                return super().response(*args, **kwargs)
+
+    app.json = ProfilingJSONProvider(app)
+
+    @app.before_request
+    def _start_profile():
+        if manager.should_profile(request.path, request.headers.get('X-Profile')):
+            profile = RequestProfile(request.method, request.path)
+            _local.profile = profile
+            profile.sampler.start()
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = getattr(_local, 'profile', None)
+        if profile is None:
+            return response
+        _local.profile = None
+        profile.sampler.stop()
+        total = time.perf_counter() - profile.started
+        response.headers['Server-Timing'] = profile.server_timing(total)
+        try:
+            summary = manager.save(profile, response.status_code, total)
+            response.headers['X-Profile-Id'] = summary['name']
+        except Exception as e:
+            logger.error(f"Failed to save request profile: {e}")
+        return response
+
+    @app.teardown_request
+    def _discard_profile(exc):
+        # after_request is skipped for unhandled exceptions
+        profile = getattr(_local, 'profile', None)
+        if profile is not None:
+            _local.profile = None
+            profile.sampler.stop()
+
+    logger.info(f"Request profiling enabled, profiles are written to {manager.output_dir}")
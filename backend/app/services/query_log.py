@@ -0,0 +1,228 @@
+"""
+Slow-query log for raw SQL call sites
+
+Every statement timed by the metrics cursor listeners is aggregated per
+(call site, statement) into a bounded table. Statements slower than
+SLOW_QUERY_MS are logged, and SELECTs slower than SLOW_QUERY_EXPLAIN_MS get an
+``EXPLAIN (ANALYZE, BUFFERS)`` captured by a background thread, off the
+request path. The table is served by GET /api/monitoring/queries.
+"""
+
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Only statements that cannot change data are re-run under EXPLAIN ANALYZE
+_EXPLAINABLE_PREFIXES = ('select', 'with')
+
+
+class SlowQueryLog:
+    """Bounded per-statement timing table with automatic EXPLAIN capture"""
+
+    def __init__(self, slow_ms: float = 200, explain_ms: float = 500, max_entries: int = 500,
+                 explain_enabled: bool = True, explain_interval: int = 600):
+        """
+        Args:
+            slow_ms: Statements slower than this are logged as slow
+            explain_ms: SELECTs slower than this get an EXPLAIN captured
+            max_entries: Maximum number of distinct statements tracked
+            explain_enabled: Run EXPLAIN (ANALYZE, BUFFERS) for slow SELECTs
+            explain_interval: Minimum seconds between EXPLAINs of one statement
+        """
+        self.slow_ms = slow_ms
+        self.explain_ms = explain_ms
+        self.max_entries = max_entries
+        self.explain_enabled = explain_enabled
+        self.explain_interval = explain_interval
+
+        self._entries: Dict[tuple, Dict] = {}
+        self._lock = threading.Lock()
+        self._explain_queue = queue.Queue(maxsize=20)
+        self._explain_thread = None
+        self._explain_engine = None
+        self.explain_idle_timeout = 60  # seconds before the idle EXPLAIN thread exits
+        self.evicted_total = 0
+
+    def observe(self, statement: str, parameters, seconds: float, call_site: str) -> None:
+        """Query observer registered with ``app.services.metrics``"""
+        if statement.lstrip()[:7].lower() == 'explain':
+            return
+
+        duration_ms = seconds * 1000
+        key = (call_site, statement)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    self._evict()
+                entry = self._entries[key] = {
+                    'call_site': call_site,
+                    'statement': ' '.join(statement.split()),
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'slow_count': 0,
+                    'last_seen': None,
+                    'explain': None,
+                    'explained_at': None,
+                    '_explain_pending': False
+                }
+
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            entry['last_seen'] = time.time()
+
+            if duration_ms < self.slow_ms:
+                return
+            entry['slow_count'] += 1
+            needs_explain = self._needs_explain(entry, duration_ms)
+            if needs_explain:
+                entry['_explain_pending'] = True
+
+        logger.warning("Slow query (%.1f ms) at %s: %.200s", duration_ms, call_site, entry['statement'])
+        if needs_explain:
+            self._schedule_explain(key, statement, parameters)
+
+    def _evict(self) -> None:
+        # Drop the statement least likely to matter: the fastest worst case
+        victim = min(self._entries, key=lambda k: self._entries[k]['max_ms'])
+        del self._entries[victim]
+        self.evicted_total += 1
+
+    def _needs_explain(self, entry: Dict, duration_ms: float) -> bool:
+        if not self.explain_enabled or duration_ms < self.explain_ms or entry['_explain_pending']:
+            return False
+        if not entry['statement'].lower().startswith(_EXPLAINABLE_PREFIXES):
+            return False
+        return entry['explained_at'] is None or time.time() - entry['explained_at'] >= self.explain_interval
+
+    def _schedule_explain(self, key: tuple, statement: str, parameters) -> None:
+        if isinstance(parameters, dict):
+            parameters = dict(parameters)
+        elif isinstance(parameters, (list, tuple)):
+            parameters = tuple(parameters)
+        try:
+            self._explain_queue.put_nowait((key, statement, parameters))
+        except queue.Full:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry:
+                    entry['_explain_pending'] = False
+            return
+        self._start_explain_thread()
+
+    def _start_explain_thread(self) -> None:
+        if self._explain_thread and self._explain_thread.is_alive():
+            return
+        self._explain_thread = threading.Thread(
+            target=self._explain_loop,
+            daemon=True,
+            name="SlowQueryExplain"
+        )
+        self._explain_thread.start()
+
+    def _get_explain_engine(self):
+        if self._explain_engine is None:
+            from sqlalchemy import create_engine
+            self._explain_engine = create_engine(
+                Config.SQLALCHEMY_DATABASE_URI, pool_size=1, max_overflow=0
+            )
+        return self._explain_engine
+
+    def _run_explain(self, statement: str, parameters) -> str:
+        engine = self._get_explain_engine()
+        if engine.dialect.name != 'postgresql':
+            return f"EXPLAIN ANALYZE not supported on {engine.dialect.name}"
+
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            # The statement is re-run, keep it from holding the database for long
+            cursor.execute(f"SET LOCAL statement_timeout = {int(Config.SLOW_QUERY_EXPLAIN_TIMEOUT_MS)}")
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters or None)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+            cursor.close()
+            return plan
+        finally:
+            connection.rollback()
+            connection.close()
+
+    def _explain_loop(self) -> None:
+        while True:
+            try:
+                key, statement, parameters = self._explain_queue.get(timeout=self.explain_idle_timeout)
+            except queue.Empty:
+                return
+
+            try:
+                plan = self._run_explain(statement, parameters)
+            except Exception as e:
+                plan = f"EXPLAIN failed: {e}"
+                logger.error(f"Failed to capture EXPLAIN for slow query: {e}")
+
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry['explain'] = plan
+                    entry['explained_at'] = time.time()
+                    entry['_explain_pending'] = False
+
+    def top(self, limit: int = 20, order_by: str = 'max_ms') -> List[Dict]:
+        """Slowest statements, ordered by max_ms, total_ms, mean_ms or count"""
+        with self._lock:
+            rows = []
+            for entry in self._entries.values():
+                row = {k: v for k, v in entry.items() if not k.startswith('_')}
+                row['mean_ms'] = row['total_ms'] / row['count'] if row['count'] else 0
+                rows.append(row)
+
+        rows.sort(key=lambda row: row.get(order_by, 0), reverse=True)
+        for row in rows:
+            for field in ('total_ms', 'max_ms', 'mean_ms'):
+                row[field] = round(row[field], 3)
+            for field in ('last_seen', 'explained_at'):
+                if row[field]:
+                    row[field] = datetime.fromtimestamp(row[field]).isoformat()
+        return rows[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_settings(self) -> Dict:
+        return {
+            'slow_ms': self.slow_ms,
+            'explain_ms': self.explain_ms,
+            'explain_enabled': self.explain_enabled,
+            'max_entries': self.max_entries,
+            'tracked': len(self._entries),
+            'evicted_total': self.evicted_total
+        }
+
+
+# Singleton instance
+_slow_query_log = None
+_query_log_lock = threading.Lock()
+
+def get_slow_query_log() -> SlowQueryLog:
+    """Get the slow-query log, registering it with the SQL timing listeners"""
+    global _slow_query_log
+    with _query_log_lock:
+        if _slow_query_log is None:
+            from app.services.metrics import instrument_sqlalchemy, add_query_observer
+            _slow_query_log = SlowQueryLog(
+                slow_ms=Config.SLOW_QUERY_MS,
+                explain_ms=Config.SLOW_QUERY_EXPLAIN_MS,
+                max_entries=Config.SLOW_QUERY_MAX_ENTRIES,
+                explain_enabled=Config.SLOW_QUERY_EXPLAIN_ENABLED
+            )
+            instrument_sqlalchemy()
+            add_query_observer(_slow_query_log.observe)
+        return _slow_query_log
@@ -0,0 +1,452 @@
+"""
+Image retention and tiered archival
+
+Policy (days are counted from the row timestamp, 0 disables a tier):
+- RETENTION_FULL_RES_DAYS: after this the full-resolution original of a
+  detection or stored image is replaced by a recompressed JPEG
+  (RETENTION_ARCHIVE_MAX_SIDE / RETENTION_ARCHIVE_QUALITY). Predicted
+  images are kept as they are.
+- RETENTION_HEALTHY_DAYS: detections without disease are deleted.
+- RETENTION_DETECTION_DAYS: every detection is deleted.
+- RETENTION_IMAGE_DAYS: image_metadata rows are deleted.
+
+The job works oldest-first in batches of RETENTION_BATCH_SIZE rows, one
+transaction per batch, and stops after RETENTION_MAX_BATCHES so a backlog
+is worked off over several runs. Blob references and storage counters are
+updated in the same transaction; files are unlinked after the commit and
+blob files themselves are freed by collect_garbage().
+"""
+
+import io
+import os
+import time
+import logging
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from PIL import Image
+from app.config import Config
+from app.utils import acquire_process_lock, ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionPolicy:
+    """Retention settings, read from Config by default"""
+
+    def __init__(self, full_res_days: int = 30, healthy_days: int = 90, detection_days: int = 0,
+                 image_days: int = 180, derivative_days: int = 30, archive_max_side: int = 800,
+                 archive_quality: int = 70, batch_size: int = 200, max_batches: int = 50):
+        self.full_res_days = full_res_days
+        self.healthy_days = healthy_days
+        self.detection_days = detection_days
+        self.image_days = image_days
+        self.derivative_days = derivative_days
+        self.archive_max_side = archive_max_side
+        self.archive_quality = archive_quality
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+
+    @classmethod
+    def from_config(cls) -> 'RetentionPolicy':
+        return cls(
+            full_res_days=Config.RETENTION_FULL_RES_DAYS,
+            healthy_days=Config.RETENTION_HEALTHY_DAYS,
+            detection_days=Config.RETENTION_DETECTION_DAYS,
+            image_days=Config.RETENTION_IMAGE_DAYS,
+            derivative_days=Config.RETENTION_DERIVATIVE_DAYS,
+            archive_max_side=Config.RETENTION_ARCHIVE_MAX_SIDE,
+            archive_quality=Config.RETENTION_ARCHIVE_QUALITY,
+            batch_size=Config.RETENTION_BATCH_SIZE,
+            max_batches=Config.RETENTION_MAX_BATCHES
+        )
+
+    @staticmethod
+    def cutoff(days: int, now: datetime) -> Optional[datetime]:
+        return now - timedelta(days=days) if days and days > 0 else None
+
+    def to_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+def recompress(source_path: str, max_side: int, quality: int) -> Optional[bytes]:
+    """Downscaled JPEG bytes, or None when that would not save space"""
+    with Image.open(source_path) as image:
+        image.draft('RGB', (max_side, max_side))
+        image = image.convert('RGB')
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=quality, optimize=True)
+    data = buffer.getvalue()
+    return data if len(data) < os.path.getsize(source_path) else None
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _unlink(paths) -> int:
+    removed = 0
+    for path in paths:
+        if path:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove {path}: {e}")
+    return removed
+
+
+def _run_batches(policy: RetentionPolicy, process_batch: Callable[[], Tuple[int, List[str]]]) -> int:
+    """Commit process_batch() results one batch at a time
+
+    process_batch returns (rows processed, files to remove); the files are
+    only unlinked once their batch is committed. Stops on a short batch or
+    after max_batches.
+    """
+    from app import db
+    total = 0
+    for _ in range(policy.max_batches):
+        try:
+            processed, paths = process_batch()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        _unlink(paths)
+        total += processed
+        if processed < policy.batch_size:
+            break
+    return total
+
+
+def delete_detections(policy: RetentionPolicy, now: datetime) -> int:
+    """Delete expired detection_history rows (healthy ones first expire)"""
+    from app import db
+    from app.models.detection_history import DetectionHistory
+    from app.services.blob_store import release_ref
+
+    healthy_cutoff = policy.cutoff(policy.healthy_days, now)
+    all_cutoff = policy.cutoff(policy.detection_days, now)
+    conditions = []
+    if healthy_cutoff:
+        conditions.append(db.and_(DetectionHistory.timestamp < healthy_cutoff,
+                                  DetectionHistory.disease_detected.isnot(True)))
+    if all_cutoff:
+        conditions.append(DetectionHistory.timestamp < all_cutoff)
+    if not conditions:
+        return 0
+
+    def process_batch():
+        ids = [row.id for row in db.session.query(DetectionHistory.id).filter(db.or_(*conditions))
+               .order_by(DetectionHistory.timestamp).limit(policy.batch_size)
+               .with_for_update(skip_locked=True)]
+        if not ids:
+            return 0, []
+
+        # Only rows this transaction actually deleted give up their blob refs,
+        # so an overlapping pass cannot release the same reference twice
+        rows = db.session.execute(
+            db.delete(DetectionHistory).where(DetectionHistory.id.in_(ids)).returning(
+                DetectionHistory.original_blob, DetectionHistory.predicted_blob,
+                DetectionHistory.original_image_path, DetectionHistory.predicted_image_path
+            ).execution_options(synchronize_session=False)
+        ).all()
+        refs = Counter(digest for row in rows for digest in (row.original_blob, row.predicted_blob) if digest)
+        for digest, count in refs.items():
+            release_ref(digest, count)
+        # A full batch keeps _run_batches going even if a concurrent pass took some rows
+        return len(ids), [path for row in rows for path in (row.original_image_path, row.predicted_image_path)]
+
+    return _run_batches(policy, process_batch)
+
+
+def delete_images(policy: RetentionPolicy, now: datetime) -> int:
+    """Delete expired image_metadata rows"""
+    from app import db
+    from app.models.image import ImageMetadata
+    from app.services.blob_store import release_ref
+    from app.services.storage_accounting import record_usage
+
+    cutoff = policy.cutoff(policy.image_days, now)
+    if not cutoff:
+        return 0
+
+    def process_batch():
+        ids = [row.id for row in db.session.query(ImageMetadata.id).filter(ImageMetadata.timestamp < cutoff)
+               .order_by(ImageMetadata.timestamp).limit(policy.batch_size)
+               .with_for_update(skip_locked=True)]
+        if not ids:
+            return 0, []
+
+        rows = db.session.execute(
+            db.delete(ImageMetadata).where(ImageMetadata.id.in_(ids)).returning(
+                ImageMetadata.device_id, ImageMetadata.timestamp,
+                ImageMetadata.image_path, ImageMetadata.content_hash
+            ).execution_options(synchronize_session=False)
+        ).all()
+        for digest, count in Counter(row.content_hash for row in rows if row.content_hash).items():
+            release_ref(digest, count)
+        for (device_id, day), count in Counter((row.device_id, row.timestamp.date()) for row in rows).items():
+            record_usage(device_id, day, images=-count)
+        # Rows from before the blob store own their file in UPLOAD_FOLDER
+        return len(ids), [os.path.join(Config.UPLOAD_FOLDER, row.image_path) for row in rows if not row.content_hash]
+
+    return _run_batches(policy, process_batch)
+
+
+def archive_detections(policy: RetentionPolicy, now: datetime) -> int:
+    """Replace full-res originals of old detections with recompressed JPEGs"""
+    from app import db
+    from app.models.blob import Blob
+    from app.models.detection_history import DetectionHistory
+    from app.services.blob_store import get_blob_store, add_ref, release_ref
+
+    cutoff = policy.cutoff(policy.full_res_days, now)
+    if not cutoff:
+        return 0
+    store = get_blob_store()
+
+    def process_batch():
+        rows = DetectionHistory.query.filter(
+            DetectionHistory.timestamp < cutoff, DetectionHistory.archived_at.is_(None)
+        ).order_by(DetectionHistory.timestamp).limit(policy.batch_size).with_for_update(skip_locked=True).all()
+
+        for row in rows:
+            row.archived_at = now  # also on failure, so a bad file is not retried every run
+            path = row.original_image_path
+            try:
+                data = recompress(path, policy.archive_max_side, policy.archive_quality) \
+                    if path and os.path.exists(path) else None
+            except Exception as e:
+                logger.warning(f"Could not recompress {path}: {e}")
+                data = None
+            if data is None:
+                continue
+
+            # Same path, so download URLs keep working; the file becomes a link to the new blob
+            _write_atomic(path, data)
+            digest, size = store.adopt(path)
+            owner = db.session.get(Blob, row.original_blob) if row.original_blob else None
+            add_ref(digest, size, 'image/jpeg', owner.device_id if owner else None)
+            release_ref(row.original_blob)
+            row.original_blob = digest
+        return len(rows), []
+
+    return _run_batches(policy, process_batch)
+
+
+def archive_images(policy: RetentionPolicy, now: datetime) -> int:
+    """Replace full-res image_metadata files with recompressed JPEGs"""
+    from app import db
+    from app.models.image import ImageMetadata
+    from app.services.blob_store import get_blob_store, add_ref, release_ref
+    from app.services.image_service import resolve_image_file
+
+    cutoff = policy.cutoff(policy.full_res_days, now)
+    if not cutoff:
+        return 0
+    store = get_blob_store()
+
+    def process_batch():
+        rows = ImageMetadata.query.filter(
+            ImageMetadata.timestamp < cutoff, ImageMetadata.archived_at.is_(None)
+        ).order_by(ImageMetadata.timestamp).limit(policy.batch_size).with_for_update(skip_locked=True).all()
+
+        legacy_files = []
+        for row in rows:
+            row.archived_at = now
+            path = resolve_image_file(row)
+            try:
+                data = recompress(path, policy.archive_max_side, policy.archive_quality) \
+                    if os.path.exists(path) else None
+            except Exception as e:
+                logger.warning(f"Could not recompress {path}: {e}")
+                data = None
+            if data is None:
+                continue
+
+            digest, size = store.put_stream(io.BytesIO(data))
+            add_ref(digest, size, 'image/jpeg', row.device_id)
+            if row.content_hash:
+                release_ref(row.content_hash)
+            else:
+                legacy_files.append(path)
+            row.content_hash = digest
+            row.file_type = 'jpg'
+        return len(rows), legacy_files
+
+    return _run_batches(policy, process_batch)
+
+
+def prune_derivatives(policy: RetentionPolicy, now: datetime) -> int:
+    """Remove derivative files not regenerated recently (they are rebuilt on demand)"""
+    cutoff = policy.cutoff(policy.derivative_days, now)
+    if not cutoff or not os.path.isdir(Config.DERIVATIVE_DIR):
+        return 0
+    cutoff_ts = cutoff.timestamp()
+    removed = 0
+    for root, _, files in os.walk(Config.DERIVATIVE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.stat(path).st_mtime < cutoff_ts:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def sweep_capture_dirs(policy: RetentionPolicy, now: datetime, batch_size: int = 500) -> int:
+    """Remove old download/predicted files that no detection row points at
+
+    Covers captures that never got a row (capture-all, failed analysis).
+    """
+    from app import db
+    from app.models.detection_history import DetectionHistory
+
+    days = [d for d in (policy.healthy_days, policy.detection_days, policy.image_days) if d and d > 0]
+    if not days:
+        return 0
+    cutoff_ts = policy.cutoff(min(days), now).timestamp()
+
+    def unreferenced(paths: List[str]) -> List[str]:
+        referenced = {path for row in db.session.query(
+            DetectionHistory.original_image_path, DetectionHistory.predicted_image_path
+        ).filter(db.or_(DetectionHistory.original_image_path.in_(paths),
+                        DetectionHistory.predicted_image_path.in_(paths))) for path in row}
+        return [path for path in paths if path not in referenced]
+
+    removed = 0
+    for folder in ('download', 'predicted'):
+        directory = os.path.join(Config.UPLOAD_FOLDER, folder)
+        if not os.path.isdir(directory):
+            continue
+        batch = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff_ts:
+                        batch.append(entry.path)
+                except FileNotFoundError:
+                    continue
+                if len(batch) >= batch_size:
+                    removed += _unlink(unreferenced(batch))
+                    batch = []
+        if batch:
+            removed += _unlink(unreferenced(batch))
+    db.session.rollback()
+    return removed
+
+
+def run_retention(policy: Optional[RetentionPolicy] = None, now: Optional[datetime] = None) -> Dict:
+    """Apply every retention tier once; returns counts per step"""
+    from app.services.blob_store import collect_garbage
+
+    policy = policy or RetentionPolicy.from_config()
+    now = now or datetime.utcnow()
+    started = time.monotonic()
+    result = {}
+    steps = [
+        ('deleted_detections', delete_detections),
+        ('deleted_images', delete_images),
+        ('archived_detections', archive_detections),
+        ('archived_images', archive_images),
+        ('removed_capture_files', sweep_capture_dirs),
+        ('removed_derivatives', prune_derivatives)
+    ]
+    for name, step in steps:
+        try:
+            result[name] = step(policy, now)
+        except Exception as e:
+            logger.error(f"Retention step {name} failed: {str(e)}")
+            result[name] = None
+    try:
+        result['collected_blobs'] = collect_garbage()
+    except Exception as e:
+        logger.error(f"Retention blob GC failed: {str(e)}")
+        result['collected_blobs'] = None
+    result['duration_seconds'] = round(time.monotonic() - started, 2)
+    logger.info(f"Retention run: {result}")
+    return result
+
+
+class RetentionJob:
+    """Background thread running run_retention() every interval"""
+
+    def __init__(self, app, interval_seconds: float, policy: Optional[RetentionPolicy] = None):
+        self.app = app
+        self.interval = interval_seconds
+        self.policy = policy
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.last_run = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='retention', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Retention job error: {str(e)}")
+
+    def run_once(self) -> Dict:
+        # Manual runs from the API and the timer never overlap
+        with self._lock, self.app.app_context():
+            result = run_retention(self.policy)
+        self.last_run = dict(result, time=datetime.now().isoformat())
+        return result
+
+
+_retention_job = None
+
+def _lock_path() -> str:
+    return os.path.join(os.path.dirname(Config.UPLOAD_FOLDER), 'retention.lock')
+
+def get_retention_job() -> Optional[RetentionJob]:
+    return _retention_job
+
+def run_retention_now() -> Optional[Dict]:
+    """Run one pass in this worker, or None when another worker holds retention.lock"""
+    if not Config.RETENTION_ENABLED:
+        raise ValidationError('Retention is disabled (set RETENTION_ENABLED=true)')
+    if _retention_job is not None:
+        return _retention_job.run_once()
+    if not acquire_process_lock(_lock_path()):
+        return None
+    return run_retention()
+
+def start_retention_job(app) -> Optional[RetentionJob]:
+    """Start the retention job in one worker per host"""
+    global _retention_job
+    if _retention_job is not None or not Config.RETENTION_ENABLED:
+        return _retention_job
+    if not acquire_process_lock(_lock_path()):
+        return None
+    _retention_job = RetentionJob(app, Config.RETENTION_INTERVAL_SECONDS)
+    _retention_job.start()
+    return _retention_job
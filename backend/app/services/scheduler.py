@@ -2,7 +2,7 @@ import threading
 import time
 import logging
 from datetime import datetime
-from app.services.mqtt_client import get_mqtt_client
+from app.services.device_commands import submit_device_command
 
 logger = logging.getLogger(__name__)
 
@@ -51,50 +51,20 @@ def _handle_device_timeout(task_id, device_id, duration_seconds, cancel_event):
         # Wait for the specified duration or until canceled
         if not cancel_event.wait(timeout=duration_seconds):
             # If not canceled, turn off the device
-            mqtt_client = get_mqtt_client()
-            
-            # Determine device type to construct appropriate message
-            device_type = None
             if device_id.startswith("pump"):
                 device_type = "pump"
-                status = False
             elif device_id.startswith("fan"):
                 device_type = "fan"
-                status = False
             elif device_id.startswith("cover"):
                 # For cover, we don't automatically turn it off
                 return
             else:
                 logger.error(f"Unknown device type for device_id: {device_id}")
                 return
-              # Prepare and send OFF message
-            off_message = {
-                "device_id": device_id,
-                "command": "SET_STATE",
-                "status": status,
-                "timestamp": datetime.now().isoformat()            }
-            
-            topic = f"greenhouse/control/{device_type}"  # Use device type not device_id
-            success = mqtt_client.publish(topic, off_message)
-              # Also update the device state in the database
-            try:
-                from app.services.timescale import update_device_state
-                
-                # Update device_states table (NOT sensor_data table)
-                # Device control status should only be saved to device_states table
-                status_str = "false"  # Off state as string
-                update_device_state(device_id, device_type, status_str)
-                logger.info(f"Updated device_states for {device_id} with status: {status_str}")
-                
-                # Note: Only sending control message, no status message as requested
-                
-            except Exception as db_error:
-                logger.error(f"Error updating device state in database: {str(db_error)}")
             
-            if success:
-                logger.info(f"Automatically turned off {device_id} after {duration_seconds} seconds")
-            else:
-                logger.error(f"Failed to turn off {device_id} after timeout")
+            # device_states and the OFF command are written together, the dispatcher publishes it
+            submit_device_command(device_id, device_type, False, source='schedule')
+            logger.info(f"Automatically turned off {device_id} after {duration_seconds} seconds")
     except Exception as e:
         logger.error(f"Error in device timeout handler: {e}")
     finally:
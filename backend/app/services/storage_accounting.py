@@ -0,0 +1,316 @@
+"""
+Incremental storage accounting
+
+storage_usage keeps file/byte/image counters per device and day. They are
+updated in the same transaction as the write they describe: a new blob
+(add_ref), a collected blob (collect_garbage) and image_metadata rows
+(save_image/delete_image). Storage endpoints sum this small table instead
+of walking the image tree.
+
+StorageReconciler periodically recomputes the counters from the blobs and
+image_metadata tables and applies the difference as an increment, so writes
+that commit while it runs are not lost. It also removes blob files that
+have no row at all (a crash between writing the file and committing).
+
+Files written under UPLOAD_FOLDER before the blob store existed have no
+row anywhere. They are counted under the 'legacy' device by walking the
+tree once per reconciler start (and on a manual reconcile); periodic runs
+leave those rows alone.
+"""
+
+import os
+import logging
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from app.config import Config
+from app.utils import StorageError, acquire_process_lock
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_DEVICE = 'unknown'
+LEGACY_DEVICE = 'legacy'  # pre-blob-store files under UPLOAD_FOLDER
+
+
+def dialect_insert():
+    """INSERT construct with ON CONFLICT support for the current database, or None"""
+    from app import db
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def _as_date(value) -> date:
+    # SQLite returns date() results as strings
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def record_usage(device_id: Optional[str], day, files: int = 0, size: int = 0, images: int = 0) -> None:
+    """Add deltas to one (device, day) counter in the current session (caller commits)"""
+    from app import db
+    from app.models.storage_usage import StorageUsage
+
+    if not (files or size or images):
+        return
+    table = StorageUsage.__table__
+    device_id = device_id or UNKNOWN_DEVICE
+    day = _as_date(day)
+    now = datetime.utcnow()
+
+    insert = dialect_insert()
+    if insert is not None:
+        stmt = insert(table).values(device_id=device_id, day=day, file_count=files,
+                                    total_bytes=size, image_count=images, updated_at=now)
+        stmt = stmt.on_conflict_do_update(index_elements=['device_id', 'day'], set_={
+            'file_count': table.c.file_count + files,
+            'total_bytes': table.c.total_bytes + size,
+            'image_count': table.c.image_count + images,
+            'updated_at': now
+        })
+        db.session.execute(stmt)
+        return
+
+    usage = db.session.get(StorageUsage, (device_id, day))
+    if usage is None:
+        db.session.add(StorageUsage(device_id=device_id, day=day, file_count=files,
+                                    total_bytes=size, image_count=images))
+    else:
+        usage.file_count += files
+        usage.total_bytes += size
+        usage.image_count += images
+
+
+def get_storage_totals(device_id: Optional[str] = None) -> Dict:
+    """Total files, bytes and images (one row per device and day is summed)"""
+    from app import db
+    from app.models.storage_usage import StorageUsage
+
+    query = db.session.query(
+        db.func.coalesce(db.func.sum(StorageUsage.file_count), 0),
+        db.func.coalesce(db.func.sum(StorageUsage.total_bytes), 0),
+        db.func.coalesce(db.func.sum(StorageUsage.image_count), 0)
+    )
+    if device_id:
+        query = query.filter(StorageUsage.device_id == device_id)
+    files, size, images = query.one()
+    return {'total_files': int(files), 'total_bytes': int(size), 'total_images': int(images)}
+
+
+def get_storage_breakdown(device_id: Optional[str] = None, start_date: Optional[date] = None,
+                          end_date: Optional[date] = None) -> List[Dict]:
+    """Per device and day counters, newest day first"""
+    from app.models.storage_usage import StorageUsage
+
+    query = StorageUsage.query
+    if device_id:
+        query = query.filter(StorageUsage.device_id == device_id)
+    if start_date:
+        query = query.filter(StorageUsage.day >= start_date)
+    if end_date:
+        query = query.filter(StorageUsage.day <= end_date)
+    return [usage.to_dict() for usage in query.order_by(StorageUsage.day.desc(), StorageUsage.device_id).all()]
+
+
+def _expected_usage() -> Dict:
+    """Counters recomputed from the source tables: {(device, day): [files, bytes, images]}"""
+    from app import db
+    from app.models.blob import Blob
+    from app.models.image import ImageMetadata
+
+    expected = {}
+    blob_day = db.func.date(Blob.created_at)
+    for device_id, day, files, size in db.session.query(
+            Blob.device_id, blob_day, db.func.count(), db.func.sum(Blob.size)).group_by(Blob.device_id, blob_day):
+        expected.setdefault((device_id or UNKNOWN_DEVICE, _as_date(day)), [0, 0, 0])[:2] = [files, int(size or 0)]
+
+    image_day = db.func.date(ImageMetadata.timestamp)
+    for device_id, day, images in db.session.query(
+            ImageMetadata.device_id, image_day, db.func.count()).group_by(ImageMetadata.device_id, image_day):
+        expected.setdefault((device_id, _as_date(day)), [0, 0, 0])[2] = images
+    return expected
+
+
+def _legacy_usage() -> Dict:
+    """Files under UPLOAD_FOLDER not backed by a blob: {(LEGACY_DEVICE, mtime day): [files, bytes, 0]}
+
+    Adopted download/predicted files are hard links to their blob and are
+    already counted with it, so only single-link files are legacy.
+    """
+    skip = {os.path.abspath(path) for path in (Config.BLOB_STORE_DIR, Config.DERIVATIVE_DIR)}
+    usage = {}
+    for root, dirs, files in os.walk(Config.UPLOAD_FOLDER):
+        dirs[:] = [name for name in dirs if os.path.abspath(os.path.join(root, name)) not in skip]
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            if stat.st_nlink > 1:
+                continue
+            counts = usage.setdefault((LEGACY_DEVICE, date.fromtimestamp(stat.st_mtime)), [0, 0, 0])
+            counts[0] += 1
+            counts[1] += stat.st_size
+    return usage
+
+
+def reconcile_usage(include_legacy: bool = False) -> int:
+    """Fix counter drift; returns the number of (device, day) rows corrected
+
+    include_legacy also walks UPLOAD_FOLDER to refresh the legacy file counters.
+    """
+    from app import db
+    from app.models.storage_usage import StorageUsage
+
+    try:
+        # Read source tables and counters from one snapshot...
+        db.session.rollback()
+        if db.session.get_bind().dialect.name == 'postgresql':
+            db.session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+        expected = _expected_usage()
+        current = {(u.device_id, u.day): [u.file_count, u.total_bytes, u.image_count]
+                   for u in StorageUsage.query.all()}
+        db.session.rollback()
+        if include_legacy:
+            expected.update(_legacy_usage())
+        else:
+            current = {key: counts for key, counts in current.items() if key[0] != LEGACY_DEVICE}
+
+        # ...then apply the difference as increments, so concurrent writes stay counted
+        corrected = 0
+        for key in set(expected) | set(current):
+            want = expected.get(key, [0, 0, 0])
+            have = current.get(key, [0, 0, 0])
+            delta = [w - h for w, h in zip(want, have)]
+            if any(delta):
+                record_usage(key[0], key[1], files=delta[0], size=delta[1], images=delta[2])
+                corrected += 1
+        db.session.commit()
+        if corrected:
+            logger.warning(f"Storage counters drifted, corrected {corrected} device/day rows")
+        return corrected
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Storage reconcile failed: {e}")
+        raise StorageError(f"Storage reconcile failed: {e}")
+
+
+def remove_orphan_blobs(grace_seconds: Optional[float] = None, batch_size: int = 500) -> int:
+    """Delete blob files that have no row in the blobs table"""
+    from app import db
+    from app.models.blob import Blob
+    from app.services.blob_store import get_blob_store
+
+    store = get_blob_store()
+    grace = Config.BLOB_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = datetime.now().timestamp() - grace
+    removed = 0
+
+    def check(batch):
+        known = {row[0] for row in db.session.query(Blob.sha256).filter(Blob.sha256.in_(list(batch)))}
+        count = 0
+        for digest, path in batch.items():
+            if digest not in known:
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.remove(path)
+                        count += 1
+                except FileNotFoundError:
+                    pass
+        return count
+
+    batch = {}
+    for level1 in _subdirs(store.root):
+        if os.path.basename(level1) == 'tmp':
+            continue
+        for level2 in _subdirs(level1):
+            with os.scandir(level2) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        batch[entry.name] = entry.path
+                    if len(batch) >= batch_size:
+                        removed += check(batch)
+                        batch = {}
+    if batch:
+        removed += check(batch)
+    db.session.rollback()
+    if removed:
+        logger.warning(f"Removed {removed} orphan blob files")
+    return removed
+
+
+def _subdirs(path: str) -> List[str]:
+    if not os.path.isdir(path):
+        return []
+    with os.scandir(path) as entries:
+        return [entry.path for entry in entries if entry.is_dir()]
+
+
+class StorageReconciler:
+    """Background thread: blob GC, orphan sweep and counter reconcile"""
+
+    def __init__(self, app, interval_seconds: float, initial_delay: float = 60.0):
+        self.app = app
+        self.interval = interval_seconds
+        self.initial_delay = initial_delay
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='storage-reconciler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        delay = self.initial_delay
+        while not self._stop.wait(delay):
+            delay = self.interval
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Storage reconciler error: {str(e)}")
+
+    def run_once(self) -> Dict:
+        from app.services.blob_store import collect_garbage, sweep_temp_files
+        with self.app.app_context():
+            result = {
+                'collected_blobs': collect_garbage(),
+                'orphan_blobs': remove_orphan_blobs(),
+                'temp_files': sweep_temp_files(),
+                # The first run after start also counts files from before the blob store
+                'corrected_rows': reconcile_usage(include_legacy=self.last_run is None)
+            }
+        self.last_run = dict(result, time=datetime.now().isoformat())
+        return result
+
+
+_reconciler = None
+
+def get_storage_reconciler() -> Optional[StorageReconciler]:
+    return _reconciler
+
+def start_storage_reconciler(app) -> Optional[StorageReconciler]:
+    """Start the reconciler in one worker per host"""
+    global _reconciler
+    if _reconciler is not None or not Config.STORAGE_RECONCILE_ENABLED:
+        return _reconciler
+    if not acquire_process_lock(os.path.join(os.path.dirname(Config.UPLOAD_FOLDER), 'storage_reconcile.lock')):
+        return None
+    _reconciler = StorageReconciler(app, Config.STORAGE_RECONCILE_INTERVAL_SECONDS)
+    _reconciler.start()
+    return _reconciler
@@ -1,6 +1,8 @@
 import logging
 from datetime import datetime
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, MetaData, Table, Column, DateTime, String, Float
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import OperationalError, InterfaceError
 from app.config import Config
 from app.utils import SensorError, parse_time_range
 from app.services.cache_service import cache, cache_sensor_data, get_cached_sensor_data
@@ -10,6 +12,15 @@ logger = logging.getLogger(__name__)
 # Create database engine
 engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
 
+# Core table definition used for bulk inserts
+sensor_data_table = Table(
+    'sensor_data', MetaData(),
+    Column('time', DateTime(timezone=True), primary_key=True),
+    Column('device_id', String(50), primary_key=True),
+    Column('sensor_type', String(50), primary_key=True),
+    Column('value', Float)
+)
+
 def init_timescaledb():
     """Initialize TimescaleDB with required extensions and tables"""
     try:
@@ -38,61 +49,123 @@ def init_timescaledb():
         logger.error(f"Failed to initialize TimescaleDB: {e}")
         raise SensorError(f"TimescaleDB initialization failed: {e}")
 
+def _prepare_sensor_row(data):
+    """Validate sensor data and build the sensor_data row parameters
+
+    Raises:
+        ValueError: If the data is missing fields or has an invalid value
+    """
+    # Validate required fields
+    if not all(key in data for key in ['device_id', 'sensor_type', 'value']):
+        raise ValueError("Missing required sensor data fields")
+    
+    # Validate value type - allow strings for cover position
+    sensor_type = data['sensor_type']
+    if sensor_type.endswith('_status') and 'cover' in sensor_type:
+        # For cover status, convert string positions to numeric values
+        if isinstance(data['value'], str):
+            status_upper = data['value'].upper()
+            if status_upper == 'CLOSED':
+                data['value'] = 0
+            elif status_upper == 'HALF':
+                data['value'] = 0.5
+            elif status_upper == 'OPEN':
+                data['value'] = 1
+            else:
+                raise ValueError(f"Invalid cover position: {data['value']}")
+        elif not isinstance(data['value'], (int, float)):
+            raise ValueError("Cover status must be a valid position string or numeric value")
+    else:
+        # For other sensors, only allow numeric/boolean values
+        if not isinstance(data['value'], (int, float, bool)):
+            raise ValueError("Sensor value must be numeric or boolean")
+    
+    # Convert boolean to int if necessary
+    if isinstance(data['value'], bool):
+        data['value'] = 1 if data['value'] else 0
+    
+    timestamp = datetime.fromisoformat(data['timestamp']) if 'timestamp' in data else datetime.utcnow()
+    
+    return {
+        'timestamp': timestamp,
+        'device_id': data['device_id'],
+        'sensor_type': data['sensor_type'],
+        'value': float(data['value'])
+    }
+
 def save_sensor_data(data):
-    """Save sensor data to TimescaleDB with validation and error handling"""
+    """Save sensor data to TimescaleDB with validation and error handling
+    
+    If the database cannot be reached the row is written to the ingest spool
+    and replayed later instead of being lost.
+    """
+    try:
+        row = _prepare_sensor_row(data)
+    except ValueError as e:
+        logger.error(f"Invalid sensor data: {e}")
+        raise SensorError(f"Invalid sensor data: {e}")
+    
     try:
-        # Validate required fields
-        if not all(key in data for key in ['device_id', 'sensor_type', 'value']):
-            raise ValueError("Missing required sensor data fields")# Validate value type - allow strings for cover position
-        sensor_type = data['sensor_type']
-        if sensor_type.endswith('_status') and 'cover' in sensor_type:
-            # For cover status, convert string positions to numeric values
-            if isinstance(data['value'], str):
-                status_upper = data['value'].upper()
-                if status_upper == 'CLOSED':
-                    data['value'] = 0
-                elif status_upper == 'HALF':
-                    data['value'] = 0.5
-                elif status_upper == 'OPEN':
-                    data['value'] = 1
-                else:
-                    raise ValueError(f"Invalid cover position: {data['value']}")
-            elif not isinstance(data['value'], (int, float)):
-                raise ValueError("Cover status must be a valid position string or numeric value")
-        else:
-            # For other sensors, only allow numeric/boolean values
-            if not isinstance(data['value'], (int, float, bool)):
-                raise ValueError("Sensor value must be numeric or boolean")
-              # Convert boolean to int if necessary
-        if isinstance(data['value'], bool):
-            data['value'] = 1 if data['value'] else 0
-        
-        timestamp = datetime.fromisoformat(data['timestamp']) if 'timestamp' in data else datetime.utcnow()
-            
         with engine.begin() as conn:
             conn.execute(text("""
                 INSERT INTO sensor_data (time, device_id, sensor_type, value)
                 VALUES (:timestamp, :device_id, :sensor_type, :value)
                 ON CONFLICT (time, device_id, sensor_type) 
                 DO UPDATE SET value = EXCLUDED.value
-            """), {
-                'timestamp': timestamp,
-                'device_id': data['device_id'],
-                'sensor_type': data['sensor_type'],
-                'value': float(data['value'])
-            })
-            
-            logger.info(f"Saved sensor data: {data}")
+            """), row)
             
-            # Update cache with new value
-            cache_sensor_data(data, data['device_id'], data['sensor_type'])
+            logger.info("Saved sensor data: %s/%s = %s", row['device_id'], row['sensor_type'], row['value'])
             
-    except ValueError as e:
-        logger.error(f"Invalid sensor data: {e}")
-        raise SensorError(f"Invalid sensor data: {e}")
+    except (OperationalError, InterfaceError) as e:
+        from app.services.ingest_spool import get_ingest_spool
+        spool = get_ingest_spool()
+        if spool is None or not spool.append([row]):
+            logger.error(f"Failed to save sensor data: {e}")
+            raise SensorError(f"Failed to save sensor data: {e}")
+        logger.warning(f"Database unavailable, spooled sensor data: {data['device_id']}/{data['sensor_type']}")
     except Exception as e:
         logger.error(f"Failed to save sensor data: {e}")
         raise SensorError(f"Failed to save sensor data: {e}")
+    
+    # Update cache with new value
+    cache_sensor_data(data, data['device_id'], data['sensor_type'])
+
+def save_sensor_data_batch(rows):
+    """Bulk upsert prepared sensor_data rows in one statement
+    
+    Args:
+        rows: List of dicts with timestamp, device_id, sensor_type and value
+              (as built by ``_prepare_sensor_row``)
+    
+    Returns:
+        Number of rows written
+    """
+    # ON CONFLICT DO UPDATE cannot touch the same row twice in one statement,
+    # keep the last value for each key
+    unique_rows = {}
+    for row in rows:
+        unique_rows[(row['timestamp'], row['device_id'], row['sensor_type'])] = row
+    if not unique_rows:
+        return 0
+    
+    stmt = pg_insert(sensor_data_table).values([
+        {
+            'time': row['timestamp'],
+            'device_id': row['device_id'],
+            'sensor_type': row['sensor_type'],
+            'value': row['value']
+        }
+        for row in unique_rows.values()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['time', 'device_id', 'sensor_type'],
+        set_={'value': stmt.excluded.value}
+    )
+    
+    with engine.begin() as conn:
+        conn.execute(stmt)
+    
+    return len(unique_rows)
 
 @cache(ttl=60)  # Cache for 1 minute
 def query_sensor_data(start_time='24h', device_id=None, sensor_type=None):
@@ -249,36 +322,37 @@ def get_device_states():
         logger.error(f"Failed to get device states: {e}")
         raise SensorError(f"Failed to get device states: {e}")
 
+DEVICE_NAMES = {
+    'pump': 'Bom nuoc',
+    'fan': 'Quat thong gio',
+    'cover': 'Mai che'
+}
+
+def device_status_str(status):
+    """device_states format: 'true'/'false' for pump/fan, position string for cover"""
+    return str(status).lower() if isinstance(status, bool) else str(status)
+
+def upsert_device_state(conn, device_id, device_type, status):
+    """Write one device_states row on an open connection (caller owns the transaction)"""
+    conn.execute(text("""
+        INSERT INTO device_states (id, type, name, status, last_updated)
+        VALUES (:device_id, :device_type, :name, :status, CURRENT_TIMESTAMP)
+        ON CONFLICT (id) DO UPDATE SET
+            status = EXCLUDED.status,
+            last_updated = EXCLUDED.last_updated
+    """), {
+        'device_id': device_id,
+        'device_type': device_type,
+        'name': DEVICE_NAMES.get(device_type, device_id),
+        'status': device_status_str(status)
+    })
+
 def update_device_state(device_id, device_type, status):
     """Update device state in database"""
     try:
         with engine.begin() as conn:
-            # Get device name mapping
-            device_names = {
-                'pump': 'Bom nuoc',
-                'fan': 'Quat thong gio',
-                'cover': 'Mai che'
-            }
-            
-            device_name = device_names.get(device_type, device_id)
-            
-            # Convert status to string for database storage
-            status_str = str(status).lower() if isinstance(status, bool) else str(status)
-            
-            conn.execute(text("""
-                INSERT INTO device_states (id, type, name, status, last_updated)
-                VALUES (:device_id, :device_type, :name, :status, NOW())
-                ON CONFLICT (id) DO UPDATE SET
-                    status = EXCLUDED.status,
-                    last_updated = EXCLUDED.last_updated
-            """), {
-                'device_id': device_id,
-                'device_type': device_type,
-                'name': device_name,
-                'status': status_str
-            })
-            
-            logger.info(f"Updated device state: {device_id} ({device_type}) = {status}")
+            upsert_device_state(conn, device_id, device_type, status)
+            logger.info("Updated device state: %s (%s) = %s", device_id, device_type, status)
             return True
             
     except Exception as e:
@@ -1,6 +1,7 @@
 from app.utils.helpers import (
     parse_time_range,
     ensure_directory_exists,
+    acquire_process_lock,
     format_sensor_value,
     validate_date_range,
     GreenhouseError,
@@ -12,6 +13,7 @@ from app.utils.helpers import (
 __all__ = [
     'parse_time_range',
     'ensure_directory_exists',
+    'acquire_process_lock',
     'format_sensor_value',
     'validate_date_range',
     'GreenhouseError',
@@ -3,15 +3,6 @@ import os
 from typing import Union, Optional
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('greenhouse.log')
-    ]
-)
 logger = logging.getLogger(__name__)
 
 class GreenhouseError(Exception):
@@ -54,6 +45,30 @@ def ensure_directory_exists(path: str) -> None:
     if not os.path.exists(path):
         os.makedirs(path, exist_ok=True)
 
+_process_locks = {}
+
+def acquire_process_lock(path: str) -> bool:
+    """Take an exclusive per-host lock file for a background job
+
+    Gunicorn starts several workers; only the one holding the lock runs
+    the job. The file stays open (and locked) for the life of the process.
+    """
+    if path in _process_locks:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        return True  # Windows development server: single process
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle = open(path, 'w')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _process_locks[path] = handle
+    return True
+
 def format_sensor_value(value: float, sensor_type: str) -> str:
     """Format sensor value with appropriate unit
     
@@ -1,39 +1,152 @@
+import atexit
 import logging
 import os
 import sys
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from datetime import datetime
 
+_listener = None
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks or formats on the caller's thread
+
+    Records are enqueued as-is and formatted by the listener thread. When the
+    queue is full the record is dropped and counted instead of blocking the
+    MQTT or request thread.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped_total = 0
+
+    def prepare(self, record):
+        # The listener runs in this process, so the record can be passed
+        # through unformatted (the base class formats it eagerly)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped_total += 1
+
+
+class LogRateLimitFilter(logging.Filter):
+    """Let at most ``rate`` INFO/DEBUG records per call site through each second
+
+    WARNING and above always pass. The number of suppressed records is
+    appended to the next record that passes from the same call site.
+    """
+
+    def __init__(self, rate: int, interval: float = 1.0, max_level: int = logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.interval = interval
+        self.max_level = max_level
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} (+{suppressed} similar messages suppressed)"
+                return True
+
+            if window[1] < self.rate:
+                window[1] += 1
+                return True
+
+            window[2] += 1
+            return False
+
+
+def start_queue_logging(handlers, queue_size: int = 10000, level=logging.DEBUG):
+    """Route root logging through a queue drained by a background thread
+
+    Args:
+        handlers: Handlers that do the actual (blocking) output
+        queue_size: Maximum number of pending records before dropping
+        level: Root logger level
+
+    Returns:
+        The running QueueListener, or None if queue logging is already set up
+    """
+    global _listener
+    if _listener is not None:
+        return None
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    log_queue = queue.Queue(maxsize=queue_size)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_queue_logging)
+
+    root_logger.addHandler(NonBlockingQueueHandler(log_queue))
+    return _listener
+
+
+def stop_queue_logging():
+    """Flush pending records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
 def setup_logging(app):
     """Configure logging for the application
-    
+
     Sets up both file and console logging with different formats and levels
     Creates logs directory if it doesn't exist
     Rotates log files when they reach 10MB
+    Handlers run on a background thread behind a queue, so ingest and request
+    threads never wait on console or disk writes
     """
+    from app.config import Config
+
+    if _listener is not None:
+        # Already configured by an earlier create_app() call
+        app.logger.setLevel(logging.INFO)
+        return
+
     # Create logs directory if it doesn't exist
     logs_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs')
     os.makedirs(logs_dir, exist_ok=True)
-    
+
     # Generate log filename with timestamp
     timestamp = datetime.now().strftime('%Y%m%d')
     log_file = os.path.join(logs_dir, f'greenhouse_{timestamp}.log')
-      # Set up formatter for console output
+    # Set up formatter for console output
     console_formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
-    
+
     # Set up formatter for file output (more detailed)
     file_formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         ' [in %(pathname)s:%(lineno)d]'
     )
-    
+
     # Create console handler using the original stdout
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(console_formatter)
-    
+
     # File handler (DEBUG level, rotating) with UTF-8 encoding
     file_handler = RotatingFileHandler(
         log_file,
@@ -43,21 +156,21 @@ def setup_logging(app):
     )
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(file_formatter)
-      # Configure root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.DEBUG)
-    
-    # Only add handlers to root logger to avoid duplication
-    # Clear any existing handlers first to prevent duplicates
-    if not root_logger.handlers:
-        root_logger.addHandler(console_handler)
-        root_logger.addHandler(file_handler)
-    
+
+    # Configure root logger
+    start_queue_logging([console_handler, file_handler], queue_size=Config.LOG_QUEUE_SIZE)
+
+    # Sample high-frequency per-reading messages on the ingest path
+    for name in Config.LOG_RATE_LIMITED_LOGGERS:
+        hot_logger = logging.getLogger(name.strip())
+        if not any(isinstance(f, LogRateLimitFilter) for f in hot_logger.filters):
+            hot_logger.addFilter(LogRateLimitFilter(Config.LOG_RATE_LIMIT))
+
     # Set Flask logger level but don't add duplicate handlers
     app.logger.setLevel(logging.INFO)
-    
+
     # Lower level for some noisy libraries
     logging.getLogger('werkzeug').setLevel(logging.WARNING)
     logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
-    
-    app.logger.info('Logging system initialized')
\ No newline at end of file
+
+    app.logger.info('Logging system initialized')
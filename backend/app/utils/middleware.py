@@ -1,44 +1,192 @@
+import math
 import time
+import threading
+from collections import OrderedDict
 from functools import wraps
-from flask import request, jsonify
+from typing import Callable, Dict, Optional, Tuple
+from flask import request, jsonify, make_response
 import logging
 from app.utils import ValidationError
 
 logger = logging.getLogger(__name__)
 
-# Simple in-memory rate limiting store
-# In production, consider using Redis
-rate_limit_store = {}
 
-def rate_limit(f):
+def parse_rate(value: str) -> Tuple[int, float]:
+    """Parse "limit/seconds" (e.g. "60/60") into (capacity, period)"""
+    limit, _, period = value.partition('/')
+    return int(limit), float(period or 60)
+
+
+def parse_route_limits(value: str) -> Dict[str, Tuple[int, float]]:
+    """Parse "endpoint=limit/seconds,..." into a dict"""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in value.split(','))):
+        endpoint, _, rate = entry.partition('=')
+        limits[endpoint.strip()] = parse_rate(rate.strip())
+    return limits
+
+
+class LocalBucketStore:
+    """Token buckets in process memory
+
+    State is (tokens, last refill time) per key, so a check is O(1). Keys are
+    spread over lock stripes, each an LRU bounded to its share of max_keys, so
+    unrelated clients rarely contend and idle IPs are evicted.
+    """
+
+    def __init__(self, max_keys: int = 10000, stripes: int = 16):
+        self.stripes = [(threading.Lock(), OrderedDict()) for _ in range(max(1, stripes))]
+        self.stripe_size = max(1, math.ceil(max_keys / len(self.stripes)))
+
+    def take(self, key: str, cost: int, capacity: int, rate: float) -> Tuple[bool, float]:
+        """Remove cost tokens if available; returns (allowed, tokens left)"""
+        lock, buckets = self.stripes[hash(key) % len(self.stripes)]
+        now = time.monotonic()
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [float(capacity), now]
+                if len(buckets) > self.stripe_size:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            allowed = bucket[0] >= cost
+            if allowed:
+                bucket[0] -= cost
+            return allowed, bucket[0]
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for _, buckets in self.stripes)
+
+
+class RedisBucketStore:
+    """Token buckets in Redis, shared by every worker; refilled atomically in a script"""
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str, prefix: str = 'ratelimit:'):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.prefix = prefix
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def take(self, key: str, cost: int, capacity: int, rate: float) -> Tuple[bool, float]:
+        allowed, tokens = self.script(keys=[self.prefix + key], args=[capacity, rate, cost])
+        return bool(allowed), float(tokens)
+
+
+class RateLimiter:
+    """Per-client token buckets with per-route limits and costs"""
+
+    def __init__(self, store, default: Tuple[int, float] = (60, 60),
+                 routes: Optional[Dict[str, Tuple[int, float]]] = None, enabled: bool = True):
+        self.store = store
+        self.default = default
+        self.routes = routes or {}
+        self.enabled = enabled
+
+    def check(self, bucket: str, client: str, cost: int = 1,
+              limit: Optional[Tuple[int, float]] = None) -> Tuple[bool, Dict[str, str]]:
+        """Charge one request; returns (allowed, RateLimit-* headers)"""
+        capacity, period = self.routes.get(bucket) or limit or self.default
+        rate = capacity / period
+        try:
+            allowed, tokens = self.store.take(f"{bucket}:{client}", cost, capacity, rate)
+        except Exception as e:
+            # A shared backend outage must not take the API down with it
+            logger.warning(f"Rate limit backend unavailable, allowing request: {e}")
+            return True, {}
+
+        headers = {
+            'RateLimit-Limit': str(capacity),
+            'RateLimit-Remaining': str(int(tokens)),
+            'RateLimit-Reset': str(math.ceil((capacity - tokens) / rate)),  # seconds until the bucket is full
+            'RateLimit-Policy': f"{capacity};w={int(period)}"
+        }
+        if not allowed:
+            headers['Retry-After'] = str(max(1, math.ceil((cost - tokens) / rate)))
+        return allowed, headers
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter built from Config"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                from app.config import Config
+                store = None
+                if Config.RATE_LIMIT_REDIS_URL:
+                    try:
+                        store = RedisBucketStore(Config.RATE_LIMIT_REDIS_URL)
+                    except ImportError:
+                        logger.warning("RATE_LIMIT_REDIS_URL is set but redis is not installed, using per-process buckets")
+                if store is None:
+                    store = LocalBucketStore(Config.RATE_LIMIT_MAX_KEYS, Config.RATE_LIMIT_LOCK_STRIPES)
+                _rate_limiter = RateLimiter(store, parse_rate(Config.RATE_LIMIT_DEFAULT),
+                                            parse_route_limits(Config.RATE_LIMIT_ROUTES), Config.RATE_LIMIT_ENABLED)
+    return _rate_limiter
+
+
+def rate_limit(f: Optional[Callable] = None, *, cost: int = 1, limit: Optional[str] = None):
     """Rate limiting decorator
     
-    Limits requests to 60 per minute per IP address
+    Each client IP has a token bucket (RATE_LIMIT_DEFAULT, 60 per minute) shared
+    by all routes; a request spends `cost` tokens, so expensive endpoints
+    use @rate_limit(cost=10). Routes given their own limit="N/seconds" (or listed
+    in RATE_LIMIT_ROUTES) get a separate bucket.
     """
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        ip = request.remote_addr
-        current = time.time()
-        
-        # Initialize or clean old requests
-        if ip not in rate_limit_store:
-            rate_limit_store[ip] = []
-        rate_limit_store[ip] = [ts for ts in rate_limit_store[ip] 
-                               if current - ts < 60]  # Keep last minute
-        
-        # Check rate limit
-        if len(rate_limit_store[ip]) >= 60:
-            logger.warning(f"Rate limit exceeded for IP: {ip}")
-            return jsonify({
-                'success': False,
-                'error': 'Rate limit exceeded. Please try again later.'
-            }), 429
-        
-        # Add request timestamp
-        rate_limit_store[ip].append(current)
-        
-        return f(*args, **kwargs)
-    return decorated_function
+    def decorator(func: Callable) -> Callable:
+        route_limit = parse_rate(limit) if limit else None
+
+        @wraps(func)
+        def decorated_function(*args, **kwargs):
+            limiter = get_rate_limiter()
+            if not limiter.enabled:
+                return func(*args, **kwargs)
+
+            ip = request.remote_addr
+            own_bucket = route_limit is not None or request.endpoint in limiter.routes
+            bucket = request.endpoint if own_bucket else 'default'
+            allowed, headers = limiter.check(bucket, ip, cost, route_limit)
+
+            if not allowed:
+                logger.warning(f"Rate limit exceeded for IP: {ip} ({bucket})")
+                return jsonify({
+                    'success': False,
+                    'error': 'Rate limit exceeded. Please try again later.'
+                }), 429, headers
+
+            response = make_response(func(*args, **kwargs))
+            response.headers.update(headers)
+            return response
+        return decorated_function
+
+    return decorator(f) if f is not None else decorator
 
 def validate_query_params(*required_params):
     """Decorator to validate required query parameters
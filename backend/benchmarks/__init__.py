@@ -0,0 +1,7 @@
+"""
+Benchmark suites for the greenhouse backend
+
+Each suite is runnable with ``python -m benchmarks.<suite>`` from the backend
+directory and writes a JSON report that ``python -m benchmarks.compare`` can
+diff across commits.
+"""
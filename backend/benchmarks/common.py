@@ -0,0 +1,120 @@
+"""
+Shared helpers for benchmark reports
+"""
+
+import os
+import sys
+import json
+import platform
+import subprocess
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def percentiles(values: Iterable[float], qs=(50, 95, 99)) -> Dict[str, Optional[float]]:
+    """Nearest-rank percentiles plus min/max/mean of a sample"""
+    data = sorted(values)
+    result = {f"p{q}": None for q in qs}
+    result.update({'min': None, 'max': None, 'mean': None, 'count': len(data)})
+    if not data:
+        return result
+
+    for q in qs:
+        rank = max(int(-(-q * len(data) // 100)) - 1, 0)  # ceil(q/100 * n) - 1
+        result[f"p{q}"] = round(data[min(rank, len(data) - 1)], 3)
+    result['min'] = round(data[0], 3)
+    result['max'] = round(data[-1], 3)
+    result['mean'] = round(sum(data) / len(data), 3)
+    return result
+
+
+def git_commit() -> Optional[str]:
+    """Short hash of the checked-out commit, with a -dirty suffix if modified"""
+    try:
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd,
+                                         stderr=subprocess.DEVNULL, text=True).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], cwd=cwd,
+                                stderr=subprocess.DEVNULL) != 0
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict:
+    """Machine details that affect benchmark numbers"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KB on Linux and bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+
+
+def build_report(benchmark: str, config: Dict, results: Dict) -> Dict:
+    return {
+        'benchmark': benchmark,
+        'git_commit': git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'environment': environment(),
+        'config': config,
+        'results': results
+    }
+
+
+def write_report(report: Dict, output: Optional[str] = None) -> str:
+    """Write a report as JSON and return its path
+
+    The default path is benchmarks/results/<benchmark>-<commit>-<time>.json
+    """
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{report['benchmark']}-{report['git_commit'] or 'nogit'}-{stamp}.json")
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    return output
+
+
+def flatten(data: Dict, prefix: str = '') -> Dict[str, float]:
+    """Flatten nested numeric results to dotted keys"""
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                if isinstance(item, dict):
+                    label = item.get('name') or item.get('label') or index
+                    flat.update(flatten(item, f"{name}[{label}]"))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def print_summary(title: str, rows: List[List]) -> None:
+    """Print a simple aligned table to stdout"""
+    print(f"\n{title}")
+    if not rows:
+        return
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)))
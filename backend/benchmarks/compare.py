@@ -0,0 +1,51 @@
+"""
+Compare two benchmark reports
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 5]
+"""
+
+import sys
+import json
+import argparse
+from benchmarks.common import flatten
+
+
+def compare(baseline: dict, candidate: dict, threshold: float = 5.0):
+    """Yield (metric, baseline, candidate, change %) for metrics present in both"""
+    old = flatten(baseline['results'])
+    new = flatten(candidate['results'])
+    for name in sorted(set(old) & set(new)):
+        before, after = old[name], new[name]
+        change = ((after - before) / before * 100) if before else (0.0 if after == before else float('inf'))
+        yield name, before, after, change, abs(change) >= threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark JSON reports')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=5.0,
+                        help='Only show metrics that changed by at least this percent (default: 5)')
+    parser.add_argument('--all', action='store_true', help='Show unchanged metrics too')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    if baseline.get('benchmark') != candidate.get('benchmark'):
+        print(f"Reports are from different benchmarks: {baseline.get('benchmark')} vs {candidate.get('benchmark')}")
+        sys.exit(1)
+    if baseline.get('config') != candidate.get('config'):
+        print("Warning: benchmark configurations differ, numbers may not be comparable")
+
+    print(f"{baseline.get('git_commit')} -> {candidate.get('git_commit')}")
+    for name, before, after, change, significant in compare(baseline, candidate, args.threshold):
+        if significant or args.all:
+            print(f"  {name}: {before} -> {after} ({change:+.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
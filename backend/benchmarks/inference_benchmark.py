@@ -0,0 +1,220 @@
+"""
+Disease-detection inference benchmark
+
+Runs process_leaf_image over a folder of sample leaf photos, resized to the
+ESP32-CAM frame sizes, for each combination of runtime (torch device),
+torch thread count and resolution. Reports per-stage latency percentiles
+(decode, detect, preprocess, classify, annotate), images per second,
+latency by detected leaf count and peak RSS.
+
+Usage:
+    python -m benchmarks.inference_benchmark --images data/images/download
+    python -m benchmarks.inference_benchmark --images samples/ --resolutions UXGA VGA --threads 1 2 4
+    python -m benchmarks.inference_benchmark --images samples/ --runtimes cpu cuda --repeat 3
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import percentiles, peak_rss_mb, build_report, write_report, print_summary
+
+logger = logging.getLogger('benchmarks.inference')
+
+# ESP32-CAM frame sizes accepted by ESP32CameraService.capture_image
+FRAME_SIZES = {
+    'UXGA': (1600, 1200),
+    'SXGA': (1280, 1024),
+    'XGA': (1024, 768),
+    'SVGA': (800, 600),
+    'VGA': (640, 480),
+    'CIF': (400, 296)
+}
+STAGES = ('decode', 'detect', 'preprocess', 'classify', 'annotate', 'total')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def list_images(folder: str) -> List[str]:
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def prepare_images(sources: List[str], resolution: str, work_dir: str) -> List[str]:
+    """Resize the sample images to a frame size as JPEG, like the camera sends them"""
+    import cv2
+
+    if resolution == 'original':
+        return sources
+    width, height = FRAME_SIZES[resolution]
+    target_dir = os.path.join(work_dir, resolution)
+    os.makedirs(target_dir, exist_ok=True)
+
+    paths = []
+    for source in sources:
+        image = cv2.imread(source)
+        if image is None:
+            logger.warning(f"Skipping unreadable image {source}")
+            continue
+        resized = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        path = os.path.join(target_dir, os.path.splitext(os.path.basename(source))[0] + '.jpg')
+        cv2.imwrite(path, resized, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        paths.append(path)
+    return paths
+
+
+def use_runtime(runtime: str, threads: int) -> float:
+    """Point the handler at a torch device, reload the models, return load time in ms"""
+    import cv2
+    import torch
+    from app.services.ai_service import handler
+
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    handler.device = torch.device(runtime)
+    handler.yolo_model = None
+    handler.resnet_model = None
+
+    started = time.perf_counter()
+    if not handler.initialize_models():
+        raise RuntimeError('Cannot initialize AI models, check app/services/ai_service/models/')
+    return (time.perf_counter() - started) * 1000
+
+
+def summarize(samples: List[Dict], elapsed: float) -> Dict:
+    """Stage percentiles, throughput and latency by leaf count for one combination"""
+    by_leaves: Dict[int, List[float]] = {}
+    for sample in samples:
+        by_leaves.setdefault(sample.get('leaves', 0), []).append(sample['total'])
+
+    classify_per_leaf = [
+        sample['classify'] / sample['leaves'] for sample in samples if sample.get('leaves')
+    ]
+    return {
+        'images': len(samples),
+        'images_per_second': round(len(samples) / elapsed, 2) if elapsed else None,
+        'stages_ms': {
+            stage: percentiles(sample[stage] for sample in samples if stage in sample)
+            for stage in STAGES
+        },
+        'classify_ms_per_leaf': percentiles(classify_per_leaf),
+        'total_ms_by_leaf_count': {
+            str(count): percentiles(values) for count, values in sorted(by_leaves.items())
+        }
+    }
+
+
+def run_combination(paths: List[str], repeat: int, annotate: bool, work_dir: str) -> Dict:
+    from app.services.ai_service.handler import process_leaf_image
+    from app.services.image_processing import create_predicted_image
+
+    annotated_dir = os.path.join(work_dir, 'predicted')
+    samples = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            timings = {}
+            results = process_leaf_image(path, timings)
+            if annotate:
+                stage_start = time.perf_counter()
+                create_predicted_image(path, results, annotated_dir)
+                timings['annotate'] = (time.perf_counter() - stage_start) * 1000
+                timings['total'] += timings['annotate']
+            samples.append(timings)
+    return summarize(samples, time.perf_counter() - started)
+
+
+def run(args) -> Dict:
+    import torch
+    from app.config import Config
+
+    # create_predicted_image would queue WebP derivatives into the real DERIVATIVE_DIR
+    Config.DERIVATIVES_ENABLED = False
+
+    sources = list_images(args.images)
+    if not sources:
+        raise SystemExit(f"No images found in {args.images}")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='greenhouse-inference-') as work_dir:
+        prepared = {resolution: prepare_images(sources, resolution, work_dir)
+                    for resolution in args.resolutions}
+
+        for runtime in args.runtimes:
+            if runtime == 'cuda' and not torch.cuda.is_available():
+                logger.warning('CUDA is not available, skipping the cuda runtime')
+                continue
+            for threads in args.threads:
+                model_load_ms = use_runtime(runtime, threads)
+                for resolution in args.resolutions:
+                    paths = prepared[resolution]
+                    # Warm-up pass: allocator, cuDNN autotune and YOLO fuse happen here
+                    for path in paths[:args.warmup]:
+                        run_combination([path], 1, False, work_dir)
+
+                    summary = run_combination(paths, args.repeat, not args.no_annotate, work_dir)
+                    summary.update({
+                        'name': f"{runtime}-{threads}t-{resolution}",
+                        'runtime': runtime,
+                        'threads': threads,
+                        'resolution': resolution,
+                        'model_load_ms': round(model_load_ms, 1),
+                        'peak_rss_mb': peak_rss_mb()
+                    })
+                    logger.info(f"{summary['name']}: {summary['images_per_second']} img/s, "
+                                f"total p50={summary['stages_ms']['total']['p50']}ms")
+                    results.append(summary)
+
+    return {
+        'sample_images': len(sources),
+        'combinations': results,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Disease-detection inference benchmark')
+    parser.add_argument('--images', required=True, help='Folder of sample leaf images')
+    parser.add_argument('--resolutions', nargs='+', choices=list(FRAME_SIZES) + ['original'],
+                        default=['UXGA', 'VGA'])
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, os.cpu_count() or 1],
+                        help='torch/OpenCV thread counts to try')
+    parser.add_argument('--runtimes', nargs='+', choices=['cpu', 'cuda'], default=['cpu'],
+                        help='torch devices to try')
+    parser.add_argument('--repeat', type=int, default=1, help='Passes over the image folder')
+    parser.add_argument('--warmup', type=int, default=2, help='Unmeasured images per combination')
+    parser.add_argument('--no-annotate', action='store_true', help='Skip the predicted-image stage')
+    parser.add_argument('--output', help='Report path (default: benchmarks/results/)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    # Per-image timing lines from the handler would drown the summary
+    logging.getLogger('app').setLevel(logging.WARNING)
+    logging.getLogger('ultralytics').setLevel(logging.WARNING)
+
+    results = run(args)
+    config = {k: v for k, v in vars(args).items() if k != 'output'}
+    path = write_report(build_report('inference', config, results), args.output)
+
+    rows = [['combination', 'img/s', 'decode', 'detect', 'preprocess', 'classify', 'annotate', 'total p95']]
+    for combo in results['combinations']:
+        stages = combo['stages_ms']
+        rows.append([combo['name'], combo['images_per_second']] +
+                    [stages[stage]['p50'] for stage in STAGES[:-1]] + [stages['total']['p95']])
+    print_summary(f"Inference benchmark, p50 ms per stage ({results['sample_images']} images, "
+                  f"peak RSS {results['peak_rss_mb']} MB)", rows)
+    print(f"\nReport written to {path}")
+
+
+if __name__ == '__main__':
+    main()
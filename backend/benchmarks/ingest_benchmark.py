@@ -0,0 +1,412 @@
+"""
+Ingest throughput benchmark
+
+A seeded virtual fleet of N greenhouses x M sensors publishes batches on
+greenhouse/sensors/ at R batches per second per greenhouse. Values follow
+diurnal curves, and burst mode multiplies the rate periodically. Batches go
+through the real MQTTClient message path and save_sensor_data, either over
+a broker (e.g. a local mosquitto) or through an in-process stand-in that
+delivers messages straight to the client callback.
+
+Measured: end-to-end throughput, publish-to-commit latency percentiles,
+transport drops, readings that were spooled or failed, and sensor_data rows
+per second seen in the database.
+
+Usage:
+    python -m benchmarks.ingest_benchmark --greenhouses 20 --sensors 4 --rate 2 --duration 60
+    python -m benchmarks.ingest_benchmark --transport broker --broker localhost:1883 --qos 1
+    python -m benchmarks.ingest_benchmark --sink null   # decode/dedup path only, no database
+"""
+
+import os
+import sys
+import math
+import time
+import queue
+import random
+import logging
+import argparse
+import threading
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import percentiles, build_report, write_report, print_summary
+
+logger = logging.getLogger('benchmarks.ingest')
+
+SENSORS_TOPIC = 'greenhouse/sensors/'
+DEVICE_PREFIX = 'bench_gh_'
+SIM_START = datetime(2024, 6, 1, 0, 0, 0)
+
+# base, diurnal amplitude, hour of the daily peak, noise
+SENSOR_PROFILES = {
+    'temperature': (24.0, 6.0, 14, 0.3),
+    'humidity': (70.0, -12.0, 14, 1.0),
+    'soil_moisture': (55.0, -8.0, 16, 0.5),
+    'light_intensity': (4500.0, 4500.0, 13, 150.0)
+}
+
+
+class VirtualFleet:
+    """Deterministic generator of sensor batches for N greenhouses x M sensors"""
+
+    def __init__(self, greenhouses: int, sensors: int, seed: int = 42):
+        self.devices = [f"{DEVICE_PREFIX}{i:03d}" for i in range(greenhouses)]
+        base_types = list(SENSOR_PROFILES)
+        # Sensors beyond the four real types reuse their profiles: temperature_2, ...
+        self.sensor_types = [
+            base_types[i % len(base_types)] + (f"_{i // len(base_types) + 1}" if i >= len(base_types) else '')
+            for i in range(sensors)
+        ]
+        self._rng = random.Random(seed)
+
+    def value(self, sensor_type: str, sim_time: datetime) -> float:
+        profile = SENSOR_PROFILES.get(sensor_type) or SENSOR_PROFILES[sensor_type.rsplit('_', 1)[0]]
+        base, amplitude, peak_hour, noise = profile
+        hour = sim_time.hour + sim_time.minute / 60 + sim_time.second / 3600
+        value = base + amplitude * math.cos(2 * math.pi * (hour - peak_hour) / 24)
+        value += self._rng.gauss(0, noise)
+        if sensor_type.startswith('light_intensity'):
+            value = max(value, 0.0)
+        return round(value, 2)
+
+    def batch(self, device_id: str, sim_time: datetime):
+        from app.models.messages import SensorBatch, SensorReading
+        timestamp = sim_time.isoformat(timespec='microseconds')
+        return SensorBatch(sensors=[
+            SensorReading(type=sensor_type, device_id=device_id,
+                          value=self.value(sensor_type, sim_time), time=timestamp)
+            for sensor_type in self.sensor_types
+        ])
+
+
+class InProcessTransport:
+    """Broker stand-in: a bounded queue drained by delivery threads"""
+
+    def __init__(self, on_message, queue_size: int = 10000, workers: int = 1):
+        self.on_message = on_message
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.drops = 0
+        self._threads = [
+            threading.Thread(target=self._deliver, daemon=True, name=f"BenchDeliver-{i}")
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def publish(self, topic: str, payload: bytes) -> bool:
+        try:
+            self.queue.put_nowait(SimpleNamespace(topic=topic, payload=payload))
+            return True
+        except queue.Full:
+            self.drops += 1
+            return False
+
+    def _deliver(self):
+        while True:
+            message = self.queue.get()
+            if message is None:
+                return
+            self.on_message(None, None, message)
+
+    def close(self):
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+class BrokerTransport:
+    """Publishes to a real MQTT broker"""
+
+    def __init__(self, host: str, port: int, qos: int = 1):
+        import paho.mqtt.client as mqtt
+        self.qos = qos
+        self.drops = 0
+        self.client = mqtt.Client(client_id=f"greenhouse-bench-{os.getpid()}")
+        self.client.connect(host, port, keepalive=60)
+        self.client.loop_start()
+
+    def publish(self, topic: str, payload: bytes) -> bool:
+        import paho.mqtt.client as mqtt
+        result = self.client.publish(topic, payload, qos=self.qos)
+        if result.rc != mqtt.MQTT_ERR_SUCCESS:
+            self.drops += 1
+            return False
+        return True
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+class IngestRecorder:
+    """Wraps save_sensor_data to timestamp commits of benchmark readings"""
+
+    def __init__(self, sink: str):
+        self.sink = sink
+        self.published: Dict[tuple, float] = {}
+        self.latencies_ms: List[float] = []
+        self.committed = 0
+        self.failed = 0
+        self.first_commit = None
+        self.last_commit = None
+        self._lock = threading.Lock()
+
+    def save(self, record):
+        if self.sink == 'db':
+            from app.services.timescale import save_sensor_data
+            try:
+                save_sensor_data(record)
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                raise
+
+        now = time.time()
+        started = self.published.pop((record['device_id'], record['sensor_type'], record['timestamp']), None)
+        with self._lock:
+            self.committed += 1
+            if self.first_commit is None:
+                self.first_commit = now
+            self.last_commit = now
+            if started is not None:
+                self.latencies_ms.append((now - started) * 1000)
+
+
+class RowSampler:
+    """Polls sensor_data for benchmark rows once per second"""
+
+    def __init__(self):
+        from sqlalchemy import text
+        from app.services.timescale import engine
+        self.engine = engine
+        self.query = text(f"SELECT count(*) FROM sensor_data WHERE device_id LIKE '{DEVICE_PREFIX}%'")
+        self.samples = []
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="BenchRowSampler")
+
+    def count(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(self.query).scalar()
+
+    def _run(self):
+        while not self._stop_event.wait(1.0):
+            try:
+                self.samples.append((time.time(), self.count()))
+            except Exception as e:
+                logger.warning(f"Row count failed: {e}")
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def rows_per_second(self) -> Dict:
+        rates = [
+            (b[1] - a[1]) / (b[0] - a[0])
+            for a, b in zip(self.samples, self.samples[1:]) if b[0] > a[0]
+        ]
+        return {
+            'mean': round(sum(rates) / len(rates), 1) if rates else 0,
+            'peak': round(max(rates), 1) if rates else 0
+        }
+
+
+def delete_benchmark_rows():
+    from sqlalchemy import text
+    from app.services.timescale import engine
+    with engine.begin() as conn:
+        result = conn.execute(text(f"DELETE FROM sensor_data WHERE device_id LIKE '{DEVICE_PREFIX}%'"))
+    return result.rowcount
+
+
+def build_consumer(transport: str):
+    """MQTTClient running the real ingest path; in-process mode never connects"""
+    from app.services.mqtt_client import MQTTClient
+
+    if transport == 'inprocess':
+        class StandInClient(MQTTClient):
+            def _setup_client(self):
+                pass
+        return StandInClient(subscribe=False)
+    return MQTTClient(subscribe=True)
+
+
+def run(args) -> Dict:
+    import app.services.mqtt_client as mqtt_client_module
+    from app.config import Config
+    from app.models.messages import encode
+    from app.services.ingest_spool import get_ingest_spool
+
+    if args.transport == 'broker':
+        Config.MQTT_BROKER, Config.MQTT_PORT = args.broker_host, args.broker_port
+
+    fleet = VirtualFleet(args.greenhouses, args.sensors, args.seed)
+    recorder = IngestRecorder(args.sink)
+    spool = get_ingest_spool() if args.sink == 'db' else None
+    spooled_before = spool.appended_total if spool else 0
+
+    sampler = None
+    if args.sink == 'db':
+        removed = delete_benchmark_rows()
+        if removed:
+            logger.info(f"Removed {removed} rows left by a previous run")
+        sampler = RowSampler()
+        sampler.start()
+
+    consumer = None
+    original_save = mqtt_client_module.save_sensor_data
+    if not args.external_consumer:
+        mqtt_client_module.save_sensor_data = recorder.save
+        consumer = build_consumer(args.transport)
+
+    if args.transport == 'inprocess':
+        transport = InProcessTransport(consumer._on_message, args.queue_size, args.delivery_threads)
+    else:
+        transport = BrokerTransport(args.broker_host, args.broker_port, args.qos)
+        time.sleep(1)  # let the consumer subscribe
+
+    readings_per_batch = len(fleet.sensor_types)
+    published_messages = 0
+    published_readings = 0
+    max_lag = 0.0
+
+    def rate_at(elapsed: float) -> float:
+        if args.burst_every and (elapsed % args.burst_every) < args.burst_seconds:
+            return args.rate * args.burst_multiplier
+        return args.rate
+
+    logger.info(f"Publishing {args.greenhouses} greenhouses x {readings_per_batch} sensors "
+                f"at {args.rate}/s for {args.duration}s via {args.transport}")
+    started = time.time()
+    next_tick = started
+    while True:
+        now = time.time()
+        elapsed = now - started
+        if elapsed >= args.duration:
+            break
+        max_lag = max(max_lag, now - next_tick)
+
+        sim_time = SIM_START + timedelta(seconds=elapsed * args.time_scale)
+        for device_id in fleet.devices:
+            batch = fleet.batch(device_id, sim_time)
+            published_at = time.time()
+            for reading in batch.sensors:
+                recorder.published[(reading.device_id, reading.type, reading.time)] = published_at
+            if transport.publish(SENSORS_TOPIC, encode(batch)):
+                published_messages += 1
+                published_readings += readings_per_batch
+
+        next_tick += 1.0 / rate_at(elapsed)
+        delay = next_tick - time.time()
+        if delay > 0:
+            time.sleep(delay)
+    publish_seconds = time.time() - started
+
+    # Drain: wait until every published reading is committed or the timeout passes
+    deadline = time.time() + args.drain_timeout
+    while time.time() < deadline:
+        if args.external_consumer:
+            if sampler and sampler.count() >= published_readings:
+                break
+        elif recorder.committed + recorder.failed >= published_readings:
+            break
+        time.sleep(0.2)
+
+    transport.close()
+    mqtt_client_module.save_sensor_data = original_save
+
+    db_rows = None
+    if sampler:
+        sampler.stop()
+        final_rows = sampler.count()
+        db_rows = {'final': final_rows, 'rows_per_second': sampler.rows_per_second()}
+        if not args.keep_rows:
+            delete_benchmark_rows()
+
+    spooled = (spool.appended_total - spooled_before) if spool else 0
+    committed = db_rows['final'] if args.external_consumer and db_rows else recorder.committed
+    end = recorder.last_commit or time.time()
+    ingest_seconds = max(end - started, 1e-9)
+
+    return {
+        'publish_seconds': round(publish_seconds, 2),
+        'published_messages': published_messages,
+        'published_readings': published_readings,
+        'publish_rate_readings_per_s': round(published_readings / publish_seconds, 1),
+        'max_publisher_lag_ms': round(max_lag * 1000, 1),
+        'transport_drops': transport.drops,
+        'committed_readings': committed,
+        'spooled_readings': spooled,
+        'failed_readings': recorder.failed,
+        'dropped_readings': max(published_readings - committed - recorder.failed, 0),
+        'throughput_readings_per_s': round(committed / ingest_seconds, 1),
+        'commit_latency_ms': percentiles(recorder.latencies_ms),
+        'db_rows': db_rows,
+        'dedup': consumer.deduplicator.get_stats() if consumer else None
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Greenhouse ingest throughput benchmark')
+    parser.add_argument('--greenhouses', type=int, default=10, help='Number of virtual greenhouses (N)')
+    parser.add_argument('--sensors', type=int, default=4, help='Sensors per greenhouse (M)')
+    parser.add_argument('--rate', type=float, default=1.0, help='Batches per second per greenhouse (R)')
+    parser.add_argument('--duration', type=float, default=30, help='Publishing time in seconds')
+    parser.add_argument('--burst-multiplier', type=float, default=5.0, help='Rate multiplier during bursts')
+    parser.add_argument('--burst-every', type=float, default=0, help='Seconds between bursts (0 disables bursts)')
+    parser.add_argument('--burst-seconds', type=float, default=5, help='Length of each burst in seconds')
+    parser.add_argument('--time-scale', type=float, default=60.0,
+                        help='Simulated seconds per real second for the diurnal curves')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--transport', choices=['inprocess', 'broker'], default='inprocess')
+    parser.add_argument('--broker', default='localhost:1883', help='host:port for --transport broker')
+    parser.add_argument('--qos', type=int, choices=[0, 1, 2], default=1)
+    parser.add_argument('--queue-size', type=int, default=10000, help='In-process queue size (overflow is dropped)')
+    parser.add_argument('--delivery-threads', type=int, default=1,
+                        help='In-process delivery threads (paho uses one network thread)')
+    parser.add_argument('--sink', choices=['db', 'null'], default='db',
+                        help='null skips save_sensor_data to measure the decode/dedup path alone')
+    parser.add_argument('--external-consumer', action='store_true',
+                        help='Only publish; rows are ingested by running ingest_worker.py processes')
+    parser.add_argument('--drain-timeout', type=float, default=60)
+    parser.add_argument('--keep-rows', action='store_true', help='Keep benchmark rows in sensor_data')
+    parser.add_argument('--output', help='Report path (default: benchmarks/results/)')
+    args = parser.parse_args(argv)
+
+    host, _, port = args.broker.partition(':')
+    args.broker_host, args.broker_port = host, int(port or 1883)
+    if args.external_consumer and (args.transport != 'broker' or args.sink != 'db'):
+        parser.error('--external-consumer requires --transport broker and --sink db')
+    return args
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # Per-reading ingest logs would dominate the measurement
+    logging.getLogger('app').setLevel(logging.WARNING)
+
+    args = parse_args(argv)
+    results = run(args)
+    config = {k: v for k, v in vars(args).items() if k not in ('output', 'broker_host', 'broker_port')}
+    path = write_report(build_report('ingest', config, results), args.output)
+
+    latency = results['commit_latency_ms']
+    print_summary('Ingest benchmark', [
+        ['published readings', results['published_readings']],
+        ['committed readings', results['committed_readings']],
+        ['dropped / spooled / failed', f"{results['dropped_readings']} / {results['spooled_readings']} / {results['failed_readings']}"],
+        ['throughput (readings/s)', results['throughput_readings_per_s']],
+        ['commit latency p50/p95/p99 (ms)', f"{latency['p50']} / {latency['p95']} / {latency['p99']}"],
+    ])
+    print(f"\nReport written to {path}")
+
+
+if __name__ == '__main__':
+    main()
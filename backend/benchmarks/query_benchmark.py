@@ -0,0 +1,283 @@
+"""
+Query-path benchmark over the synthetic sensor dataset
+
+Hits the sensor read endpoints and query_sensor_data for day, week, month
+and year ranges. Each case runs in two modes. ``cold`` clears the in-memory
+application cache before every request; PostgreSQL buffers stay warm after
+the first run. ``cached`` warms the cache once and then measures repeats.
+
+Reported per case: latency percentiles, status codes, response bytes, and
+the rows scanned by the case's SQL statements. Rows scanned are taken from
+EXPLAIN (ANALYZE, FORMAT JSON) of the statements the request actually ran.
+
+Requests run in process through the Flask test client by default, or
+against a running server with --base-url (rows scanned needs in-process
+mode).
+
+Usage:
+    python -m benchmarks.sensor_dataset --years 2 --devices 5
+    python -m benchmarks.query_benchmark --iterations 20
+    python -m benchmarks.query_benchmark --only visualization --ranges year
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import percentiles, build_report, write_report, print_summary
+
+logger = logging.getLogger('benchmarks.query')
+
+RANGES = ('day', 'week', 'month', 'year')
+# /api/sensors and /api/sensors/stats take an interval instead of a named range
+RANGE_INTERVALS = {'day': '24h', 'week': '7d', 'month': '30d', 'year': '365d'}
+MODES = ('cold', 'cached')
+# Jobs create_app() would otherwise start in the benchmark process
+BACKGROUND_JOB_FLAGS = ('RETENTION_ENABLED', 'STORAGE_RECONCILE_ENABLED',
+                        'DEVICE_COMMAND_DISPATCHER_ENABLED', 'AUTO_CAPTURE_ENABLED')
+
+
+def build_cases(ranges, only=None) -> List[Dict]:
+    """Endpoint x range matrix; ``target`` is a URL or a callable"""
+    from app.services.timescale import query_sensor_data
+
+    cases = []
+    for name in ranges:
+        interval = RANGE_INTERVALS[name]
+        cases.extend([
+            {'name': f"sensors_{name}", 'group': 'sensors', 'range': name,
+             'target': f"/api/sensors?start_time={interval}"},
+            {'name': f"sensors_stats_{name}", 'group': 'stats', 'range': name,
+             'target': f"/api/sensors/stats?sensor_type=temperature&period={interval}"},
+            {'name': f"visualization_{name}", 'group': 'visualization', 'range': name,
+             'target': f"/api/sensors/visualization?range={name}"},
+            {'name': f"query_sensor_data_{name}", 'group': 'query_sensor_data', 'range': name,
+             'target': lambda interval=interval: query_sensor_data(start_time=interval)},
+        ])
+    cases.append({'name': 'dashboard_overview', 'group': 'dashboard', 'range': None,
+                  'target': '/api/dashboard/overview'})
+
+    if only:
+        cases = [case for case in cases if case['group'] in only]
+    return cases
+
+
+class StatementCapture:
+    """Collects the SQL statements run by the current thread"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def start(self):
+        self._local.statements = []
+
+    def stop(self) -> List[tuple]:
+        statements = getattr(self._local, 'statements', None) or []
+        self._local.statements = None
+        return statements
+
+    def observe(self, statement, parameters, seconds, call_site):
+        statements = getattr(self._local, 'statements', None)
+        if statements is not None and not statement.lstrip().lower().startswith('explain'):
+            statements.append((statement, parameters))
+
+
+def rows_scanned(plan: Dict) -> int:
+    """Rows read by scan nodes, including rows discarded by their filters"""
+    total = 0
+    if 'Relation Name' in plan:
+        loops = plan.get('Actual Loops', 1)
+        total += (plan.get('Actual Rows', 0) + plan.get('Rows Removed by Filter', 0)) * loops
+    for child in plan.get('Plans', []):
+        total += rows_scanned(child)
+    return total
+
+
+def explain_rows_scanned(engine, statements: List[tuple]) -> Optional[int]:
+    """Sum of rows scanned over EXPLAIN ANALYZE of each SELECT"""
+    if engine.dialect.name != 'postgresql':
+        return None
+    total = 0
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for statement, parameters in statements:
+            if not statement.lstrip().lower().startswith(('select', 'with')):
+                continue
+            cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {statement}", parameters or None)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            total += rows_scanned(plan[0]['Plan'])
+        cursor.close()
+    finally:
+        raw.rollback()
+        raw.close()
+    return total
+
+
+class InProcessRunner:
+    """Runs requests through the Flask test client"""
+
+    def __init__(self):
+        from app import create_app
+        from app.config import Config
+        # Background jobs would delete/recompress data and compete for CPU with the measured requests
+        for flag in BACKGROUND_JOB_FLAGS:
+            setattr(Config, flag, False)
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self._request_number = 0
+
+    def call(self, target) -> tuple:
+        if callable(target):
+            with self.app.app_context():
+                result = target()
+            return 200, len(json.dumps(result, default=str).encode())
+
+        # A distinct client address per request keeps per-IP rate limits out of the numbers
+        self._request_number += 1
+        address = f"10.{(self._request_number >> 16) & 255}.{(self._request_number >> 8) & 255}.{self._request_number & 255}"
+        response = self.client.get(target, environ_base={'REMOTE_ADDR': address})
+        return response.status_code, len(response.data)
+
+
+class HttpRunner:
+    """Runs requests against a running server"""
+
+    def __init__(self, base_url: str):
+        import requests
+        self.session = requests.Session()
+        self.base_url = base_url.rstrip('/')
+
+    def call(self, target) -> tuple:
+        if callable(target):
+            raise ValueError('Function cases need in-process mode')
+        response = self.session.get(self.base_url + target)
+        return response.status_code, len(response.content)
+
+
+def clear_app_cache():
+    from app.services.cache_service import clear_cache
+    clear_cache()
+
+
+def run_case(runner, case: Dict, mode: str, iterations: int, capture: Optional[StatementCapture],
+             engine=None) -> Dict:
+    latencies = []
+    sizes = []
+    statuses: Dict[str, int] = {}
+    statements = []
+
+    if mode == 'cached':
+        clear_app_cache()
+        runner.call(case['target'])  # warm the cache, not measured
+
+    for iteration in range(iterations):
+        if mode == 'cold':
+            clear_app_cache()
+        if capture and iteration == 0:
+            capture.start()
+        started = time.perf_counter()
+        status, size = runner.call(case['target'])
+        latencies.append((time.perf_counter() - started) * 1000)
+        if capture and iteration == 0:
+            statements = capture.stop()
+        sizes.append(size)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    scanned = None
+    if engine is not None and statements:
+        try:
+            scanned = explain_rows_scanned(engine, statements)
+        except Exception as e:
+            logger.warning(f"EXPLAIN failed for {case['name']}: {e}")
+
+    return {
+        'name': f"{case['name']}:{mode}",
+        'case': case['name'],
+        'range': case['range'],
+        'mode': mode,
+        'latency_ms': percentiles(latencies),
+        'status_codes': statuses,
+        'response_bytes': round(sum(sizes) / len(sizes)) if sizes else 0,
+        'statements': len(statements),
+        'rows_scanned': scanned
+    }
+
+
+def run(args) -> Dict:
+    from app.services.timescale import engine
+    from benchmarks.sensor_dataset import describe_dataset
+
+    capture = None
+    if args.base_url:
+        runner = HttpRunner(args.base_url)
+    else:
+        from app.services.metrics import instrument_sqlalchemy, add_query_observer
+        runner = InProcessRunner()
+        if not args.no_explain:
+            capture = StatementCapture()
+            instrument_sqlalchemy()
+            add_query_observer(capture.observe)
+
+    cases = build_cases(args.ranges, args.only)
+    if args.base_url:
+        cases = [case for case in cases if not callable(case['target'])]
+
+    results = []
+    for case in cases:
+        for mode in args.modes:
+            result = run_case(runner, case, mode, args.iterations, capture,
+                              engine if capture else None)
+            logger.info(f"{result['name']}: p50={result['latency_ms']['p50']}ms "
+                        f"p95={result['latency_ms']['p95']}ms rows_scanned={result['rows_scanned']}")
+            results.append(result)
+
+    return {
+        'dataset': describe_dataset(engine),
+        'cases': results
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Greenhouse query-path benchmark')
+    parser.add_argument('--iterations', type=int, default=10, help='Measured requests per case and mode')
+    parser.add_argument('--ranges', nargs='+', choices=RANGES, default=list(RANGES))
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--only', nargs='+',
+                        choices=['sensors', 'stats', 'visualization', 'query_sensor_data', 'dashboard'],
+                        help='Only run these endpoint groups')
+    parser.add_argument('--base-url', help='Benchmark a running server instead of an in-process app')
+    parser.add_argument('--no-explain', action='store_true', help='Skip rows-scanned measurement')
+    parser.add_argument('--output', help='Report path (default: benchmarks/results/)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    logging.getLogger('app').setLevel(logging.WARNING)
+
+    results = run(args)
+    config = {k: v for k, v in vars(args).items() if k != 'output'}
+    path = write_report(build_report('query', config, results), args.output)
+
+    rows = [['case', 'p50 ms', 'p95 ms', 'p99 ms', 'bytes', 'rows scanned']]
+    for case in results['cases']:
+        latency = case['latency_ms']
+        rows.append([case['name'], latency['p50'], latency['p95'], latency['p99'],
+                     case['response_bytes'], case['rows_scanned']])
+    print_summary(f"Query benchmark ({results['dataset']['rows']} synthetic rows)", rows)
+    print(f"\nReport written to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Synthetic multi-year sensor_data generator
+
+Bulk-loads readings for ``--devices`` greenhouses with the four real sensor
+types, one reading per ``--interval`` seconds, ending now and reaching back
+``--years`` years. Values follow the same diurnal curves as the ingest
+benchmark plus a seasonal swing. Rows are streamed through COPY, one day at
+a time, so memory stays flat for any size.
+
+Rows use device ids starting with ``bench_q_`` and can be removed with
+``--drop``. Use a dedicated database: the dashboard and visualization
+endpoints aggregate over all devices.
+
+Usage:
+    python -m benchmarks.sensor_dataset --years 3 --devices 5 --interval 300
+    python -m benchmarks.sensor_dataset --drop
+"""
+
+import os
+import io
+import sys
+import math
+import time
+import random
+import logging
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ingest_benchmark import SENSOR_PROFILES
+
+logger = logging.getLogger('benchmarks.dataset')
+
+DEVICE_PREFIX = 'bench_q_'
+
+
+class _CopyStream(io.RawIOBase):
+    """File-like object feeding generated COPY lines to psycopg2"""
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._lines, None)
+            if chunk is None:
+                break
+            self._buffer += chunk.encode()
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def generate_day(day_start: datetime, devices: List[str], interval: int, rng: random.Random,
+                 until: datetime) -> Iterator[str]:
+    """COPY lines for one day of readings, chunked per device"""
+    day_of_year = day_start.timetuple().tm_yday
+    # Warmer and brighter mid-year, +-4 units around the daily curve
+    season = math.sin(2 * math.pi * (day_of_year - 100) / 365)
+    steps = 86400 // interval
+
+    for device_id in devices:
+        lines = []
+        for step in range(steps):
+            moment = day_start + timedelta(seconds=step * interval)
+            if moment >= until:
+                break
+            hour = step * interval / 3600
+            timestamp = moment.isoformat()
+            for sensor_type, (base, amplitude, peak_hour, noise) in SENSOR_PROFILES.items():
+                value = base + amplitude * math.cos(2 * math.pi * (hour - peak_hour) / 24)
+                value += 4 * season * (1 if amplitude >= 0 else -1) + rng.gauss(0, noise)
+                if sensor_type == 'light_intensity':
+                    value = max(value, 0.0)
+                lines.append(f"{timestamp}\t{device_id}\t{sensor_type}\t{value:.2f}\n")
+        yield ''.join(lines)
+
+
+def drop_dataset(engine) -> int:
+    from sqlalchemy import text
+    with engine.begin() as conn:
+        result = conn.execute(text(f"DELETE FROM sensor_data WHERE device_id LIKE '{DEVICE_PREFIX}%'"))
+    return result.rowcount
+
+
+def load_dataset(engine, years: float, devices: int, interval: int, seed: int = 42) -> Dict:
+    """Replace the synthetic dataset and return load statistics"""
+    from sqlalchemy import text
+
+    device_ids = [f"{DEVICE_PREFIX}{i:03d}" for i in range(devices)]
+    rng = random.Random(seed)
+    end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    first_day = (end - timedelta(days=round(365 * years))).replace(hour=0, minute=0)
+    total_days = (end - first_day).days + 1
+
+    removed = drop_dataset(engine)
+    if removed:
+        logger.info(f"Removed {removed} rows from a previous dataset")
+
+    started = time.time()
+    rows = 0
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for day in range(total_days):
+            day_start = first_day + timedelta(days=day)
+            if day_start >= end:
+                break
+            stream = _CopyStream(generate_day(day_start, device_ids, interval, rng, end))
+            cursor.copy_expert(
+                "COPY sensor_data (time, device_id, sensor_type, value) FROM STDIN", stream
+            )
+            rows += cursor.rowcount
+            raw.commit()
+            if day % 30 == 0:
+                logger.info(f"Loaded {day_start.date()} ({rows} rows, {rows / (time.time() - started):.0f} rows/s)")
+        cursor.close()
+    finally:
+        raw.close()
+
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level='AUTOCOMMIT').execute(text("ANALYZE sensor_data"))
+
+    elapsed = time.time() - started
+    return {
+        'rows': rows,
+        'devices': devices,
+        'interval_seconds': interval,
+        'first_time': first_day.isoformat(),
+        'last_time': end.isoformat(),
+        'load_seconds': round(elapsed, 1),
+        'rows_per_second': round(rows / elapsed) if elapsed else None
+    }
+
+
+def describe_dataset(engine) -> Dict:
+    """Row count and time span of the synthetic dataset"""
+    from sqlalchemy import text
+    with engine.connect() as conn:
+        row = conn.execute(text(f"""
+            SELECT count(*) AS rows, count(DISTINCT device_id) AS devices,
+                   min(time) AS first_time, max(time) AS last_time
+            FROM sensor_data WHERE device_id LIKE '{DEVICE_PREFIX}%'
+        """)).one()
+        total = conn.execute(text("SELECT count(*) FROM sensor_data")).scalar()
+    return {
+        'rows': row.rows,
+        'devices': row.devices,
+        'first_time': row.first_time.isoformat() if row.first_time else None,
+        'last_time': row.last_time.isoformat() if row.last_time else None,
+        'sensor_data_rows': total
+    }
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Load synthetic multi-year sensor data')
+    parser.add_argument('--years', type=float, default=1, help='Years of history to generate (1-3)')
+    parser.add_argument('--devices', type=int, default=3, help='Number of greenhouses')
+    parser.add_argument('--interval', type=int, default=300, help='Seconds between readings')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--drop', action='store_true', help='Only remove the synthetic dataset')
+    args = parser.parse_args(argv)
+
+    from app.services.timescale import engine
+
+    if args.drop:
+        print(f"Removed {drop_dataset(engine)} rows")
+        return
+    if not 0 < args.years <= 3:
+        parser.error('--years must be between 0 and 3')
+    if 86400 % args.interval:
+        parser.error('--interval must divide a day evenly')
+
+    stats = load_dataset(engine, args.years, args.devices, args.interval, args.seed)
+    print(f"Loaded {stats['rows']} rows in {stats['load_seconds']}s ({stats['rows_per_second']} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
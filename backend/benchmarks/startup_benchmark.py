@@ -0,0 +1,160 @@
+"""
+API worker startup benchmark
+
+Starts fresh interpreters that import the app and its blueprints and then
+call create_app(), the same work a gunicorn worker does before serving.
+Reports import and create_app time, RSS, the slowest imports and whether
+any of the ML modules (torch, ultralytics, cv2, ...) were loaded.
+
+Exits with status 1 when a budget is exceeded or an ML module was
+imported, so it can guard CI against startup regressions.
+
+Usage:
+    python -m benchmarks.startup_benchmark
+    python -m benchmarks.startup_benchmark --runs 10 --max-seconds 1.0 --max-rss-mb 150
+    python -m benchmarks.startup_benchmark --import-only   # no database needed
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import percentiles, build_report, write_report, print_summary
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; prints one JSON line
+CHILD_SCRIPT = r"""
+import sys, json, time
+started = time.perf_counter()
+import app
+from app.api import sensors, images, monitoring, control, devices, dashboard, scheduler, notifications, configurations
+from app.api.disease_detection import bp
+imported = time.perf_counter()
+
+error = None
+if not IMPORT_ONLY:
+    try:
+        app.create_app()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}".splitlines()[0]
+created = time.perf_counter()
+
+from app.services.inference import HEAVY_MODULES
+from benchmarks.common import peak_rss_mb
+print(json.dumps({
+    'import_seconds': imported - started,
+    'create_app_seconds': None if IMPORT_ONLY else created - imported,
+    'total_seconds': created - started,
+    'peak_rss_mb': peak_rss_mb(),
+    'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules],
+    'modules': len(sys.modules),
+    'error': error
+}))
+"""
+
+
+def parse_importtime(stderr: str, limit: int = 10) -> List[Dict]:
+    """Slowest top-level imports from ``python -X importtime`` output"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Only top-level entries: nested imports are indented under their parent
+        if name.startswith('  '):
+            continue
+        entries.append({'module': name.strip(), 'cumulative_ms': round(int(cumulative_us) / 1000, 1)})
+    return sorted(entries, key=lambda entry: entry['cumulative_ms'], reverse=True)[:limit]
+
+
+def run_child(import_only: bool, importtime: bool = False) -> Dict:
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', f"IMPORT_ONLY = {import_only!r}\n" + CHILD_SCRIPT]
+
+    completed = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True, timeout=300)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup child failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if importtime:
+        result['slowest_imports'] = parse_importtime(completed.stderr)
+    return result
+
+
+def run(args) -> Dict:
+    runs = [run_child(args.import_only) for _ in range(args.runs)]
+    profile = run_child(args.import_only, importtime=True)
+
+    def seconds(key):
+        values = [r[key] * 1000 for r in runs if r[key] is not None]
+        return percentiles(values)
+
+    return {
+        'runs': args.runs,
+        'import_ms': seconds('import_seconds'),
+        'create_app_ms': seconds('create_app_seconds'),
+        'total_ms': seconds('total_seconds'),
+        'peak_rss_mb': percentiles(r['peak_rss_mb'] for r in runs),
+        'modules_loaded': runs[-1]['modules'],
+        'heavy_modules': sorted({name for r in runs for name in r['heavy_modules']}),
+        'create_app_error': runs[-1]['error'],
+        'slowest_imports': profile['slowest_imports']
+    }
+
+
+def check_budgets(results: Dict, max_seconds: float, max_rss_mb: float) -> List[str]:
+    """Human-readable budget violations, empty when startup is within budget"""
+    problems = []
+    if results['heavy_modules']:
+        problems.append(f"ML modules imported at startup: {', '.join(results['heavy_modules'])}")
+    if max_seconds and results['total_ms']['p50'] > max_seconds * 1000:
+        problems.append(f"startup p50 {results['total_ms']['p50']}ms exceeds {max_seconds * 1000:.0f}ms")
+    if max_rss_mb and results['peak_rss_mb']['max'] > max_rss_mb:
+        problems.append(f"peak RSS {results['peak_rss_mb']['max']}MB exceeds {max_rss_mb}MB")
+    return problems
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='API worker startup benchmark')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start')
+    parser.add_argument('--import-only', action='store_true', help='Skip create_app() (no database needed)')
+    parser.add_argument('--max-seconds', type=float, default=1.0, help='Budget for p50 startup time (0 disables)')
+    parser.add_argument('--max-rss-mb', type=float, default=200, help='Budget for peak RSS (0 disables)')
+    parser.add_argument('--output', help='Report path (default: benchmarks/results/)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    problems = check_budgets(results, args.max_seconds, args.max_rss_mb)
+    results['budget_violations'] = problems
+
+    config = {k: v for k, v in vars(args).items() if k != 'output'}
+    path = write_report(build_report('startup', config, results), args.output)
+
+    rows = [['phase', 'p50 ms', 'p95 ms', 'max ms']]
+    for phase in ('import_ms', 'create_app_ms', 'total_ms'):
+        rows.append([phase[:-3], results[phase]['p50'], results[phase]['p95'], results[phase]['max']])
+    print_summary(f"Startup benchmark ({args.runs} runs, peak RSS {results['peak_rss_mb']['max']} MB, "
+                  f"{results['modules_loaded']} modules)", rows)
+    print_summary('Slowest imports', [['module', 'cumulative ms']] +
+                  [[entry['module'], entry['cumulative_ms']] for entry in results['slowest_imports']])
+    if results['create_app_error']:
+        print(f"\ncreate_app() failed: {results['create_app_error']}")
+    print(f"\nReport written to {path}")
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Standalone disease-detection inference server
+
+Loads the YOLO and ResNet models once and serves every API worker on this
+host over a local socket, batching requests that arrive together. Point
+the API at it with INFERENCE_SERVER_ADDRESS (same value as --address);
+both sides need the same INFERENCE_AUTHKEY.
+
+Usage:
+    python inference_server.py --address /tmp/greenhouse-inference.sock
+    python inference_server.py --address 127.0.0.1:7070 --max-batch 16 --batch-wait-ms 30
+"""
+
+import os
+import signal
+import logging
+import argparse
+import threading
+
+# Force UTF-8 encoding for Windows console
+os.environ['PYTHONIOENCODING'] = 'utf-8'
+
+
+def main():
+    from app.config import Config
+
+    parser = argparse.ArgumentParser(description='Greenhouse disease-detection inference server')
+    parser.add_argument('--address', default=Config.INFERENCE_SERVER_ADDRESS or '/tmp/greenhouse-inference.sock',
+                        help='Unix socket path or host:port')
+    parser.add_argument('--max-batch', type=int, default=Config.INFERENCE_MAX_BATCH,
+                        help='Largest batch run in one forward pass')
+    parser.add_argument('--batch-wait-ms', type=float, default=Config.INFERENCE_BATCH_WAIT_MS,
+                        help='How long to wait for more requests before running a batch')
+    parser.add_argument('--threads', type=int, default=None, help='torch intra-op threads')
+    args = parser.parse_args()
+
+    from app.utils.logging import start_queue_logging
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s - inference - %(name)s - %(levelname)s - %(message)s'))
+    start_queue_logging([handler], queue_size=Config.LOG_QUEUE_SIZE, level=logging.INFO)
+    logger = logging.getLogger('inference_server')
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    from app.services.inference_server import InferenceServer
+    server = InferenceServer(args.address, Config.INFERENCE_AUTHKEY.encode(),
+                             max_batch=args.max_batch, batch_wait_ms=args.batch_wait_ms)
+    server.start()
+
+    def shutdown(*_):
+        logger.info(f"Stopping inference server: {server.get_stats()}")
+        server.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    # Report batching stats periodically, the server has no HTTP endpoint
+    stop_event = threading.Event()
+    def report():
+        while not stop_event.wait(60):
+            logger.info(f"Inference stats: {server.get_stats()}")
+    threading.Thread(target=report, daemon=True).start()
+
+    server.serve_forever()
+    stop_event.set()
+
+
+if __name__ == '__main__':
+    main()
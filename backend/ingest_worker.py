@@ -0,0 +1,110 @@
+"""
+Standalone MQTT ingest worker
+
+Consumes greenhouse/sensors/ and greenhouse/devices/ through an MQTT v5
+shared subscription ($share/<group>/...). The broker delivers each message to
+exactly one member of the group, so running more workers spreads the load
+without duplicate database writes. Flask workers stay publish-only.
+
+Usage:
+    python ingest_worker.py --workers 4
+"""
+
+import os
+import sys
+import signal
+import socket
+import logging
+import argparse
+import threading
+import multiprocessing
+
+# Force UTF-8 encoding for Windows console
+os.environ['PYTHONIOENCODING'] = 'utf-8'
+
+
+def run_worker(index, group):
+    """Run one ingest consumer until SIGTERM/SIGINT"""
+    import paho.mqtt.client as mqtt
+    from app.config import Config
+    from app.utils.logging import start_queue_logging, LogRateLimitFilter
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(
+        f'%(asctime)s - ingest[{index}] - %(name)s - %(levelname)s - %(message)s'
+    ))
+    start_queue_logging([handler], queue_size=Config.LOG_QUEUE_SIZE, level=logging.INFO)
+    for name in Config.LOG_RATE_LIMITED_LOGGERS:
+        logging.getLogger(name.strip()).addFilter(LogRateLimitFilter(Config.LOG_RATE_LIMIT))
+    logger = logging.getLogger('ingest_worker')
+
+    from app.services.mqtt_client import MQTTClient
+    from app.services.ingest_spool import open_ingest_spool
+
+    # Each worker owns its spool file so only one process replays a given row
+    base, ext = os.path.splitext(Config.INGEST_SPOOL_PATH)
+    open_ingest_spool(f"{base}-{index}{ext}")
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    client_id = f"greenhouse-ingest-{socket.gethostname()}-{index}"
+    client = MQTTClient(
+        subscribe=True,
+        share_group=group,
+        client_id=client_id,
+        protocol=mqtt.MQTTv5
+    )
+    logger.info(f"Ingest worker {client_id} consuming via $share/{group}/")
+
+    # Report dedup metrics periodically, workers have no HTTP endpoint
+    while not stop_event.wait(60):
+        logger.info(f"Dedup stats: {client.deduplicator.get_stats()}")
+
+    client.client.loop_stop()
+    client.client.disconnect()
+    logger.info(f"Ingest worker {client_id} stopped")
+
+
+def main():
+    from app.config import Config
+
+    parser = argparse.ArgumentParser(description='Greenhouse MQTT ingest worker')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of ingest processes to run (default: 1)')
+    parser.add_argument('--group', default=Config.MQTT_SHARE_GROUP,
+                        help='Shared subscription group name')
+    parser.add_argument('--index', type=int, default=None,
+                        help='Run a single worker with this index (for supervisor/systemd)')
+    args = parser.parse_args()
+
+    if args.index is not None:
+        run_worker(args.index, args.group)
+        return
+
+    # Spawn so every worker builds its own DB engine and MQTT connection
+    ctx = multiprocessing.get_context('spawn')
+    processes = [
+        ctx.Process(target=run_worker, args=(index, args.group), name=f"ingest-{index}")
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def shutdown(*_):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for process in processes:
+        process.join()
+
+    sys.exit(max((process.exitcode or 0) for process in processes))
+
+
+if __name__ == '__main__':
+    main()
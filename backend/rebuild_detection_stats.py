@@ -0,0 +1,52 @@
+"""
+Rebuild daily detection statistics from detection_history
+
+Backfills detection_statistics for data recorded before the rollups were
+maintained incrementally, or repairs them after manual edits. By default
+days older than the retention horizon are left alone, because their
+detection_history rows may already have been purged.
+
+Usage:
+    python rebuild_detection_stats.py                 # from the retention horizon to today
+    python rebuild_detection_stats.py --since 2025-06-01 --until 2025-06-30
+    python rebuild_detection_stats.py --all           # every day with history rows
+"""
+
+import os
+import argparse
+from datetime import date, datetime, timedelta
+
+# Force UTF-8 encoding for Windows console
+os.environ['PYTHONIOENCODING'] = 'utf-8'
+
+
+def parse_date(value: str) -> date:
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main():
+    from app.config import Config
+
+    parser = argparse.ArgumentParser(description='Rebuild detection_statistics from detection_history')
+    parser.add_argument('--since', type=parse_date, help='First day to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--until', type=parse_date, help='Last day to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--all', action='store_true', help='Rebuild every day, ignoring the retention horizon')
+    args = parser.parse_args()
+
+    since = args.since
+    horizons = [days for days in (Config.RETENTION_HEALTHY_DAYS, Config.RETENTION_DETECTION_DAYS) if days > 0]
+    if since is None and not args.all and Config.RETENTION_ENABLED and horizons:
+        since = datetime.utcnow().date() - timedelta(days=min(horizons) - 1)
+
+    from app import create_app
+    from app.services.detection_stats import rebuild_statistics
+
+    app = create_app()
+    with app.app_context():
+        days = rebuild_statistics(since, args.until)
+    print(f"Rebuilt {days} days of detection statistics"
+          f" ({since.isoformat() if since else 'beginning'} .. {args.until.isoformat() if args.until else 'today'})")
+
+
+if __name__ == '__main__':
+    main()
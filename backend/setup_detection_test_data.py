@@ -9,6 +9,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import create_app, db
 from app.models.detection_history import DetectionHistory, DetectionStatistics
+from app.services.detection_stats import rebuild_statistics
 from datetime import datetime, date, timedelta
 import json
 import random
@@ -96,49 +97,14 @@ def create_sample_detection_history():
         db.session.rollback()
 
 def create_sample_statistics():
-    """Tạo sample statistics data"""
+    """Tính statistics từ sample detection history"""
     print("🔄 Creating sample statistics...")
     
-    # Tạo statistics cho 7 ngày qua
-    for i in range(7):
-        stat_date = date.today() - timedelta(days=i)
-        
-        # Random data với xu hướng realistic
-        total = random.randint(2, 8)
-        automatic = random.randint(1, total)
-        manual = total - automatic
-        diseases = random.randint(0, total//2)
-        healthy = total - diseases
-        
-        # Severity distribution
-        high_sev = random.randint(0, diseases)
-        medium_sev = random.randint(0, diseases - high_sev)
-        low_sev = diseases - high_sev - medium_sev
-        
-        statistic = DetectionStatistics(
-            date=stat_date,
-            total_detections=total,
-            automatic_detections=automatic,
-            manual_detections=manual,
-            diseases_detected=diseases,
-            healthy_detections=healthy,
-            high_severity_count=high_sev,
-            medium_severity_count=medium_sev,
-            low_severity_count=low_sev,
-            camera_online_count=automatic,
-            camera_offline_count=manual,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
-        )
-        
-        db.session.add(statistic)
-    
     try:
-        db.session.commit()
-        print("✅ Sample statistics created successfully!")
+        days = rebuild_statistics()
+        print(f"✅ Sample statistics created successfully! ({days} days)")
     except Exception as e:
         print(f"❌ Error creating statistics: {e}")
-        db.session.rollback()
 
 def clear_existing_data():
     """Clear existing test data"""
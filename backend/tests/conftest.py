@@ -0,0 +1,32 @@
+import pytest
+from flask import Flask
+from app import db
+from app.config import Config
+from app.models.blob import Blob
+from app.models.image import ImageMetadata
+from app.models.storage_usage import StorageUsage
+from app.models.detection_history import DetectionHistory
+from app.services import blob_store
+from app.services.blob_store import BlobStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Blob store in a temp directory, installed as the process singleton"""
+    store = BlobStore(str(tmp_path / 'blobs'), fsync=False)
+    monkeypatch.setattr(blob_store, '_blob_store', store)
+    return store
+
+
+@pytest.fixture
+def app(store, monkeypatch):
+    """SQLite app with the image storage tables (blobs, image_metadata, storage_usage, detection_history)"""
+    monkeypatch.setattr(Config, 'DERIVATIVES_ENABLED', False)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[Blob.__table__, ImageMetadata.__table__,
+                                                  StorageUsage.__table__, DetectionHistory.__table__])
+        yield app
+        db.session.remove()
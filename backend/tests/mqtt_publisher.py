@@ -5,11 +5,16 @@ Gửi dữ liệu sensor qua MQTT để test real-time dashboard
 """
 
 import paho.mqtt.client as mqtt
-import json
 import time
 import random
 from datetime import datetime
 import sys
+import os
+
+# Add the parent directory to the Python path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.messages import SensorBatch, SensorReading, encode
 
 class MQTTSensorPublisher:
     def __init__(self, broker_host='localhost', broker_port=1883):
@@ -72,43 +77,25 @@ class MQTTSensorPublisher:
         
         # Gửi tất cả dữ liệu sensor trong một message theo đúng format
         topic = 'greenhouse/sensors/'
-        payload = {
-            'sensors': [
-                {
-                    'type': 'temperature',
-                    'device_id': 'greenhouse_1',
-                    'value': data['temperature'],
-                    'time': data['timestamp']
-                },
-                {
-                    'type': 'humidity',
-                    'device_id': 'greenhouse_1', 
-                    'value': data['humidity'],
-                    'time': data['timestamp']
-                },
-                {
-                    'type': 'soil_moisture',
-                    'device_id': 'greenhouse_1',
-                    'value': data['soil_moisture'],
-                    'time': data['timestamp']
-                },
-                {
-                    'type': 'light_intensity',
-                    'device_id': 'greenhouse_1',
-                    'value': data['light_intensity'],
-                    'time': data['timestamp']
-                }
-            ]
-        }
+        payload = SensorBatch(sensors=[
+            SensorReading(
+                type=sensor_type,
+                device_id='greenhouse_1',
+                value=data[sensor_type],
+                time=data['timestamp']
+            )
+            for sensor_type in ['temperature', 'humidity', 'soil_moisture', 'light_intensity']
+        ])
         
         try:
-            result = self.client.publish(topic, json.dumps(payload))
+            result = self.client.publish(topic, encode(payload))
             if result.rc == 0:
                 print(f"📡 Published sensor batch data successfully")
-                for sensor in payload['sensors']:
-                    print(f"   - {sensor['type']}: {sensor['value']}")
+                for sensor in payload.sensors:
+                    print(f"   - {sensor.type}: {sensor.value}")
             else:
-                print(f"❌ Failed to publish sensor batch")        except Exception as e:
+                print(f"❌ Failed to publish sensor batch")
+        except Exception as e:
             print(f"❌ Publish error for sensor batch: {e}")
                 
         return True
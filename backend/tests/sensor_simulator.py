@@ -1,9 +1,15 @@
 import requests
-import json
 import time
 import random
+import sys
+import os
 from datetime import datetime
 
+# Add the parent directory to the Python path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.messages import SensorSaveRequest, encode
+
 # Test configuration
 BASE_URL = "http://localhost:5000"
 
@@ -30,19 +36,19 @@ def send_sensor_data():
         
         for sensor_type in sensor_types:
             if sensor_type in data['data']:
-                payload = {
-                    'device_id': data['sensor_id'],
-                    'sensor_type': sensor_type,
-                    'value': data['data'][sensor_type],
-                    'timestamp': data['timestamp']
-                }
+                payload = SensorSaveRequest(
+                    device_id=data['sensor_id'],
+                    sensor_type=sensor_type,
+                    value=data['data'][sensor_type],
+                    timestamp=data['timestamp']
+                )
                 
                 response = requests.post(f"{BASE_URL}/api/sensors/save", 
-                                       json=payload, 
+                                       data=encode(payload), 
                                        headers={'Content-Type': 'application/json'})
                 
                 if response.status_code == 201:
-                    print(f"✅ Sent {sensor_type}: {payload['value']}")
+                    print(f"✅ Sent {sensor_type}: {payload.value}")
                 else:
                     print(f"❌ Failed to send {sensor_type}: {response.status_code} - {response.text}")
                     
@@ -129,16 +129,11 @@ def test_cache_status_endpoint(client, mock_cache_service):
     assert cache_data['active_items'] == 90
     assert cache_data['expired_items'] == 10
 
-@patch('os.walk')
-@patch('os.path.getsize')
-def test_storage_status_endpoint(mock_getsize, mock_walk, client):
+@patch('app.services.storage_accounting.get_storage_totals')
+def test_storage_status_endpoint(mock_totals, client):
     """Test storage status endpoint"""
-    # Mock file system data
-    mock_walk.return_value = [
-        ('/images', [], ['img1.jpg', 'img2.jpg']),
-        ('/images/2024', [], ['img3.jpg'])
-    ]
-    mock_getsize.return_value = 1024 * 1024  # 1MB per file
+    # Counters from storage_usage, no directory walk
+    mock_totals.return_value = {'total_files': 3, 'total_bytes': 3 * 1024 * 1024, 'total_images': 3}
     
     response = client.get('/api/monitoring/storage')
     assert response.status_code == 200
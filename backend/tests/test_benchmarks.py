@@ -0,0 +1,92 @@
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from benchmarks.common import percentiles, flatten
+from benchmarks.ingest_benchmark import VirtualFleet, parse_args, run
+from benchmarks.sensor_dataset import _CopyStream, generate_day
+from benchmarks.query_benchmark import rows_scanned
+from benchmarks.inference_benchmark import summarize
+
+# Report Helper Tests
+def test_percentiles_nearest_rank():
+    """Test percentile summary of a sample"""
+    result = percentiles(range(1, 101))
+    assert result['p50'] == 50
+    assert result['p95'] == 95
+    assert result['p99'] == 99
+    assert result['count'] == 100
+    assert percentiles([])['p50'] is None
+
+def test_flatten_results():
+    """Test nested results flatten to dotted numeric keys"""
+    flat = flatten({'latency': {'p50': 1.5}, 'endpoints': [{'name': 'sensors', 'bytes': 10}], 'ok': True})
+    assert flat == {'latency.p50': 1.5, 'endpoints[sensors].bytes': 10}
+
+# Ingest Benchmark Tests
+def test_fleet_is_deterministic():
+    """Test the same seed produces the same readings"""
+    when = datetime(2024, 6, 1, 14, 0, 0)
+    first = VirtualFleet(2, 6, seed=7).batch('bench_gh_000', when)
+    second = VirtualFleet(2, 6, seed=7).batch('bench_gh_000', when)
+    
+    assert first == second
+    assert [r.type for r in first.sensors] == [
+        'temperature', 'humidity', 'soil_moisture', 'light_intensity', 'temperature_2', 'humidity_2'
+    ]
+
+def test_inprocess_run_without_database():
+    """Test a short in-process run commits every published reading"""
+    args = parse_args(['--sink', 'null', '--greenhouses', '2', '--rate', '20', '--duration', '0.3'])
+    results = run(args)
+    
+    assert results['published_readings'] > 0
+    assert results['committed_readings'] == results['published_readings']
+    assert results['dropped_readings'] == 0
+    assert results['commit_latency_ms']['count'] == results['published_readings']
+
+# Query Benchmark Tests
+def test_generate_day_clips_at_end():
+    """Test a generated day has one line per sensor per step and stops at the end time"""
+    day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    full = ''.join(generate_day(day, ['bench_q_000', 'bench_q_001'], 3600, random.Random(1), day + timedelta(days=1)))
+    partial = ''.join(generate_day(day, ['bench_q_000'], 3600, random.Random(1), day + timedelta(hours=6)))
+    
+    assert len(full.splitlines()) == 2 * 24 * 4
+    assert len(partial.splitlines()) == 6 * 4
+    assert full.splitlines()[0].split('\t')[:3] == ['2024-01-01T00:00:00+00:00', 'bench_q_000', 'temperature']
+
+def test_copy_stream_reads_in_chunks():
+    """Test the COPY stream returns all generated data across sized reads"""
+    stream = _CopyStream(iter(['abc\n', 'defgh\n']))
+    assert stream.read(5) == b'abc\nd'
+    assert stream.read() == b'efgh\n'
+    assert stream.read(5) == b''
+
+def test_rows_scanned_counts_filtered_rows():
+    """Test rows scanned sums scan nodes including filtered rows and loops"""
+    plan = {
+        'Node Type': 'Append', 'Actual Rows': 30, 'Actual Loops': 1,
+        'Plans': [
+            {'Node Type': 'Seq Scan', 'Relation Name': '_hyper_1_1_chunk',
+             'Actual Rows': 10, 'Rows Removed by Filter': 90, 'Actual Loops': 1},
+            {'Node Type': 'Index Scan', 'Relation Name': '_hyper_1_2_chunk',
+             'Actual Rows': 5, 'Actual Loops': 4}
+        ]
+    }
+    assert rows_scanned(plan) == 100 + 20
+
+# Inference Benchmark Tests
+def test_inference_summary_groups_by_leaf_count():
+    """Test stage percentiles, throughput and per-leaf classify time"""
+    samples = [
+        {'decode': 5.0, 'detect': 40.0, 'leaves': 2, 'preprocess': 4.0, 'classify': 20.0, 'total': 70.0},
+        {'decode': 6.0, 'detect': 42.0, 'leaves': 0, 'total': 48.0},
+    ]
+    summary = summarize(samples, elapsed=0.5)
+    
+    assert summary['images_per_second'] == 4.0
+    assert summary['stages_ms']['detect']['count'] == 2
+    assert summary['stages_ms']['classify']['count'] == 1
+    assert summary['stages_ms']['annotate']['p50'] is None
+    assert summary['classify_ms_per_leaf']['p50'] == 10.0
+    assert set(summary['total_ms_by_leaf_count']) == {'0', '2'}
@@ -0,0 +1,53 @@
+import io
+import os
+from werkzeug.datastructures import FileStorage
+from app import db
+from app.models.blob import Blob
+from app.services import blob_store
+
+
+# Blob Store Tests
+def test_put_stream_dedups_and_shards(store):
+    """Identical content is stored once under ab/cd/<sha256>"""
+    first, size = store.put_stream(io.BytesIO(b'leaf image bytes'))
+    second, _ = store.put_stream(io.BytesIO(b'leaf image bytes'))
+
+    assert first == second and size == 16
+    assert store.path(first) == os.path.join(store.root, first[:2], first[2:4], first)
+    assert os.path.exists(store.path(first))
+    assert os.listdir(store.tmp_dir) == []
+
+
+def test_adopt_links_existing_file(store, tmp_path):
+    """Adopted files become hard links to the blob instead of a second copy"""
+    a, b = tmp_path / 'download.jpg', tmp_path / 'copy.jpg'
+    a.write_bytes(b'same capture')
+    b.write_bytes(b'same capture')
+
+    digest, _ = store.adopt(str(a))
+    assert store.adopt(str(b))[0] == digest
+    assert os.path.samefile(str(a), store.path(digest))
+    assert os.path.samefile(str(b), store.path(digest))
+
+
+# Reference Counting Tests
+def test_save_image_refcount_and_garbage_collection(app, store):
+    """Same-second duplicate uploads get unique paths, one blob and a refcount"""
+    from app.services.image_service import save_image, delete_image
+
+    first = save_image(FileStorage(io.BytesIO(b'\xff\xd8jpeg'), filename='a.jpg'), 'cam1')
+    second = save_image(FileStorage(io.BytesIO(b'\xff\xd8jpeg'), filename='a.jpg'), 'cam1')
+
+    assert first.image_path != second.image_path
+    assert first.content_hash == second.content_hash
+    assert db.session.get(Blob, first.content_hash).refcount == 2
+
+    delete_image(first.id)
+    delete_image(second.id)
+    blob = db.session.get(Blob, first.content_hash)
+    db.session.refresh(blob)
+    assert blob.refcount == 0
+    assert store.exists(first.content_hash)  # still within the grace period
+
+    assert blob_store.collect_garbage(grace_seconds=-1) == 1
+    assert not store.exists(first.content_hash)
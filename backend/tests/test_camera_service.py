@@ -0,0 +1,87 @@
+import os
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from app.services.camera_service import CameraRegistry, ESP32CameraService, parse_cameras
+
+JPEG = b'\xff\xd8\xff\xe0' + os.urandom(200 * 1024) + b'\xff\xd9'
+CAPTURE_DELAY = 0.3
+
+class StubCameraHandler(BaseHTTPRequestHandler):
+    """Serves a JPEG on /capture after a delay and a tiny JSON on /status"""
+    protocol_version = 'HTTP/1.1'
+    captures = 0
+    
+    def do_GET(self):
+        if self.path.startswith('/capture'):
+            StubCameraHandler.captures += 1
+            time.sleep(CAPTURE_DELAY)
+            body, content_type = JPEG, 'image/jpeg'
+        elif self.path == '/status':
+            body, content_type = b'{"framesize":13}', 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_camera():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubCameraHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StubCameraHandler.captures = 0
+    yield f"127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+# Camera Registry Tests
+def test_parse_cameras():
+    """Test camera spec parsing with and without ids"""
+    assert parse_cameras('row1=10.0.0.5, row2=10.0.0.6:8080') == {'row1': '10.0.0.5', 'row2': '10.0.0.6:8080'}
+    assert parse_cameras('10.0.0.5') == {'cam1': '10.0.0.5'}
+
+def test_capture_streams_image_to_disk(stub_camera, tmp_path):
+    """Test a capture writes the complete JPEG and leaves no partial file"""
+    camera = ESP32CameraService(stub_camera, camera_id='row1')
+    save_path = str(tmp_path / 'leaf.jpg')
+    result = camera.capture_image(save_path)
+    
+    assert result['status'] == 'success'
+    assert result['file_size'] == len(JPEG)
+    with open(save_path, 'rb') as f:
+        assert f.read() == JPEG
+    assert os.listdir(tmp_path) == ['leaf.jpg']
+
+def test_capture_all_runs_in_parallel(stub_camera, tmp_path):
+    """Test capturing four cameras takes about as long as one"""
+    registry = CameraRegistry({f"cam{i}": stub_camera for i in range(4)}, max_workers=4)
+    started = time.perf_counter()
+    results = registry.capture_all(str(tmp_path))
+    elapsed = time.perf_counter() - started
+    
+    assert all(result['status'] == 'success' for result in results.values())
+    assert len(os.listdir(tmp_path)) == 4
+    assert elapsed < CAPTURE_DELAY * 2.5
+
+def test_status_probe_does_not_capture(stub_camera):
+    """Test health checks hit the probe endpoint, not /capture"""
+    registry = CameraRegistry({'row1': stub_camera, 'row2': '127.0.0.1:1'})
+    statuses = registry.check_all()
+    
+    assert statuses['row1']['status'] == 'online'
+    assert statuses['row2']['status'] == 'offline'
+    assert StubCameraHandler.captures == 0
+
+def test_status_probe_requires_2xx(stub_camera):
+    """Test a missing probe endpoint is an error unless 404 is explicitly accepted"""
+    strict = ESP32CameraService(stub_camera, probe_path='/missing')
+    lenient = ESP32CameraService(stub_camera, probe_path='/missing', probe_accept_404=True)
+    
+    assert strict.check_camera_status()['status'] == 'error'
+    assert lenient.check_camera_status()['status'] == 'online'
@@ -0,0 +1,122 @@
+import os
+import time
+import pytest
+from PIL import Image, ImageDraw
+from app.services.capture_pipeline import CapturePipeline, difference_hash, hamming_distance
+
+def _frame(path, shift=0, noise=0):
+    """Gradient frame with a dark 'leaf'; shift moves the leaf, noise brightens slightly"""
+    image = Image.new('RGB', (320, 240))
+    draw = ImageDraw.Draw(image)
+    for x in range(320):
+        draw.line([(x, 0), (x, 240)], fill=(min(255, x // 2 + noise), 120, 60))
+    draw.ellipse([60 + shift, 60, 160 + shift, 180], fill=(20, 90, 20))
+    image.save(path, 'JPEG', quality=90)
+    return str(path)
+
+class FakeRegistry:
+    """Registry whose cameras return frames from a prepared list"""
+    def __init__(self, frames):
+        self.frames = frames
+        self.calls = 0
+    
+    def ids(self):
+        return ['row1']
+    
+    def capture_all(self, save_dir, resolution=None, camera_ids=None):
+        path = self.frames[self.calls]
+        self.calls += 1
+        return {'row1': {'status': 'success', 'file_path': path, 'camera_id': 'row1'}}
+
+# Perceptual Hash Tests
+def test_difference_hash_tolerates_small_changes(tmp_path):
+    """Test brightness noise keeps the hash close while a moved leaf does not"""
+    base = difference_hash(_frame(tmp_path / 'a.jpg'))
+    assert hamming_distance(base, difference_hash(_frame(tmp_path / 'b.jpg', noise=3))) <= 5
+    assert hamming_distance(base, difference_hash(_frame(tmp_path / 'c.jpg', shift=120))) > 5
+
+# Capture Pipeline Tests
+def test_pipeline_skips_unchanged_frames(tmp_path, monkeypatch):
+    """Test only changed frames are sent to inference and duplicates are deleted"""
+    from app.config import Config
+    monkeypatch.setattr(Config, 'DERIVATIVES_ENABLED', False)
+    frames = [_frame(tmp_path / 'f1.jpg'), _frame(tmp_path / 'f2.jpg', noise=2), _frame(tmp_path / 'f3.jpg', shift=120)]
+    analyzed = []
+    pipeline = CapturePipeline(FakeRegistry(frames), interval_seconds=3600, save_dir=str(tmp_path),
+                               predicted_dir=str(tmp_path), analyze=lambda camera_id, path, result: analyzed.append(path))
+    
+    def wait_analyzed(count):
+        deadline = time.time() + 5
+        while pipeline.get_stats()['analyzed'] < count and time.time() < deadline:
+            time.sleep(0.05)
+    
+    pipeline.next_due['row1'] = time.monotonic() + 3600  # captures below are forced, not scheduled
+    pipeline.start()
+    outcomes = []
+    for expected_analyzed in (1, 1, 2):
+        outcomes.append(pipeline.run_once(force=True)['row1'])
+        wait_analyzed(expected_analyzed)
+    pipeline.stop()
+    
+    assert outcomes == ['queued', 'unchanged', 'queued']
+    assert not os.path.exists(frames[1])
+    assert analyzed == [frames[0], frames[2]]
+    assert pipeline.get_stats()['skipped_duplicates'] == 1
+
+def test_pipeline_respects_interval(tmp_path, monkeypatch):
+    """Test a camera is not captured again before its interval elapses"""
+    from app.config import Config
+    monkeypatch.setattr(Config, 'DERIVATIVES_ENABLED', False)
+    registry = FakeRegistry([_frame(tmp_path / 'f1.jpg')])
+    pipeline = CapturePipeline(registry, interval_seconds=3600, save_dir=str(tmp_path),
+                               predicted_dir=str(tmp_path), analyze=lambda *args: None)
+    
+    assert pipeline.run_once() == {'row1': 'queued'}
+    assert pipeline.run_once() == {}
+    assert registry.calls == 1
+
+def test_bad_frame_does_not_block_other_cameras(tmp_path, monkeypatch):
+    """Test an unreadable frame counts as a capture error for its camera only"""
+    from app.config import Config
+    monkeypatch.setattr(Config, 'DERIVATIVES_ENABLED', False)
+    broken = tmp_path / 'broken.jpg'
+    broken.write_bytes(b'not a jpeg')
+    frames = {'row1': str(broken), 'row2': _frame(tmp_path / 'f2.jpg')}
+    
+    class TwoCameras:
+        def ids(self):
+            return list(frames)
+        
+        def capture_all(self, save_dir, resolution=None, camera_ids=None):
+            return {camera_id: {'status': 'success', 'file_path': path} for camera_id, path in frames.items()}
+    
+    pipeline = CapturePipeline(TwoCameras(), interval_seconds=3600, save_dir=str(tmp_path),
+                               predicted_dir=str(tmp_path), analyze=lambda *args: None)
+    assert pipeline.run_once() == {'row1': 'capture_error', 'row2': 'queued'}
+    assert not broken.exists()
+    assert pipeline.get_stats()['capture_errors'] == 1
+
+def test_failed_analysis_is_not_recorded(tmp_path, monkeypatch):
+    """Test an inference error counts as analyze_errors, stores nothing and is retried"""
+    from app.config import Config
+    from app.services import inference, detection_stats
+    monkeypatch.setattr(Config, 'DERIVATIVES_ENABLED', False)
+    monkeypatch.setattr(inference, 'analyze_leaf_image', lambda path: [
+        {'predicted_class': 'Error: Inference server unavailable', 'confidence': 0.0}])
+    monkeypatch.setattr(detection_stats, 'record_detection', lambda detection: pytest.fail('recorded'))
+    frames = [_frame(tmp_path / 'f1.jpg'), _frame(tmp_path / 'f2.jpg')]
+    pipeline = CapturePipeline(FakeRegistry(frames), interval_seconds=3600, save_dir=str(tmp_path),
+                               predicted_dir=str(tmp_path))
+    
+    pipeline.next_due['row1'] = time.monotonic() + 3600
+    pipeline.start()
+    for expected_errors in (1, 2):
+        assert pipeline.run_once(force=True) == {'row1': 'queued'}  # same frame again: not marked analyzed
+        deadline = time.time() + 5
+        while pipeline.get_stats()['analyze_errors'] < expected_errors and time.time() < deadline:
+            time.sleep(0.05)
+    pipeline.stop()
+    
+    stats = pipeline.get_stats()
+    assert stats['analyze_errors'] == 2 and stats['analyzed'] == 0
+    assert 'row1' not in pipeline.last_hash
@@ -0,0 +1,65 @@
+import json
+import pytest
+from datetime import datetime, timedelta
+from flask import Flask
+from app import db
+from app.models.detection_history import DetectionHistory
+from app.services.detection_history import list_detections, history_response_body, decode_cursor
+from app.utils import ValidationError
+
+START = datetime(2026, 10, 19, 8, 0, 0)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[DetectionHistory.__table__])
+        # Rows 0-4 share one timestamp so the id tie-breaker is exercised
+        for i in range(12):
+            row = DetectionHistory(original_image_path=f'{i}.jpg',
+                                   detection_method='automatic' if i % 2 else 'manual',
+                                   ai_results=[{'predicted_class': f'class {i}', 'confidence': 0.9,
+                                                'type': 'disease' if i % 3 == 0 else 'healthy'}])
+            row.timestamp = START if i < 5 else START + timedelta(minutes=i)
+            db.session.add(row)
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def read_all(**filters):
+    ids, cursor = [], None
+    while True:
+        page = list_detections(per_page=5, cursor=cursor, **filters)
+        ids += [item['id'] for item, _ in page['items']]
+        if not page['has_next']:
+            return ids
+        cursor = page['next_cursor']
+
+
+# Keyset Pagination Tests
+def test_cursor_pages_cover_every_row_once(app):
+    """Walking next_cursor returns each row once, newest first, ties broken by id"""
+    expected = [row.id for row in DetectionHistory.query.order_by(
+        DetectionHistory.timestamp.desc(), DetectionHistory.id.desc())]
+
+    assert read_all() == expected
+    assert read_all(method='automatic') == [i for i in expected if i % 2 == 0]
+    assert len(read_all(disease_only=True)) == 4
+    assert list_detections(include_total=True, disease_only=True)['total'] == 4
+    assert list_detections()['total'] is None
+
+
+def test_response_embeds_stored_ai_results(app):
+    """The response body carries ai_results from the column text unchanged"""
+    body = json.loads(history_response_body(list_detections(per_page=2, include_total=True)))
+
+    assert body['status'] == 'success' and body['total'] == 12 and body['has_next']
+    assert body['history'][0]['ai_results'] == [{'predicted_class': 'class 11', 'confidence': 0.9,
+                                                 'type': 'healthy'}]
+    assert body['history'][0]['predicted_class'] == 'class 11'
+    with pytest.raises(ValidationError):
+        decode_cursor('not-a-cursor')
@@ -0,0 +1,86 @@
+import pytest
+from datetime import datetime, date, timedelta
+from flask import Flask
+from app import db
+from app.models.detection_history import DetectionHistory, DetectionStatistics
+from app.services.detection_stats import record_detection, rebuild_statistics
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[DetectionHistory.__table__, DetectionStatistics.__table__])
+        from app.api.disease_detection import bp
+        app.register_blueprint(bp)
+        yield app
+        db.session.remove()
+
+
+def add_detection(timestamp, method, result_type, severity='low', camera_status='online'):
+    row = DetectionHistory(original_image_path='x.jpg', detection_method=method, camera_status=camera_status,
+                           ai_results=[{'predicted_class': 'x', 'confidence': 0.9,
+                                        'type': result_type, 'severity': severity}])
+    row.timestamp = timestamp
+    db.session.add(row)
+    record_detection(row)
+    db.session.commit()
+    return row
+
+
+def stats_for(day):
+    return db.session.get(DetectionStatistics, db.session.query(DetectionStatistics.id)
+                          .filter_by(date=day).scalar()).to_dict()
+
+
+# Detection Statistics Tests
+def test_record_detection_increments_daily_row(app):
+    """Each saved detection bumps its day's counters"""
+    add_detection(datetime(2026, 10, 18, 9), 'automatic', 'disease', severity='high')
+    add_detection(datetime(2026, 10, 18, 17), 'manual', 'healthy', camera_status='offline')
+    add_detection(datetime(2026, 10, 19, 8), 'automatic', 'disease', severity='medium')
+
+    stats = stats_for(date(2026, 10, 18))
+    assert stats['total_detections'] == 2
+    assert stats['automatic_detections'] == 1 and stats['manual_detections'] == 1
+    assert stats['diseases_detected'] == 1 and stats['healthy_detections'] == 1
+    assert stats['high_severity_count'] == 1 and stats['low_severity_count'] == 0
+    assert stats['camera_online_count'] == 1 and stats['camera_offline_count'] == 1
+    assert stats_for(date(2026, 10, 19))['medium_severity_count'] == 1
+    assert DetectionStatistics.query.count() == 2
+
+
+def test_rebuild_matches_incremental_counters(app):
+    """Rebuilding from detection_history reproduces the incremental rows"""
+    add_detection(datetime(2026, 10, 18, 9), 'automatic', 'disease', severity='high')
+    add_detection(datetime(2026, 10, 18, 10), 'automatic', 'disease', severity='high')
+    add_detection(datetime(2026, 10, 19, 8), 'manual', 'healthy')
+    before = {day: stats_for(day) for day in (date(2026, 10, 18), date(2026, 10, 19))}
+
+    DetectionStatistics.query.update({'total_detections': 99})
+    db.session.commit()
+    assert rebuild_statistics() == 2
+
+    ignored = ('id', 'created_at', 'updated_at')
+    for day, expected in before.items():
+        actual = stats_for(day)
+        assert {k: v for k, v in actual.items() if k not in ignored} == \
+            {k: v for k, v in expected.items() if k not in ignored}
+
+
+def test_statistics_endpoint_sums_daily_rows(app):
+    """GET /api/disease-detection/statistics returns the window's rows and their totals"""
+    today = datetime.combine(date.today(), datetime.min.time())
+    add_detection(today.replace(hour=9), 'automatic', 'disease', severity='high')
+    add_detection(today - timedelta(days=1), 'manual', 'healthy')
+    add_detection(today - timedelta(days=10), 'automatic', 'disease')
+
+    body = app.test_client().get('/api/disease-detection/statistics?days=7').get_json()
+    assert body['status'] == 'success' and body['period']['days'] == 7
+    assert [row['date'] for row in body['daily_statistics']] == \
+        [today.date().isoformat(), (today - timedelta(days=1)).date().isoformat()]
+    assert body['summary']['total_detections'] == 2
+    assert body['summary']['total_diseases'] == 1 and body['summary']['high_severity'] == 1
+    assert body['summary']['total_manual'] == 1
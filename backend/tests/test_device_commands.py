@@ -0,0 +1,128 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from app.models.device_command import DeviceCommand
+from app.services import device_commands
+from app.services.device_commands import (
+    submit_device_command, dispatch_batch, acknowledge_reports, expire_commands, get_command, get_command_stats
+)
+
+
+class FakeMQTT:
+    def __init__(self, connected=True, accept=True):
+        self.connected = connected
+        self.accept = accept
+        self.published = []
+
+    def publish(self, topic, payload, qos=0):
+        if self.accept:
+            self.published.append((topic, payload))
+        return self.accept
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    DeviceCommand.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE device_states (
+                id VARCHAR(50) PRIMARY KEY, type VARCHAR(50) NOT NULL, name VARCHAR(100) NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'false', last_updated TIMESTAMP
+            )
+        """))
+    monkeypatch.setattr(device_commands, 'engine', engine)
+    return engine
+
+
+def device_status(engine, device_id):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT status FROM device_states WHERE id = :id"), {'id': device_id}).scalar()
+
+
+# Device Command Outbox Tests
+def test_submit_dispatch_and_ack(engine):
+    """State and command are written together, published once, acked by the status report"""
+    queued = submit_device_command('pump1', 'pump', True)
+    assert device_status(engine, 'pump1') == 'true'
+    assert get_command(queued['command_id'])['status'] == 'pending'
+
+    mqtt = FakeMQTT()
+    assert dispatch_batch(mqtt) == 1
+    assert mqtt.published == [('greenhouse/control/pump', {
+        'device_id': 'pump1', 'command': 'SET_STATE', 'status': True,
+        'command_id': queued['command_id'], 'timestamp': queued['timestamp']})]
+    assert dispatch_batch(mqtt) == 0
+
+    assert acknowledge_reports([{'device_id': 'pump1', 'status': False}]) == 0
+    assert acknowledge_reports([{'device_id': 'pump1', 'status': True}]) == 1
+    assert get_command(queued['command_id'])['status'] == 'acked'
+    assert get_command_stats()['ack_rate'] == 1.0
+
+
+def test_retry_backoff_and_failure(engine):
+    """Failed publishes are retried with backoff, then marked failed and the old state restored"""
+    submit_device_command('cover1', 'cover', 'CLOSED')
+    dispatch_batch(FakeMQTT())
+    acknowledge_reports([{'device_id': 'cover1', 'status': 'CLOSED'}])
+    queued = submit_device_command('cover1', 'cover', 'OPEN')
+    now = datetime.utcnow()
+
+    assert dispatch_batch(None, now=now) == 0
+    assert dispatch_batch(FakeMQTT(connected=False), now=now) == 0
+    assert get_command(queued['command_id'])['attempts'] == 0  # broker down: nothing spent
+
+    assert dispatch_batch(FakeMQTT(accept=False), max_attempts=2, retry_seconds=10, now=now) == 0
+    assert dispatch_batch(FakeMQTT(), now=now) == 0  # not due yet
+    assert device_status(engine, 'cover1') == 'OPEN'
+    assert dispatch_batch(FakeMQTT(accept=False), max_attempts=2, now=now + timedelta(seconds=11)) == 0
+
+    command = get_command(queued['command_id'])
+    assert command['status'] == 'failed' and command['attempts'] == 2
+    assert command['previous_status'] == 'CLOSED' and device_status(engine, 'cover1') == 'CLOSED'
+
+
+def test_newer_command_supersedes_pending_and_timeout(engine):
+    """Only the latest intent per device is published; unacked commands time out"""
+    first = submit_device_command('fan1', 'fan', True)
+    second = submit_device_command('fan1', 'fan', False)
+    assert get_command(first['command_id'])['status'] == 'superseded'
+    assert device_status(engine, 'fan1') == 'false'
+
+    mqtt = FakeMQTT()
+    assert dispatch_batch(mqtt) == 1 and mqtt.published[0][1]['status'] is False
+
+    assert expire_commands(30, now=datetime.utcnow() + timedelta(seconds=31)) == 1
+    assert get_command(second['command_id'])['status'] == 'timed_out'
+    assert device_status(engine, 'fan1') == 'false'  # no state before the commands, nothing to restore
+
+
+def test_ack_matches_command_id(engine):
+    """A report echoing a command_id acks only that command"""
+    queued = submit_device_command('pump1', 'pump', True)
+    dispatch_batch(FakeMQTT())
+
+    assert acknowledge_reports([{'device_id': 'pump1', 'status': True, 'command_id': 'other'}]) == 0
+    assert acknowledge_reports([{'device_id': 'pump1', 'status': True, 'command_id': queued['command_id']}]) == 1
+    assert get_command(queued['command_id'])['status'] == 'acked'
+
+
+def test_ack_during_publish(engine):
+    """A device answering before dispatch_batch returns still acks its command"""
+    submit_device_command('pump1', 'pump', False)
+    dispatch_batch(FakeMQTT())
+    acknowledge_reports([{'device_id': 'pump1', 'status': False}])
+    queued = submit_device_command('pump1', 'pump', True)
+
+    class InstantDevice(FakeMQTT):
+        def publish(self, topic, payload, qos=0):
+            self.acked = acknowledge_reports([{'device_id': payload['device_id'], 'status': payload['status'],
+                                               'command_id': payload['command_id']}])
+            return True
+
+    mqtt = InstantDevice()
+    assert dispatch_batch(mqtt) == 1 and mqtt.acked == 1
+    assert expire_commands(30, now=datetime.utcnow() + timedelta(seconds=31)) == 0
+    assert get_command(queued['command_id'])['status'] == 'acked'
+    assert device_status(engine, 'pump1') == 'true'
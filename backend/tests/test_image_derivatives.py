@@ -0,0 +1,86 @@
+import os
+import pytest
+from flask import Flask
+from PIL import Image
+from app.config import Config
+from app.services.image_derivatives import (
+    SIZES, DerivativeWorker, derivative_path, resolve_image, send_image
+)
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DERIVATIVE_DIR', str(tmp_path / 'derivatives'))
+    path = str(tmp_path / 'capture.jpg')
+    Image.new('RGB', (1600, 1200), (40, 160, 60)).save(path, 'JPEG', quality=95)
+    return path
+
+@pytest.fixture
+def app(source):
+    app = Flask(__name__)
+    app.add_url_rule('/image', 'image', lambda: send_image(source))
+    return app
+
+# Derivative Generation Tests
+def test_worker_generates_all_sizes(source):
+    """Test the background worker writes a WebP for every size within bounds"""
+    worker = DerivativeWorker()
+    worker.enqueue(source)
+    worker.join()
+    
+    for size, max_side in SIZES.items():
+        with Image.open(derivative_path(source, size, 'webp')) as image:
+            assert image.format == 'WEBP'
+            assert max(image.size) == max_side
+    assert worker.get_stats()['generated'] == 1
+
+def test_jpeg_fallback_and_original(source):
+    """Test clients without WebP get JPEG and size=original serves the source"""
+    path, mimetype, etag = resolve_image(source, 'thumb', accept='image/*')
+    assert mimetype == 'image/jpeg' and path.endswith('.jpeg')
+    assert resolve_image(source, None)[0] == source
+    with pytest.raises(ValueError):
+        resolve_image(source, 'huge')
+
+# Serving Tests
+def test_size_param_caching_headers(app, source):
+    """Test derivatives are small, cacheable and revalidate with ETag"""
+    client = app.test_client()
+    response = client.get('/image?size=small', headers={'Accept': 'image/webp,*/*'})
+    
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    assert len(response.data) * 10 < os.path.getsize(source)
+    assert 'max-age' in response.headers['Cache-Control']
+    assert 'Accept' in response.headers['Vary']
+    
+    etag = response.headers['ETag']
+    cached = client.get('/image?size=small', headers={'Accept': 'image/webp', 'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert client.get('/image?size=bogus').status_code == 400
+
+def test_range_and_if_modified_since(app, source):
+    """Test originals answer Range with 206 and If-Modified-Since with 304"""
+    client = app.test_client()
+    partial = client.get('/image', headers={'Range': 'bytes=0-99'})
+    assert partial.status_code == 206
+    assert len(partial.data) == 100
+    assert partial.headers['Accept-Ranges'] == 'bytes'
+    
+    last_modified = client.get('/image').headers['Last-Modified']
+    assert client.get('/image', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+def test_accel_redirect_and_missing_file(source, tmp_path, monkeypatch):
+    """Test X-Accel-Redirect hands the body to the proxy and missing files give 404"""
+    monkeypatch.setattr(Config, 'IMAGE_ACCEL_REDIRECT_PREFIX', '/_images/')
+    monkeypatch.setattr(Config, 'IMAGE_ACCEL_ROOT', str(tmp_path))
+    app = Flask(__name__)
+    app.add_url_rule('/image', 'image', lambda: send_image(source, key='abc123', mimetype='image/jpeg'))
+    app.add_url_rule('/missing', 'missing', lambda: send_image(str(tmp_path / 'gone.jpg')))
+    client = app.test_client()
+    
+    response = client.get('/image')
+    assert response.headers['X-Accel-Redirect'] == '/_images/capture.jpg'
+    assert response.data == b'' and response.mimetype == 'image/jpeg'
+    cached = client.get('/image', headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304 and 'X-Accel-Redirect' not in cached.headers
+    assert client.get('/missing').status_code == 404
@@ -0,0 +1,100 @@
+import pytest
+import sys
+import subprocess
+from benchmarks.startup_benchmark import parse_importtime, check_budgets
+
+# Lazy Import Tests
+def test_blueprints_do_not_import_ml_stack():
+    """Test importing the API blueprints leaves torch/ultralytics/cv2 unloaded"""
+    script = (
+        "import sys\n"
+        "from app.api import sensors, images, monitoring, dashboard\n"
+        "from app.api.disease_detection import bp\n"
+        "from app.services.inference import HEAVY_MODULES, is_loaded\n"
+        "assert not is_loaded()\n"
+        "print(','.join(m for m in HEAVY_MODULES if m in sys.modules))\n"
+    )
+    completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.strip() == ''
+
+# Startup Benchmark Tests
+def test_parse_importtime_keeps_top_level():
+    """Test only top-level imports are reported, slowest first"""
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        150 |   flask.json\n"
+        "import time:       200 |       5000 | flask\n"
+        "import time:       300 |      20000 | app\n"
+    )
+    assert parse_importtime(stderr) == [
+        {'module': 'app', 'cumulative_ms': 20.0},
+        {'module': 'flask', 'cumulative_ms': 5.0}
+    ]
+
+def test_startup_budget_violations():
+    """Test ML imports and slow startup are reported as violations"""
+    results = {'heavy_modules': ['torch'], 'total_ms': {'p50': 1500.0}, 'peak_rss_mb': {'max': 90.0}}
+    problems = check_budgets(results, max_seconds=1.0, max_rss_mb=200)
+    
+    assert len(problems) == 2
+    assert 'torch' in problems[0]
+
+# Inference Server Tests
+def test_server_batches_concurrent_requests(tmp_path):
+    """Test requests submitted together run as one batch and get their own results"""
+    import threading
+    from app.services.inference_server import InferenceServer, InferenceClient
+    
+    batches = []
+    def fake_batch(paths, timings):
+        batches.append(list(paths))
+        return [[{'predicted_class': f"Plant status: {path}", 'confidence': 1.0}] for path in paths]
+    
+    address = str(tmp_path / 'inference.sock')
+    server = InferenceServer(address, b'test', max_batch=4, batch_wait_ms=200, process_batch=fake_batch)
+    server.start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    client = InferenceClient(address, b'test', timeout=10)
+    results = {}
+    def analyze(name):
+        timings = {}
+        results[name] = (client.analyze(f"/images/{name}.jpg", timings), timings)
+    threads = [threading.Thread(target=analyze, args=(f"cam{i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    stats = client.stats()
+    server.stop()
+    
+    assert len(batches) == 1 and len(batches[0]) == 3
+    assert results['cam1'][0][0]['predicted_class'] == 'Plant status: /images/cam1.jpg'
+    assert 'queue' in results['cam1'][1]
+    assert stats['requests'] == 3 and stats['batches'] == 1
+
+def test_unavailable_server_returns_error_result(tmp_path, monkeypatch):
+    """Test detection reports an error result when the server is down"""
+    from app.config import Config
+    from app.services import inference
+    
+    monkeypatch.setattr(Config, 'INFERENCE_SERVER_ADDRESS', str(tmp_path / 'missing.sock'))
+    monkeypatch.setattr(Config, 'INFERENCE_AUTHKEY', 'test')
+    monkeypatch.setattr(inference, '_client', None)
+    
+    results = inference.analyze_leaf_image('/images/leaf.jpg')
+    assert results == [{'predicted_class': 'Error: Inference server unavailable', 'confidence': 0.0}]
+    assert not inference.is_loaded()
+
+def test_server_requires_authkey(tmp_path):
+    """Test neither TCP nor Unix socket addresses start without an authkey"""
+    from app.services.inference_server import InferenceServer, InferenceClient
+    
+    with pytest.raises(ValueError):
+        InferenceServer('0.0.0.0:7070', b'', process_batch=lambda paths, timings: [])
+    with pytest.raises(ValueError):
+        InferenceServer(str(tmp_path / 'inference.sock'), None, process_batch=lambda paths, timings: [])
+    with pytest.raises(ValueError):
+        InferenceClient(str(tmp_path / 'inference.sock'), b'')
+    assert InferenceClient('127.0.0.1:7070', b'secret').authkey == b'secret'
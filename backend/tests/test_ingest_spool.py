@@ -0,0 +1,87 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy.exc import OperationalError
+from app.services.ingest_spool import IngestSpool
+
+def make_rows(count, start=None):
+    start = start or datetime(2025, 6, 12, 10, 0, 0)
+    return [{
+        'timestamp': start + timedelta(seconds=i),
+        'device_id': 'greenhouse_1',
+        'sensor_type': 'temperature',
+        'value': 20.0 + i
+    } for i in range(count)]
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = IngestSpool(str(tmp_path / 'spool' / 'ingest.db'), max_rows=10, batch_size=4)
+    yield spool
+    spool.stop()
+
+def test_append_and_replay_in_order(spool, mocker):
+    """Test spooled rows are replayed in order with bulk inserts"""
+    save_batch = mocker.patch('app.services.timescale.save_sensor_data_batch')
+    assert spool.append(make_rows(6))
+    assert spool.depth() == 6
+    
+    assert spool.replay_once() == 4
+    assert spool.replay_once() == 2
+    assert spool.replay_once() == 0
+    
+    replayed = [row['value'] for call in save_batch.call_args_list for row in call.args[0]]
+    assert replayed == [20.0 + i for i in range(6)]
+    assert spool.depth() == 0
+    assert spool.get_stats()['replayed_total'] == 6
+
+def test_replay_keeps_rows_while_db_down(spool, mocker):
+    """Test rows stay in the spool if the database is still unavailable"""
+    mocker.patch(
+        'app.services.timescale.save_sensor_data_batch',
+        side_effect=OperationalError('INSERT', {}, Exception('connection refused'))
+    )
+    spool.append(make_rows(3))
+    
+    with pytest.raises(OperationalError):
+        spool.replay_once()
+    assert spool.depth() == 3
+
+def test_size_cap_drops_rows(spool):
+    """Test the spool refuses rows beyond its row cap"""
+    assert spool.append(make_rows(8))
+    assert not spool.append(make_rows(5))
+    
+    stats = spool.get_stats()
+    assert stats['depth'] == 8
+    assert stats['dropped_total'] == 5
+
+def test_spool_survives_reopen(tmp_path):
+    """Test pending rows are recovered after a restart"""
+    path = str(tmp_path / 'ingest.db')
+    IngestSpool(path, fsync='full').append(make_rows(3))
+    
+    reopened = IngestSpool(path)
+    assert reopened.depth() == 3
+
+def test_invalid_fsync_policy(tmp_path):
+    """Test unknown fsync policies are rejected"""
+    with pytest.raises(ValueError):
+        IngestSpool(str(tmp_path / 'ingest.db'), fsync='sometimes')
+
+def test_spool_has_a_single_owner(tmp_path, mocker):
+    """Test only a process that opens the spool and holds its lock gets one"""
+    import app.services.ingest_spool as ingest_spool
+    mocker.patch.object(ingest_spool, '_ingest_spool', None)
+    mocker.patch.object(ingest_spool.Config, 'INGEST_SPOOL_ENABLED', True)
+    path = str(tmp_path / 'spool' / 'ingest.db')
+    
+    assert ingest_spool.get_ingest_spool() is None  # API workers never open it
+    mocker.patch.object(ingest_spool, 'acquire_process_lock', return_value=False)
+    assert ingest_spool.open_ingest_spool(path) is None
+    
+    mocker.patch.object(ingest_spool, 'acquire_process_lock', return_value=True)
+    spool = ingest_spool.open_ingest_spool(path)
+    try:
+        assert spool is not None and ingest_spool.get_ingest_spool() is spool
+        assert spool.path == path
+    finally:
+        spool.stop()
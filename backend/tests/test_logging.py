@@ -0,0 +1,47 @@
+import queue
+import logging
+from app.utils.logging import NonBlockingQueueHandler, LogRateLimitFilter
+
+
+def make_record(level=logging.INFO, lineno=10, msg="Saved sensor data: %s", args=('t1',)):
+    return logging.LogRecord('app.services.timescale', level, 'timescale.py', lineno, msg, args, None)
+
+# Queue Handler Tests
+def test_queue_handler_defers_formatting():
+    """Test records are enqueued without being formatted"""
+    log_queue = queue.Queue()
+    handler = NonBlockingQueueHandler(log_queue)
+    
+    handler.handle(make_record())
+    
+    record = log_queue.get_nowait()
+    assert record.msg == "Saved sensor data: %s"
+    assert record.args == ('t1',)
+    assert record.getMessage() == "Saved sensor data: t1"
+
+def test_queue_handler_drops_when_full():
+    """Test a full queue drops records instead of blocking"""
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    
+    for _ in range(5):
+        handler.handle(make_record())
+    
+    assert handler.dropped_total == 3
+
+# Rate Limit Filter Tests
+def test_rate_limit_per_call_site(mocker):
+    """Test INFO records are limited per call site and summarized"""
+    clock = mocker.patch('app.utils.logging.time.monotonic', return_value=100.0)
+    rate_filter = LogRateLimitFilter(rate=2)
+    
+    results = [rate_filter.filter(make_record()) for _ in range(5)]
+    assert results == [True, True, False, False, False]
+    
+    # Another call site and warnings are not affected
+    assert rate_filter.filter(make_record(lineno=20))
+    assert rate_filter.filter(make_record(level=logging.WARNING))
+    
+    clock.return_value = 101.5
+    record = make_record()
+    assert rate_filter.filter(record)
+    assert "(+3 similar messages suppressed)" in record.getMessage()
@@ -0,0 +1,74 @@
+import pytest
+import msgspec
+from app.models.messages import (
+    SensorBatch, SensorReading, decode_sensor_batch,
+    decode_device_batch, decode_sensor_save, encode
+)
+
+def test_decode_sensor_batch():
+    """Test valid sensor batch is decoded into typed readings"""
+    payload = b'''{"sensors": [
+        {"type": "Temperature", "device_id": "greenhouse_1", "value": 25.5, "time": "2025-06-12T10:00:00"},
+        {"type": "humidity", "device_id": "greenhouse_1", "value": "70", "time": "2025-06-12T10:00:00"}
+    ]}'''
+    readings, errors = decode_sensor_batch(payload)
+    
+    assert errors == []
+    assert [r.type for r in readings] == ['temperature', 'humidity']
+    assert readings[1].value == 70.0
+    assert readings[0].to_record()['sensor_type'] == 'temperature'
+
+def test_invalid_sensor_does_not_abort_batch():
+    """Test invalid elements are reported per field and skipped"""
+    payload = b'''{"sensors": [
+        {"type": "temperature", "device_id": "greenhouse_1", "value": "hot", "time": "t"},
+        {"type": "light", "device_id": "greenhouse_1", "time": "t"},
+        {"type": "soil_moisture", "device_id": "greenhouse_1", "value": 40, "time": "t"}
+    ]}'''
+    readings, errors = decode_sensor_batch(payload)
+    
+    assert len(readings) == 1
+    assert [e['index'] for e in errors] == [0, 1]
+    assert '$.value' in errors[0]['error']
+    assert 'value' in errors[1]['error']
+
+def test_missing_envelope_raises():
+    """Test a payload without the sensors list is rejected"""
+    with pytest.raises(msgspec.ValidationError):
+        decode_sensor_batch(b'{"devices": []}')
+    with pytest.raises(msgspec.DecodeError):
+        decode_sensor_batch(b'not json')
+
+def test_decode_device_batch():
+    """Test device status normalisation and validation"""
+    payload = b'''{"devices": [
+        {"type": "PUMP", "device_id": "pump1", "status": "true", "time": "t"},
+        {"type": "fan", "device_id": "fan1", "status": false, "time": "t"},
+        {"type": "cover", "device_id": "cover1", "status": "half", "time": "t"},
+        {"type": "cover", "device_id": "cover1", "status": "AJAR", "time": "t"},
+        {"type": "door", "device_id": "door1", "status": true, "time": "t"}
+    ]}'''
+    devices, errors = decode_device_batch(payload)
+    
+    assert [(d.type, d.status) for d in devices] == [
+        ('pump', True), ('fan', False), ('cover', 'HALF')
+    ]
+    assert [e['index'] for e in errors] == [3, 4]
+
+def test_sensor_save_request():
+    """Test sensor save request body validation"""
+    data = decode_sensor_save(b'{"device_id": "greenhouse_1", "sensor_type": "temperature", "value": 25}')
+    assert data.value == 25.0
+    assert data.timestamp is None
+    
+    with pytest.raises(msgspec.ValidationError):
+        decode_sensor_save(b'{"device_id": "greenhouse_1", "value": 25}')
+
+def test_encode_round_trip():
+    """Test publishers and ingest share the same wire format"""
+    batch = SensorBatch(sensors=[
+        SensorReading(type='temperature', device_id='greenhouse_1', value=25.5, time='t')
+    ])
+    readings, errors = decode_sensor_batch(encode(batch))
+    assert errors == []
+    assert readings == batch.sensors
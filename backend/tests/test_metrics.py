@@ -0,0 +1,87 @@
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+from app.services.metrics import (
+    Counter, Histogram, init_metrics, db_query_duration, http_request_duration
+)
+
+# Metric Type Tests
+def test_histogram_buckets_are_cumulative():
+    """Test histogram exposition output"""
+    histogram = Histogram('test_duration_seconds', 'Test', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, stage='detect')
+    
+    lines = histogram.render()
+    assert 'test_duration_seconds_bucket{stage="detect",le="0.1"} 1' in lines
+    assert 'test_duration_seconds_bucket{stage="detect",le="1"} 3' in lines
+    assert 'test_duration_seconds_bucket{stage="detect",le="+Inf"} 4' in lines
+    assert 'test_duration_seconds_sum{stage="detect"} 6.05' in lines
+    assert 'test_duration_seconds_count{stage="detect"} 4' in lines
+
+def test_counter_requires_declared_labels():
+    """Test counters reject unknown label sets"""
+    counter = Counter('test_total', 'Test', ('topic',))
+    counter.inc(topic='greenhouse/sensors/')
+    counter.inc(2, topic='greenhouse/sensors/')
+    
+    assert counter.get(topic='greenhouse/sensors/') == 3
+    with pytest.raises(ValueError):
+        counter.inc(device='pump')
+
+# Instrumentation Tests
+def test_db_duration_by_call_site():
+    """Test statements are attributed to the calling function"""
+    from app.services.metrics import instrument_sqlalchemy
+    instrument_sqlalchemy()
+    engine = create_engine('sqlite://')
+    
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    
+    # Call sites are only recorded for code inside the app package
+    assert db_query_duration.get_count(call_site='unknown') >= 1
+
+def test_failed_statement_releases_timer():
+    """Test a statement that raises does not leave its start time behind"""
+    from app.services.metrics import instrument_sqlalchemy
+    instrument_sqlalchemy()
+    engine = create_engine('sqlite://')
+    
+    with engine.connect() as conn:
+        with pytest.raises(Exception):
+            conn.execute(text('SELECT * FROM missing_table'))
+        assert conn.connection.info.get('metrics_query_start') == []
+
+def test_metrics_endpoint_reports_route_latency():
+    """Test request middleware and /metrics endpoint"""
+    app = Flask(__name__)
+    init_metrics(app)
+    
+    @app.route('/api/items/<int:item_id>')
+    def item(item_id):
+        return 'ok'
+    
+    client = app.test_client()
+    client.get('/api/items/1')
+    client.get('/api/items/2')
+    
+    assert http_request_duration.get_count(method='GET', route='/api/items/<int:item_id>', status=200) == 2
+    
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert 'route="/api/items/<int:item_id>"' in body
+
+def test_mqtt_errors_are_exported():
+    """Test MQTT monitor errors reach /metrics with topic and type labels"""
+    from app.services.monitoring import mqtt_monitor
+    app = Flask(__name__)
+    init_metrics(app)
+    
+    mqtt_monitor.on_error('x', 'topic')
+    
+    body = app.test_client().get('/metrics').get_data(as_text=True)
+    assert 'mqtt_errors_total{topic="topic",type="x"} 1' in body
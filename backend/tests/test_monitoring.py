@@ -101,15 +101,11 @@ def test_cache_status_endpoint(client):
     assert 'total_items' in data['data']
     assert 'active_items' in data['data']
 
-@patch('os.path.getsize')
-@patch('os.walk')
-def test_storage_status_endpoint(mock_walk, mock_getsize, client):
+@patch('app.services.storage_accounting.get_storage_totals')
+def test_storage_status_endpoint(mock_totals, client):
     """Test storage status endpoint"""
-    # Mock file system data
-    mock_walk.return_value = [
-        ('/root', [], ['file1.jpg', 'file2.jpg']),
-    ]
-    mock_getsize.return_value = 1024 * 1024  # 1MB
+    # Counters from storage_usage, no directory walk
+    mock_totals.return_value = {'total_files': 2, 'total_bytes': 2 * 1024 * 1024, 'total_images': 2}
     
     response = client.get('/api/monitoring/storage')
     assert response.status_code == 200
@@ -129,4 +125,55 @@ def test_rate_limiting(client):
     ]
     
     # Some of the later requests should be rate limited
-    assert any(r.status_code == 429 for r in responses[-5:])
\ No newline at end of file
+    assert any(r.status_code == 429 for r in responses[-5:])
+
+# MQTT Monitor Counter Tests
+def test_rolling_counter_windows():
+    """Test per-second ring counter over sub-windows"""
+    from app.services.monitoring import RollingCounter
+    counter = RollingCounter(window_seconds=3600)
+    
+    # 10 messages/s for the first 10 minutes
+    for second in range(600):
+        counter.add(1000 + second, amount=10)
+    
+    now = 1000 + 599
+    assert counter.count(now, 60) == 600
+    assert counter.count(now, 300) == 3000
+    assert counter.count(now) == 6000
+    
+    # Slots older than the window are skipped, and reset when reused
+    assert counter.count(now + 3600) == 0
+    counter.add(now + 3600)
+    assert counter.count(now + 3600) == 1
+    assert counter.total == 6001
+
+def test_monitor_rate_is_exact_above_window_size():
+    """Test rate is not capped by a fixed number of stored timestamps"""
+    from app.services.monitoring import MQTTMonitor
+    with patch('app.services.monitoring.time.time', return_value=10000.0):
+        monitor = MQTTMonitor()
+        monitor.started_at = 10000.0 - 120
+        for _ in range(12000):
+            monitor.on_message('greenhouse/sensors/')
+        stats = monitor.get_stats()
+    
+    assert stats['messages']['total'] == 12000
+    assert stats['messages']['rates']['1m'] == 200.0
+    assert stats['messages']['by_topic']['greenhouse/sensors/'] == 12000
+
+def test_processing_time_quantiles():
+    """Test quantile sketch stays within its relative accuracy"""
+    from app.services.monitoring import QuantileSketch
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for i in range(1, 1001):
+        sketch.add(i / 1000, now=0)
+    
+    result = sketch.quantiles(now=1)
+    assert result['count'] == 1000
+    assert result['p50'] == pytest.approx(0.5, rel=0.02)
+    assert result['p95'] == pytest.approx(0.95, rel=0.02)
+    assert result['p99'] == pytest.approx(0.99, rel=0.02)
+    
+    # Old generations age out after two idle rotation periods
+    assert sketch.quantiles(now=700)['count'] == 0
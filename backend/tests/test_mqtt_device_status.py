@@ -1,6 +1,5 @@
 """Test MQTT device status updates in batch format with random status"""
 
-import json
 import time
 import random
 from datetime import datetime
@@ -11,6 +10,8 @@ import os
 # Add the parent directory to the Python path to import app modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from app.models.messages import DeviceBatch, DeviceStatus, encode
+
 try:
     from app.config import Config
 except ImportError:
@@ -51,37 +52,21 @@ def main():
             fan_status = random.choice([True, False])
             cover_status = random.choice(["OPEN", "HALF", "CLOSED"])
             
-            device_updates = {
-                "devices": [
-                    {
-                        "type": "pump",
-                        "device_id": "pump1",
-                        "status": pump_status,  # Random boolean for pump/fan
-                        "time": current_time,
-                    },
-                    {
-                        "type": "fan",
-                        "device_id": "fan1", 
-                        "status": fan_status,  # Random boolean for pump/fan
-                        "time": current_time,
-                    },
-                    {
-                        "type": "cover",
-                        "device_id": "cover1",
-                        "status": cover_status,  # Random string: "OPEN"/"HALF"/"CLOSED"
-                        "time": current_time,
-                    }
-                ]
-            }
+            device_updates = DeviceBatch(devices=[
+                DeviceStatus(type="pump", device_id="pump1", status=pump_status, time=current_time),
+                DeviceStatus(type="fan", device_id="fan1", status=fan_status, time=current_time),
+                DeviceStatus(type="cover", device_id="cover1", status=cover_status, time=current_time)
+            ])
 
             # Publish to devices topic
             print("\nPublishing device updates:")
             print(f"🔧 Pump: {pump_status}, Fan: {fan_status}, Cover: {cover_status}")
-            print(json.dumps(device_updates, indent=2))
+            payload = encode(device_updates)
+            print(payload.decode())
             
             client.publish(
                 "greenhouse/devices/",
-                json.dumps(device_updates),
+                payload,
                 qos=0
             )
 
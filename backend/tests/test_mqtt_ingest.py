@@ -0,0 +1,89 @@
+import pytest
+from unittest.mock import MagicMock
+from app.services.mqtt_client import MQTTClient
+from app.services.message_dedup import MessageDeduplicator
+
+@pytest.fixture
+def paho_client(mocker):
+    """Mock paho client so MQTTClient does not connect to a broker"""
+    mock = MagicMock()
+    mocker.patch('app.services.mqtt_client.mqtt.Client', return_value=mock)
+    return mock
+
+def test_publish_only_client_does_not_subscribe(paho_client):
+    """Test Flask-side clients never subscribe to ingest topics"""
+    client = MQTTClient(subscribe=False)
+    client._on_connect(paho_client, None, {}, 0)
+    
+    assert client.connected is True
+    paho_client.subscribe.assert_not_called()
+
+def test_shared_subscription_topics(paho_client):
+    """Test ingest workers subscribe through the shared group"""
+    client = MQTTClient(share_group='greenhouse-ingest')
+    client._on_connect(paho_client, None, {}, 0, None)
+    
+    topics = [call.args[0] for call in paho_client.subscribe.call_args_list]
+    assert topics == [
+        '$share/greenhouse-ingest/greenhouse/sensors/',
+        '$share/greenhouse-ingest/greenhouse/devices/'
+    ]
+
+def test_redelivered_batch_is_not_saved_twice(paho_client, mocker):
+    """Test QoS 1 redelivery of a batch does not repeat upserts"""
+    save = mocker.patch('app.services.mqtt_client.save_sensor_data')
+    client = MQTTClient()
+    payload = b'''{"sensors": [
+        {"type": "temperature", "device_id": "greenhouse_1", "value": 25.5, "time": "2025-06-12T10:00:00"},
+        {"type": "humidity", "device_id": "greenhouse_1", "value": 70, "time": "2025-06-12T10:00:00"}
+    ]}'''
+    
+    assert client._process_sensors_data(payload)
+    assert client._process_sensors_data(payload)
+    
+    assert save.call_count == 2
+    assert client.deduplicator.get_stats()['duplicate_hits'] == 2
+
+def test_failed_save_is_retried_on_redelivery(paho_client, mocker):
+    """Test a reading whose save failed is not dropped as a duplicate when redelivered"""
+    save = mocker.patch('app.services.mqtt_client.save_sensor_data', side_effect=[Exception('db down'), None])
+    client = MQTTClient()
+    payload = b'{"sensors": [{"type": "temperature", "device_id": "greenhouse_1", "value": 25.5, "time": "2025-06-12T10:00:00"}]}'
+    
+    assert not client._process_sensors_data(payload)
+    assert client._process_sensors_data(payload)
+    
+    assert save.call_count == 2
+    assert client.deduplicator.get_stats()['duplicate_hits'] == 0
+    
+    mocker.patch.object(client, '_update_device_state', side_effect=[False, True])
+    mocker.patch('app.services.device_commands.acknowledge_reports')
+    device = b'{"devices": [{"type": "pump", "device_id": "pump1", "status": true, "time": "2025-06-12T10:00:00"}]}'
+    assert not client._process_devices_data(device)
+    assert client._process_devices_data(device)
+    assert client._update_device_state.call_count == 2
+
+# Deduplicator Tests
+def test_dedup_window_expiry(mocker):
+    """Test keys are forgotten after the window"""
+    clock = mocker.patch('app.services.message_dedup.time.monotonic', return_value=1000.0)
+    dedup = MessageDeduplicator(window_seconds=60)
+    
+    assert dedup.seen('sensors', 'greenhouse_1', 'temperature', 't1') is False
+    assert dedup.seen('sensors', 'greenhouse_1', 'temperature', 't1') is True
+    
+    clock.return_value = 1061.0
+    assert dedup.seen('sensors', 'greenhouse_1', 'temperature', 't1') is False
+    assert dedup.get_stats()['expired_total'] == 1
+
+def test_dedup_memory_is_bounded():
+    """Test the entry cap evicts the oldest keys"""
+    dedup = MessageDeduplicator(max_entries=100)
+    for i in range(250):
+        dedup.seen('sensors', 'greenhouse_1', 'temperature', str(i))
+    
+    stats = dedup.get_stats()
+    assert stats['entries'] == 100
+    assert stats['evicted_total'] == 150
+    assert dedup.seen('sensors', 'greenhouse_1', 'temperature', '249') is True
+    assert dedup.seen('sensors', 'greenhouse_1', 'temperature', '0') is False
@@ -1,6 +1,5 @@
 """Test MQTT sensor data publisher with random sensor values"""
 
-import json
 import time
 import random
 from datetime import datetime
@@ -11,6 +10,8 @@ import os
 # Add the parent directory to the Python path to import app modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from app.models.messages import SensorBatch, SensorReading, DeviceBatch, DeviceStatus, encode
+
 try:
     from app.config import Config
 except ImportError:
@@ -35,65 +36,24 @@ def generate_sensor_data():
     current_time = datetime.now().isoformat()
     
     # Generate realistic sensor values
-    temperature = round(random.uniform(20.0, 35.0), 1)  # 20-35°C
-    humidity = round(random.uniform(40.0, 90.0), 1)     # 40-90%
-    soil_moisture = round(random.uniform(30.0, 80.0), 1)  # 30-80%
-    light_intensity = round(random.uniform(100.0, 1000.0), 1)  # 100-1000 lux
-    ph_level = round(random.uniform(5.5, 8.0), 1)       # 5.5-8.0 pH
-    ec_level = round(random.uniform(0.5, 3.0), 2)       # 0.5-3.0 mS/cm
-    
-    return {
-        "sensors": [
-            {
-                "type": "temperature",
-                "sensor_id": "temp_001",
-                "value": temperature,
-                "unit": "°C",
-                "location": "greenhouse_zone_1",
-                "timestamp": current_time
-            },
-            {
-                "type": "humidity",
-                "sensor_id": "hum_001", 
-                "value": humidity,
-                "unit": "%",
-                "location": "greenhouse_zone_1",
-                "timestamp": current_time
-            },
-            {
-                "type": "soil_moisture",
-                "sensor_id": "soil_001",
-                "value": soil_moisture,
-                "unit": "%",
-                "location": "bed_1",
-                "timestamp": current_time
-            },
-            {
-                "type": "light_intensity",
-                "sensor_id": "light_001",
-                "value": light_intensity,
-                "unit": "lux",
-                "location": "greenhouse_zone_1", 
-                "timestamp": current_time
-            },
-            {
-                "type": "ph",
-                "sensor_id": "ph_001",
-                "value": ph_level,
-                "unit": "pH",
-                "location": "water_tank_1",
-                "timestamp": current_time
-            },
-            {
-                "type": "ec",
-                "sensor_id": "ec_001",
-                "value": ec_level,
-                "unit": "mS/cm",
-                "location": "water_tank_1",
-                "timestamp": current_time
-            }
-        ]
+    values = {
+        "temperature": round(random.uniform(20.0, 35.0), 1),     # 20-35°C
+        "humidity": round(random.uniform(40.0, 90.0), 1),        # 40-90%
+        "soil_moisture": round(random.uniform(30.0, 80.0), 1),   # 30-80%
+        "light_intensity": round(random.uniform(100.0, 1000.0), 1),  # 100-1000 lux
+        "ph": round(random.uniform(5.5, 8.0), 1),                # 5.5-8.0 pH
+        "ec": round(random.uniform(0.5, 3.0), 2)                 # 0.5-3.0 mS/cm
     }
+    
+    return SensorBatch(sensors=[
+        SensorReading(
+            type=sensor_type,
+            device_id="greenhouse_1",
+            value=value,
+            time=current_time
+        )
+        for sensor_type, value in values.items()
+    ])
 
 def generate_device_status():
     """Generate random device status"""
@@ -103,28 +63,11 @@ def generate_device_status():
     fan_status = random.choice([True, False])
     cover_status = random.choice(["OPEN", "HALF", "CLOSED"])
     
-    return {
-        "devices": [
-            {
-                "type": "pump",
-                "device_id": "pump1",
-                "status": pump_status,
-                "time": current_time,
-            },
-            {
-                "type": "fan", 
-                "device_id": "fan1",
-                "status": fan_status,
-                "time": current_time,
-            },
-            {
-                "type": "cover",
-                "device_id": "cover1",
-                "status": cover_status,
-                "time": current_time,
-            }
-        ]
-    }
+    return DeviceBatch(devices=[
+        DeviceStatus(type="pump", device_id="pump1", status=pump_status, time=current_time),
+        DeviceStatus(type="fan", device_id="fan1", status=fan_status, time=current_time),
+        DeviceStatus(type="cover", device_id="cover1", status=cover_status, time=current_time)
+    ])
 
 def main():
     print("🌱 Starting MQTT Sensor Data Publisher Test")
@@ -153,25 +96,25 @@ def main():
             # Generate and publish sensor data
             sensor_data = generate_sensor_data()
             print("🌡️  Publishing sensor data:")
-            for sensor in sensor_data["sensors"]:
-                print(f"   {sensor['type']}: {sensor['value']}{sensor['unit']} ({sensor['sensor_id']})")
+            for sensor in sensor_data.sensors:
+                print(f"   {sensor.type}: {sensor.value} ({sensor.device_id})")
             
             client.publish(
                 "greenhouse/sensors/",
-                json.dumps(sensor_data),
+                encode(sensor_data),
                 qos=0
             )
             
             # Generate and publish device status
             device_data = generate_device_status()
             print("\n🔧 Publishing device status:")
-            for device in device_data["devices"]:
-                status_str = device['status'] if isinstance(device['status'], str) else ('ON' if device['status'] else 'OFF')
-                print(f"   {device['type']}: {status_str} ({device['device_id']})")
+            for device in device_data.devices:
+                status_str = device.status if isinstance(device.status, str) else ('ON' if device.status else 'OFF')
+                print(f"   {device.type}: {status_str} ({device.device_id})")
             
             client.publish(
                 "greenhouse/devices/",
-                json.dumps(device_data),
+                encode(device_data),
                 qos=0
             )
             
@@ -0,0 +1,100 @@
+import json
+import pytest
+from flask import Flask, jsonify
+from sqlalchemy import create_engine, text
+import app.services.profiling as profiling
+from app.services.profiling import init_profiling, profile_section
+
+@pytest.fixture
+def profiled_app(tmp_path, mocker):
+    """Minimal app with profiling enabled and output in a temp directory"""
+    mocker.patch.object(profiling.Config, 'PROFILING_ENABLED', True)
+    mocker.patch.object(profiling.Config, 'PROFILING_TOKEN', 'secret')
+    mocker.patch.object(profiling.Config, 'PROFILING_DIR', str(tmp_path))
+    mocker.patch.object(profiling.Config, 'PROFILING_INTERVAL_MS', 1)
+    mocker.patch.object(profiling, '_profiling_manager', None)
+    
+    app = Flask(__name__)
+    init_profiling(app)
+    engine = create_engine('sqlite://')
+    
+    @app.route('/api/sensors/visualization')
+    def visualization():
+        with engine.connect() as conn:
+            rows = conn.execute(text('SELECT 1 UNION ALL SELECT 2')).fetchall()
+        with profile_section('inference'):
+            pass
+        return jsonify({'success': True, 'data': [row[0] for row in rows]})
+    
+    return app
+
+# Profiling Tests
+def test_unprofiled_request_has_no_server_timing(profiled_app, tmp_path):
+    """Test requests without the header are not profiled"""
+    response = profiled_app.test_client().get('/api/sensors/visualization')
+    
+    assert response.status_code == 200
+    assert 'Server-Timing' not in response.headers
+    assert list(tmp_path.iterdir()) == []
+
+def test_profile_header_writes_speedscope_and_sql(profiled_app, tmp_path):
+    """Test header activation, Server-Timing and saved files"""
+    response = profiled_app.test_client().get(
+        '/api/sensors/visualization', headers={'X-Profile': 'secret'}
+    )
+    
+    timing = response.headers['Server-Timing']
+    for category in ('db', 'cache', 'inference', 'serialization', 'app', 'total'):
+        assert f"{category};dur=" in timing
+    assert 'desc="1 queries"' in timing
+    
+    name = response.headers['X-Profile-Id']
+    speedscope = json.loads((tmp_path / f"{name}.speedscope.json").read_text())
+    assert speedscope['profiles'][0]['type'] == 'sampled'
+    
+    summary = json.loads((tmp_path / f"{name}.json").read_text())
+    assert summary['path'] == '/api/sensors/visualization'
+    assert summary['statements'][0]['statement'] == 'SELECT 1 UNION ALL SELECT 2'
+
+def test_wrong_token_is_ignored(profiled_app):
+    """Test header activation requires the configured token"""
+    response = profiled_app.test_client().get(
+        '/api/sensors/visualization', headers={'X-Profile': 'guess'}
+    )
+    assert 'Server-Timing' not in response.headers
+
+def test_armed_rule_profiles_next_requests(profiled_app):
+    """Test arming profiles a fixed number of matching requests"""
+    profiling.get_profiling_manager().arm('/api/sensors', count=1)
+    client = profiled_app.test_client()
+    
+    assert 'Server-Timing' in client.get('/api/sensors/visualization').headers
+    assert 'Server-Timing' not in client.get('/api/sensors/visualization').headers
+
+def test_disabled_profiling_registers_nothing(mocker):
+    """Test init_profiling is a no-op when disabled"""
+    mocker.patch.object(profiling.Config, 'PROFILING_ENABLED', False)
+    app = Flask(__name__)
+    init_profiling(app)
+    
+    assert app.before_request_funcs == {}
+    assert app.after_request_funcs == {}
+
+def test_profiling_requires_token(mocker):
+    """Test profiling stays off without PROFILING_TOKEN and its endpoints demand the token"""
+    from app.api.monitoring import bp
+    mocker.patch.object(profiling.Config, 'PROFILING_ENABLED', True)
+    mocker.patch.object(profiling.Config, 'PROFILING_TOKEN', None)
+    mocker.patch.object(profiling, '_profiling_manager', None)
+    app = Flask(__name__)
+    init_profiling(app)
+    app.register_blueprint(bp)
+    client = app.test_client()
+    
+    assert app.before_request_funcs == {}
+    assert client.get('/api/monitoring/profiling').status_code == 404
+    
+    mocker.patch.object(profiling.Config, 'PROFILING_TOKEN', 'secret')
+    assert client.get('/api/monitoring/profiling').status_code == 403
+    assert client.post('/api/monitoring/profiling', json={'count': 1}).status_code == 403
+    assert client.get('/api/monitoring/profiling', headers={'X-Profile': 'secret'}).status_code == 200
@@ -0,0 +1,48 @@
+import pytest
+from app.services.query_log import SlowQueryLog
+
+@pytest.fixture
+def query_log(mocker):
+    query_log = SlowQueryLog(slow_ms=100, explain_ms=200, max_entries=3)
+    query_log._run_explain = mocker.MagicMock(return_value='Seq Scan on sensor_data')
+    query_log.explain_idle_timeout = 0.1
+    return query_log
+
+# Slow Query Log Tests
+def test_statements_aggregate_by_call_site(query_log):
+    """Test timings are grouped per call site and statement"""
+    sql = "SELECT * FROM sensor_data WHERE device_id = %(device_id)s"
+    query_log.observe(sql, {}, 0.010, 'app.api.sensors:get_visualization_data')
+    query_log.observe(sql, {}, 0.030, 'app.api.sensors:get_visualization_data')
+    query_log.observe(sql, {}, 0.005, 'app.services.timescale:query_sensor_data')
+    
+    top = query_log.top(order_by='total_ms')
+    assert top[0]['call_site'] == 'app.api.sensors:get_visualization_data'
+    assert top[0]['count'] == 2
+    assert top[0]['max_ms'] == 30.0
+    assert top[0]['mean_ms'] == 20.0
+    assert top[0]['explain'] is None
+
+def test_table_is_bounded(query_log):
+    """Test the fastest statements are evicted beyond max_entries"""
+    for i in range(5):
+        query_log.observe(f"SELECT {i}", {}, (i + 1) / 1000, 'test:site')
+    
+    statements = [row['statement'] for row in query_log.top()]
+    assert statements == ['SELECT 4', 'SELECT 3', 'SELECT 2']
+    assert query_log.get_settings()['evicted_total'] == 2
+
+def test_slow_select_is_explained_off_thread(query_log):
+    """Test EXPLAIN runs once in the background for slow SELECTs only"""
+    select = "SELECT * FROM sensor_data"
+    insert = "INSERT INTO sensor_data VALUES (1)"
+    query_log.observe(select, {}, 0.5, 'test:select')
+    query_log.observe(select, {}, 0.5, 'test:select')
+    query_log.observe(insert, {}, 0.5, 'test:insert')
+    query_log._explain_thread.join(timeout=5)
+    
+    query_log._run_explain.assert_called_once_with(select, {})
+    rows = {row['call_site']: row for row in query_log.top()}
+    assert rows['test:select']['explain'] == 'Seq Scan on sensor_data'
+    assert rows['test:select']['slow_count'] == 2
+    assert rows['test:insert']['explain'] is None
@@ -0,0 +1,60 @@
+import pytest
+from flask import Flask, jsonify
+from app.utils import middleware
+from app.utils.middleware import LocalBucketStore, RateLimiter, rate_limit
+
+
+@pytest.fixture
+def app(monkeypatch):
+    limiter = RateLimiter(LocalBucketStore(max_keys=100, stripes=4), default=(60, 60))
+    monkeypatch.setattr(middleware, '_rate_limiter', limiter)
+    app = Flask(__name__)
+
+    @app.route('/cheap')
+    @rate_limit
+    def cheap():
+        return jsonify({'success': True})
+
+    @app.route('/expensive', methods=['POST'])
+    @rate_limit(cost=10)
+    def expensive():
+        return jsonify({'success': True})
+
+    @app.route('/admin', methods=['POST'])
+    @rate_limit(limit='2/60')
+    def admin():
+        return jsonify({'success': True}), 202
+
+    return app
+
+
+# Token Bucket Tests
+def test_bucket_limits_and_headers(app):
+    """60 requests pass per client, the rest get 429 with Retry-After"""
+    client = app.test_client()
+    responses = [client.get('/cheap') for _ in range(65)]
+
+    assert [r.status_code for r in responses].count(200) == 60
+    assert responses[0].headers['RateLimit-Limit'] == '60'
+    assert responses[0].headers['RateLimit-Remaining'] == '59'
+    assert responses[-1].status_code == 429
+    assert int(responses[-1].headers['Retry-After']) >= 1
+    assert client.get('/cheap', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+
+
+def test_cost_and_route_limits(app):
+    """Expensive routes spend more of the shared bucket; own limits use their own bucket"""
+    client = app.test_client()
+    assert all(client.post('/expensive').status_code == 200 for _ in range(6))
+    assert client.post('/expensive').status_code == 429
+    assert client.get('/cheap').status_code == 429
+
+    assert [client.post('/admin').status_code for _ in range(3)] == [202, 202, 429]
+
+
+def test_lru_bounds_memory():
+    """Idle keys are evicted once a stripe is full"""
+    store = LocalBucketStore(max_keys=8, stripes=2)
+    for i in range(100):
+        store.take(f'default:10.0.0.{i}', 1, 60, 1.0)
+    assert len(store) == 8
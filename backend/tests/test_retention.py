@@ -0,0 +1,108 @@
+import io
+import os
+import pytest
+from datetime import datetime, timedelta
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from app import db
+from app.config import Config
+from app.models.blob import Blob
+from app.models.image import ImageMetadata
+from app.models.detection_history import DetectionHistory
+from app.services.blob_store import store_file
+from app.services import retention
+from app.services.retention import (
+    RetentionPolicy, delete_detections, delete_images, archive_images, archive_detections, run_retention_now
+)
+from app.services.storage_accounting import get_storage_totals
+
+NOW = datetime(2026, 10, 19, 12, 0, 0)
+
+
+def jpeg_bytes(size=(1600, 1200)):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 60).convert('RGB').save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def add_detection(path, days_old, disease):
+    with open(path, 'wb') as f:
+        f.write(jpeg_bytes((64, 48)) if not disease else jpeg_bytes())
+    row = DetectionHistory(original_image_path=str(path), original_blob=store_file(str(path), device_id='cam1'),
+                           detection_method='automatic',
+                           ai_results=[{'predicted_class': 'x', 'confidence': 0.9,
+                                        'type': 'disease' if disease else 'healthy'}])
+    row.timestamp = NOW - timedelta(days=days_old)
+    db.session.add(row)
+    db.session.commit()
+    return row
+
+
+# Retention Policy Tests
+def test_old_healthy_detections_are_deleted(app, store, tmp_path):
+    """Healthy detections past the horizon go, diseased ones and their files stay"""
+    healthy = add_detection(tmp_path / 'healthy.jpg', 100, disease=False)
+    diseased = add_detection(tmp_path / 'diseased.jpg', 100, disease=True)
+    recent = add_detection(tmp_path / 'recent.jpg', 1, disease=False)
+    healthy_blob = healthy.original_blob
+
+    assert delete_detections(RetentionPolicy(healthy_days=90), NOW) == 1
+    assert {row.id for row in DetectionHistory.query} == {diseased.id, recent.id}
+    assert not os.path.exists(tmp_path / 'healthy.jpg')
+    assert os.path.exists(tmp_path / 'diseased.jpg')
+    assert db.session.get(Blob, healthy_blob).refcount == 0
+
+
+def test_archive_replaces_full_res(app, store, tmp_path):
+    """Old originals are recompressed in place and re-referenced"""
+    row = add_detection(tmp_path / 'capture.jpg', 40, disease=True)
+    old_blob, old_size = row.original_blob, os.path.getsize(tmp_path / 'capture.jpg')
+
+    assert archive_detections(RetentionPolicy(full_res_days=30), NOW) == 1
+    db.session.refresh(row)
+    assert row.archived_at is not None and row.original_blob != old_blob
+    assert os.path.getsize(tmp_path / 'capture.jpg') < old_size
+    with Image.open(tmp_path / 'capture.jpg') as image:
+        assert max(image.size) == 800
+    assert archive_detections(RetentionPolicy(full_res_days=30), NOW) == 0
+
+
+def test_images_archived_then_deleted_in_batches(app, store):
+    """Image rows are recompressed, then deleted in bounded batches with counters updated"""
+    from app.services.image_service import save_image
+    for i in range(5):
+        metadata = save_image(FileStorage(io.BytesIO(jpeg_bytes((400, 300)) + bytes([i])), filename='a.jpg'), 'cam1')
+        metadata.timestamp = NOW - timedelta(days=200)
+    db.session.commit()
+
+    assert archive_images(RetentionPolicy(full_res_days=30, archive_max_side=100), NOW) == 5
+    assert all(row.archived_at for row in ImageMetadata.query)
+
+    policy = RetentionPolicy(image_days=180, batch_size=2, max_batches=2)
+    assert delete_images(policy, NOW) == 4
+    assert delete_images(policy, NOW) == 1
+    assert ImageMetadata.query.count() == 0
+    assert get_storage_totals()['total_images'] == 0
+
+
+def test_manual_run_defers_to_lock_holder(app, monkeypatch):
+    """A worker without retention.lock does not start a second, overlapping pass"""
+    monkeypatch.setattr(Config, 'RETENTION_ENABLED', True)
+    monkeypatch.setattr(retention, '_retention_job', None)
+    monkeypatch.setattr(retention, 'acquire_process_lock', lambda path: False)
+    monkeypatch.setattr(retention, 'run_retention', lambda *args: pytest.fail('second pass started'))
+
+    assert run_retention_now() is None
+
+
+def test_manual_run_refused_when_disabled(app, monkeypatch):
+    """POST /api/monitoring/retention/run does nothing while RETENTION_ENABLED is off"""
+    from app.api.monitoring import bp
+    monkeypatch.setattr(Config, 'RETENTION_ENABLED', False)
+    monkeypatch.setattr(retention, 'acquire_process_lock', lambda path: pytest.fail('lock taken'))
+    monkeypatch.setattr(retention, 'run_retention', lambda *args: pytest.fail('pass started'))
+    app.register_blueprint(bp)
+
+    response = app.test_client().post('/api/monitoring/retention/run')
+    assert response.status_code == 403
+    assert 'RETENTION_ENABLED' in response.get_json()['error']
@@ -0,0 +1,77 @@
+import io
+import os
+from werkzeug.datastructures import FileStorage
+from app import db
+from app.config import Config
+from app.models.blob import Blob
+from app.models.storage_usage import StorageUsage
+from app.services import blob_store
+from app.services.storage_accounting import (
+    LEGACY_DEVICE, get_storage_totals, get_storage_breakdown, reconcile_usage, remove_orphan_blobs
+)
+
+
+def upload(content, device_id):
+    from app.services.image_service import save_image
+    return save_image(FileStorage(io.BytesIO(content), filename='leaf.jpg'), device_id)
+
+
+# Storage Counter Tests
+def test_counters_follow_writes_and_deletes(app, store):
+    """Files/bytes count unique blobs, images count metadata rows, per device"""
+    from app.services.image_service import delete_image
+
+    first = upload(b'A' * 100, 'cam1')
+    upload(b'A' * 100, 'cam1')
+    upload(b'B' * 50, 'cam2')
+
+    assert get_storage_totals() == {'total_files': 2, 'total_bytes': 150, 'total_images': 3}
+    assert get_storage_totals('cam1') == {'total_files': 1, 'total_bytes': 100, 'total_images': 2}
+    assert {row['device_id'] for row in get_storage_breakdown()} == {'cam1', 'cam2'}
+
+    delete_image(first.id)
+    assert get_storage_totals()['total_images'] == 2
+    blob_store.collect_garbage(grace_seconds=-1)
+    assert get_storage_totals()['total_files'] == 2  # still referenced by the duplicate upload
+
+
+def test_reconcile_fixes_drift(app, store):
+    """Reconcile restores counters from blobs and image_metadata"""
+    upload(b'C' * 10, 'cam1')
+    StorageUsage.query.update({'total_bytes': 999, 'image_count': 0})
+    db.session.commit()
+
+    assert reconcile_usage() == 1
+    assert get_storage_totals() == {'total_files': 1, 'total_bytes': 10, 'total_images': 1}
+    assert reconcile_usage() == 0
+
+
+def test_remove_orphan_blobs(app, store):
+    """Blob files without a row are swept, referenced ones are kept"""
+    kept = upload(b'kept', 'cam1').content_hash
+    orphan, _ = store.put_stream(io.BytesIO(b'orphan'))
+
+    assert remove_orphan_blobs(grace_seconds=-1) == 1
+    assert store.exists(kept) and not store.exists(orphan)
+
+
+def test_legacy_files_are_backfilled(app, store, tmp_path, monkeypatch):
+    """Files from before the blob store are counted once, periodic runs keep them"""
+    from app.services.blob_store import store_file
+    upload_dir = tmp_path / 'images'
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(upload_dir))
+    monkeypatch.setattr(Config, 'DERIVATIVE_DIR', str(upload_dir / 'derivatives'))
+    (upload_dir / 'cam1').mkdir(parents=True)
+    (upload_dir / 'cam1' / 'old.jpg').write_bytes(b'L' * 300)
+    (upload_dir / 'derivatives').mkdir()
+    (upload_dir / 'derivatives' / 'old.webp').write_bytes(b'D' * 40)
+    (upload_dir / 'download').mkdir()
+    adopted = upload_dir / 'download' / 'capture.jpg'
+    adopted.write_bytes(b'C' * 20)
+    store_file(str(adopted), device_id='cam1')  # hard-linked to its blob, counted there
+    db.session.commit()
+
+    assert reconcile_usage(include_legacy=True) == 1
+    assert get_storage_totals() == {'total_files': 2, 'total_bytes': 320, 'total_images': 0}
+    assert get_storage_totals(LEGACY_DEVICE)['total_bytes'] == 300
+    assert reconcile_usage() == 0